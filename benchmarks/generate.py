@@ -0,0 +1,67 @@
+from data.database import Database
+from dictionary import Dictionary
+from user import User
+from word import Word
+from array import array
+from random import Random
+import argparse
+import os
+
+# Generators of synthetic data for benchmarks: dictionary files and users files of any size.
+# Run from the root directory of the project:
+#   python -m benchmarks.generate --words 100000 --users 1000 --directory bench_data
+
+MAIN_LANGUAGE = "English"
+# Characters that synthetic terms are made of
+TERM_CHARS = "abcdefghijklmnopqrstuvwxyz"
+
+# Returns a random term with a length like the length of real words
+def generate_term(random: Random) -> str:
+    return "".join(random.choice(TERM_CHARS) for _ in range(random.randint(3, 12)))
+
+# Returns the names of the foreign languages of the synthetic dictionaries
+def get_languages(dictionaries_count: int) -> list[str]:
+    return ["Language{}".format(idx + 1) for idx in range(dictionaries_count)]
+
+# Generates dictionary files between the main language and each of the foreign languages, each with the given number of words.
+# Returns the paths to the files
+def generate_dictionaries(directory: str, dictionaries_count: int, words_count: int, seed: int = 0) -> list[str]:
+    random = Random(seed)
+    filepaths = []
+    for language in get_languages(dictionaries_count):
+        dictionary = Dictionary(MAIN_LANGUAGE, language)
+        for _ in range(words_count):
+            dictionary.append(generate_term(random), generate_term(random), random.randint(1, 100), random.choice(Word.TYPES))
+        filepath = os.path.join(directory, "{}-{}.txt".format(MAIN_LANGUAGE.lower(), language.lower()))
+        Database.write_dictionary(dictionary, filepath)
+        filepaths.append(filepath)
+    return filepaths
+
+# Generates a users file with the given number of users.
+# Each user learns some of the foreign languages, with up to max_active_words words (and their confidences) in each
+def generate_users(filepath: str, users_count: int, dictionaries_count: int, max_active_words: int, seed: int = 0) -> None:
+    random = Random(seed)
+    languages = get_languages(dictionaries_count)
+    # Every user has the same password hash, since hashing is not what is measured
+    password = b"$2b$12$zcGFLe4DiV5Fx.9uGBxzaO3VN1aHuEXotUXZoihkTU8QjgG2OU/E6"
+    with open(filepath, 'w', encoding = "utf-8") as file:
+        for user_idx in range(users_count):
+            active_languages = random.sample(languages, random.randint(0, len(languages)))
+            active_words = [random.randint(0, max_active_words) for _ in active_languages]
+            confidences = [array('B', (random.randint(0, 100) for _ in range(count))) for count in active_words]
+            user = User("user{}".format(user_idx), password, MAIN_LANGUAGE, active_languages, active_words, confidences, [])
+            Database.setup_user_schedules(user)
+            file.write(Database.serialize_user(user) + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generate synthetic SuperMem data.")
+    parser.add_argument("--directory", required = True, help = "directory to write the files to")
+    parser.add_argument("--words", type = int, default = 1000, help = "number of words in each dictionary")
+    parser.add_argument("--users", type = int, default = 10, help = "number of users")
+    parser.add_argument("--dictionaries", type = int, default = 2, help = "number of dictionaries")
+    parser.add_argument("--max-active-words", type = int, default = 200, help = "maximum number of active words of a user in a language")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok = True)
+    generate_dictionaries(args.directory, args.dictionaries, args.words, args.seed)
+    generate_users(os.path.join(args.directory, "users.txt"), args.users, args.dictionaries, args.max_active_words, args.seed)
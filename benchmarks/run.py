@@ -0,0 +1,145 @@
+from benchmarks.generate import generate_dictionaries, generate_users
+from data.database import Database
+from interface.home_page import HomePage
+from logger import Logger
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Benchmark suite for the hot paths of the application.
+# For each scale (number of words in each dictionary and number of users) it generates synthetic data,
+# times the operations and prints the results as JSON.
+# Results can be saved as a baseline, and later runs fail if an operation got slower than the baseline by more than a threshold.
+# Run from the root directory of the project:
+#   python -m benchmarks.run --scales 1000x10 1000000x100000 --save-baseline
+#   python -m benchmarks.run --scales 1000x10 1000000x100000 --threshold 0.2
+
+DEFAULT_SCALES = ["1000x10", "100000x1000"]
+DEFAULT_BASELINE_FILE = "benchmarks/baseline.json"
+# Number of dictionaries in the generated data
+DICTIONARIES_COUNT = 2
+# Number of modes of ordering words in a word test
+ORDER_MODES_COUNT = 8
+
+# Runs a function the given number of times. Returns the shortest time of a run, in seconds
+def time_best(function, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+# Parses a scale like "1000x10" into (words count, users count)
+def parse_scale(scale: str) -> tuple[int, int]:
+    words, _, users = scale.partition("x")
+    return int(words), int(users)
+
+# Runs all benchmarks at a single scale. Returns a dictionary of benchmark names and their times
+def run_scale(words_count: int, users_count: int, max_active_words: int, repeat: int) -> dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        dict_filepaths = generate_dictionaries(directory, DICTIONARIES_COUNT, words_count)
+        users_filepath = os.path.join(directory, "users.txt")
+        generate_users(users_filepath, users_count, DICTIONARIES_COUNT, min(max_active_words, words_count))
+
+        # Dictionaries, parsed from text and then from the compiled files
+        def load_dictionaries_text():
+            Database.USE_COMPILED_DICTIONARIES = False
+            Database().load_dictionaries(dict_filepaths)
+            Database.USE_COMPILED_DICTIONARIES = True
+        results["load_dictionaries[text]"] = time_best(load_dictionaries_text, repeat)
+        Database().load_dictionaries(dict_filepaths)
+        results["load_dictionaries[compiled]"] = time_best(lambda: Database().load_dictionaries(dict_filepaths), repeat)
+        def load_dictionaries_mapped():
+            Database.MAP_COMPILED_DICTIONARIES = True
+            Database().load_dictionaries(dict_filepaths)
+            Database.MAP_COMPILED_DICTIONARIES = False
+        results["load_dictionaries[mapped]"] = time_best(load_dictionaries_mapped, repeat)
+
+        database = Database()
+        database.load_dictionaries(dict_filepaths)
+
+        # Users
+        results["load_users"] = time_best(lambda: database.load_users(users_filepath), repeat)
+        results["load_users[lazy]"] = time_best(lambda: database.load_users(users_filepath, lazy = True), repeat)
+        database.load_users(users_filepath)
+        export_filepath = os.path.join(directory, "users_export.txt")
+        results["export_users"] = time_best(lambda: database.export_users(export_filepath), repeat)
+        users = database.users
+        serialized = [Database.serialize_user(user) for user in users]
+        results["serialize_user[all]"] = time_best(lambda: [Database.serialize_user(user) for user in users], repeat)
+        results["deserialize_user[all]"] = time_best(lambda: [Database.deserialize_user(line) for line in serialized], repeat)
+        results["setup_user_dictionaries[all]"] = time_best(lambda: [database.setup_user_dictionaries(user) for user in users], repeat)
+
+        # Ordering of words in every mode, for the user with the most active words
+        user, lang_idx = max(
+            ((user, lang_idx) for user in users for lang_idx in range(len(user.active_languages))),
+            key = lambda pair: pair[0].active_words[pair[1]],
+            default = (None, None)
+        )
+        if user is not None:
+            home_page = HomePage(user)
+            words = user.dictionaries[lang_idx].words[:user.active_words[lang_idx]]
+            for mode in range(1, ORDER_MODES_COUNT + 1):
+                results["get_words_ordered_in_mode[{}]".format(mode)] = time_best(
+                    lambda: home_page.get_words_ordered_in_mode(words, mode, lang_idx, seed = 0), repeat
+                )
+    return results
+
+# Runs the benchmarks at all scales. Returns a dictionary of "benchmark@scale" names and their times
+def run(scales: list[str], max_active_words: int, repeat: int) -> dict[str, float]:
+    results = {}
+    for scale in scales:
+        words_count, users_count = parse_scale(scale)
+        for name, seconds in run_scale(words_count, users_count, max_active_words, repeat).items():
+            results["{}@{}".format(name, scale)] = seconds
+    return results
+
+# Compares results to a baseline. Returns a list of regressions, as (name, baseline time, new time).
+# Benchmarks that take less than min_seconds are too noisy to be compared, so they are ignored
+def find_regressions(results: dict[str, float], baseline: dict[str, float], threshold: float, min_seconds: float) -> list[tuple[str, float, float]]:
+    regressions = []
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds is None or max(seconds, baseline_seconds) < min_seconds:
+            continue
+        if seconds > baseline_seconds * (1 + threshold):
+            regressions.append((name, baseline_seconds, seconds))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark SuperMem's hot paths.")
+    parser.add_argument("--scales", nargs = "+", default = DEFAULT_SCALES, help = "scales as WORDSxUSERS, e.g. 1000x10")
+    parser.add_argument("--max-active-words", type = int, default = 200, help = "maximum number of active words of a user in a language")
+    parser.add_argument("--repeat", type = int, default = 3, help = "number of runs of each benchmark, the best one counts")
+    parser.add_argument("--baseline", default = DEFAULT_BASELINE_FILE, help = "path to the baseline JSON file")
+    parser.add_argument("--save-baseline", action = "store_true", help = "save the results as the new baseline")
+    parser.add_argument("--threshold", type = float, default = 0.25, help = "allowed slowdown relative to the baseline, e.g. 0.25 for 25%%")
+    parser.add_argument("--min-seconds", type = float, default = 0.001, help = "benchmarks faster than this are not compared")
+    args = parser.parse_args()
+
+    # Invalid lines in generated data are not expected, and logging must not be measured
+    Logger.log_level = -1
+    results = run(args.scales, args.max_active_words, args.repeat)
+    print(json.dumps(results, indent = 4))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent = 4)
+        sys.exit(0)
+    try:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print("No baseline at {}, nothing to compare to.".format(args.baseline), file = sys.stderr)
+        sys.exit(0)
+    regressions = find_regressions(results, baseline, args.threshold, args.min_seconds)
+    for name, baseline_seconds, seconds in regressions:
+        print("REGRESSION {}: {:.6f}s -> {:.6f}s".format(name, baseline_seconds, seconds), file = sys.stderr)
+    sys.exit(1 if regressions else 0)
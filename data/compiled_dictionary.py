@@ -0,0 +1,368 @@
+from logger import Logger
+from word import Word
+from dictionary import Dictionary
+from array import array
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+# A class for the compiled (binary) form of a dictionary file.
+# The compiled form is a sidecar file next to the dictionary's text file.
+# It's keyed by the modification time, size and hash of the text file,
+# so it's rebuilt automatically whenever the text file changes.
+#
+# Layout of a compiled dictionary file (all numbers are little-endian):
+#   header  - see HEADER_FORMAT
+#   page offsets - one unsigned 64-bit byte offset per page, of the page's first line in the text file
+#   page starts  - one unsigned 32-bit index per page, of the page's first word
+#   levels  - one unsigned byte per word
+#   types   - one unsigned byte per word, an index into Word.TYPES
+#   offsets - (2 + 2 * words_count + 1) unsigned 32-bit offsets into the string pool.
+#             Strings are stored in the order: language A, language B, then term A and term B of each word.
+#             String i is pool[offsets[i]:offsets[i + 1]]
+#   pool    - all the strings, UTF-8 encoded, one after another
+#
+# A compiled file can also be mapped - the dictionary then reads its columns straight from the mapped file, without copying them.
+# The pages of a file mapped by many processes are kept in memory once by the OS, so N processes cost about one copy of the corpus.
+class CompiledDictionary:
+    # Returns the path to the compiled sidecar file of a dictionary text file
+    def get_filepath(filepath: str) -> str:
+        return filepath + CompiledDictionary.FILE_SUFFIX
+
+    # Loads a dictionary from the compiled sidecar file of the given dictionary text file.
+    # If mapped = True, the file stays mapped and the dictionary reads from it, otherwise its columns are copied to memory.
+    # If invalid lines of the text file were skipped when it was compiled, a warning is logged, since their errors are not logged again.
+    # Returns None if there is no compiled file, or if it's outdated or broken.
+    def load(filepath: str, mapped: bool = False) -> Dictionary:
+        compiled_filepath = CompiledDictionary.get_filepath(filepath)
+        try:
+            source_stat = os.stat(filepath)
+            file = open(compiled_filepath, 'rb')
+        except OSError:
+            return None
+        # Offsets are read in the machine's byte order when they are not copied
+        mapped = mapped and sys.byteorder == "little"
+        try:
+            with file:
+                mm = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+            if not CompiledDictionary.is_up_to_date(mm, filepath, source_stat):
+                mm.close()
+                return None
+            skipped_lines = struct.unpack_from(CompiledDictionary.HEADER_FORMAT, mm)[9]
+            if skipped_lines > 0:
+                Logger.log_warning("{} invalid lines of dictionary file {} were skipped. Check it with the dictionary validator.", skipped_lines, filepath)
+            if mapped:
+                # The mapping is closed when the dictionary's views of it are gone
+                return CompiledDictionary.read_mapped(mm, copy = False)
+            with mm:
+                return CompiledDictionary.read_mapped(mm)
+        except (ValueError, struct.error, UnicodeDecodeError):
+            Logger.log_warning("Compiled dictionary file {} is broken, it will be rebuilt.", compiled_filepath)
+            return None
+
+    # Checks if the mapped compiled file matches the current state of the dictionary text file.
+    # Modification time and size are checked first, because they are cheap.
+    # If they don't match, the hash of the text file is compared, so that a file that was only touched is not recompiled.
+    def is_up_to_date(mm: mmap.mmap, filepath: str, source_stat: os.stat_result) -> bool:
+        if len(mm) < CompiledDictionary.HEADER_SIZE:
+            return False
+        magic, version, _, mtime_ns, size, sha256, _, _, _, _ = struct.unpack_from(CompiledDictionary.HEADER_FORMAT, mm)
+        if magic != CompiledDictionary.MAGIC or version != CompiledDictionary.VERSION:
+            return False
+        if mtime_ns == source_stat.st_mtime_ns and size == source_stat.st_size:
+            return True
+        if size != source_stat.st_size:
+            return False
+        return CompiledDictionary.hash_file(filepath) == sha256
+
+    # Reads a dictionary from a mapped compiled file, without validating it against the text file.
+    # If copy = False, the dictionary's columns are read-only views of the mapped file, and terms are decoded when they are accessed.
+    def read_mapped(mm: mmap.mmap, copy: bool = True) -> Dictionary:
+        _, _, flags, _, _, _, words_count, pool_size, pages_count, _ = struct.unpack_from(CompiledDictionary.HEADER_FORMAT, mm)
+        # Find where each column begins
+        page_offsets_start = CompiledDictionary.HEADER_SIZE
+        page_starts_start = page_offsets_start + pages_count * 8
+        levels_start = page_starts_start + pages_count * 4
+        types_start = levels_start + words_count
+        offsets_start = types_start + words_count
+        offsets_count = 2 + 2 * words_count + 1
+        pool_start = offsets_start + offsets_count * 4
+        if pool_start + pool_size > len(mm):
+            raise ValueError("Compiled dictionary is truncated")
+        if not copy:
+            return CompiledDictionary.read_views(mm, flags, words_count, page_offsets_start, page_starts_start, levels_start, types_start, offsets_start, pool_start, pool_size)
+        page_offsets = CompiledDictionary.unpack_column('Q', mm[page_offsets_start:page_starts_start])
+        page_starts = CompiledDictionary.unpack_column('I', mm[page_starts_start:levels_start])
+        levels = array('B', mm[levels_start:types_start])
+        types = array('B', mm[types_start:offsets_start])
+        offsets = CompiledDictionary.unpack_column('I', mm[offsets_start:pool_start])
+        pool = mm[pool_start:pool_start + pool_size]
+        # Languages are the first two strings of the pool
+        language_a = None
+        language_b = None
+        if not flags & CompiledDictionary.FLAG_NO_LANGUAGE_A:
+            language_a = pool[offsets[0]:offsets[1]].decode("utf-8")
+        if not flags & CompiledDictionary.FLAG_NO_LANGUAGE_B:
+            language_b = pool[offsets[1]:offsets[2]].decode("utf-8")
+        if max(types, default = 0) >= len(Word.TYPES):
+            raise ValueError("Compiled dictionary has an invalid word type")
+        # Decode the terms. Terms A and B alternate in the pool
+        terms = [pool[offsets[idx]:offsets[idx + 1]].decode("utf-8") for idx in range(2, 2 + 2 * words_count)]
+        return Dictionary.from_columns(language_a, language_b, terms[0::2], terms[1::2], levels, types, page_starts, page_offsets)
+
+    # Creates a dictionary whose columns are views of a mapped compiled file. The positions of the columns are given
+    def read_views(mm: mmap.mmap, flags: int, words_count: int, page_offsets_start: int, page_starts_start: int,
+                   levels_start: int, types_start: int, offsets_start: int, pool_start: int, pool_size: int) -> Dictionary:
+        view = memoryview(mm)
+        page_offsets = view[page_offsets_start:page_starts_start].cast('Q')
+        page_starts = view[page_starts_start:levels_start].cast('I')
+        levels = view[levels_start:types_start]
+        types = view[types_start:offsets_start]
+        offsets = view[offsets_start:pool_start].cast('I')
+        pool = view[pool_start:pool_start + pool_size]
+        if max(types, default = 0) >= len(Word.TYPES):
+            raise ValueError("Compiled dictionary has an invalid word type")
+        language_a = None
+        language_b = None
+        if not flags & CompiledDictionary.FLAG_NO_LANGUAGE_A:
+            language_a = str(pool[offsets[0]:offsets[1]], "utf-8")
+        if not flags & CompiledDictionary.FLAG_NO_LANGUAGE_B:
+            language_b = str(pool[offsets[1]:offsets[2]], "utf-8")
+        # Terms A are strings 2, 4, 6, ... of the pool, terms B are strings 3, 5, 7, ...
+        terms_a = MappedTerms(pool, offsets, 2, words_count)
+        terms_b = MappedTerms(pool, offsets, 3, words_count)
+        return Dictionary.from_columns(language_a, language_b, terms_a, terms_b, levels, types, page_starts, page_offsets)
+
+    # Reads only the page index from the compiled sidecar file of the given dictionary text file, without the words.
+    # Returns (words count, page starts, page offsets), or None if there is no compiled file, or if it's outdated or broken.
+    def read_page_index(filepath: str) -> tuple[int, array, array]:
+        try:
+            source_stat = os.stat(filepath)
+            file = open(CompiledDictionary.get_filepath(filepath), 'rb')
+        except OSError:
+            return None
+        try:
+            with file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+                if not CompiledDictionary.is_up_to_date(mm, filepath, source_stat):
+                    return None
+                _, _, _, _, _, _, words_count, _, pages_count, _ = struct.unpack_from(CompiledDictionary.HEADER_FORMAT, mm)
+                page_starts_start = CompiledDictionary.HEADER_SIZE + pages_count * 8
+                levels_start = page_starts_start + pages_count * 4
+                if levels_start > len(mm):
+                    return None
+                page_offsets = CompiledDictionary.unpack_column('Q', mm[CompiledDictionary.HEADER_SIZE:page_starts_start])
+                page_starts = CompiledDictionary.unpack_column('I', mm[page_starts_start:levels_start])
+                return words_count, page_starts, page_offsets
+        except (ValueError, struct.error):
+            return None
+
+    # Compiles a dictionary that was read from the given text file, and writes it to the text file's sidecar file.
+    # Returns True if the compiled file was written.
+    def compile(dictionary: Dictionary, filepath: str) -> bool:
+        try:
+            source_stat = os.stat(filepath)
+            sha256 = CompiledDictionary.hash_file(filepath)
+        except OSError:
+            Logger.log_warning("Cannot compile dictionary, its file cannot be read - {}", filepath)
+            return False
+        data = CompiledDictionary.serialize(dictionary, source_stat, sha256)
+        compiled_filepath = CompiledDictionary.get_filepath(filepath)
+        # Write to a temporary file and then replace the old one, so that a reader never sees a half-written file
+        temp_filepath = compiled_filepath + ".tmp"
+        try:
+            with open(temp_filepath, 'wb') as file:
+                file.write(data)
+            os.replace(temp_filepath, compiled_filepath)
+        except OSError:
+            Logger.log_warning("Cannot write compiled dictionary file - {}", compiled_filepath)
+            return False
+        return True
+
+    # Compiles a dictionary from a stream of its words, without keeping them in memory, and writes it to the sidecar file
+    # of the given text file. Words are tuples of (term A, term B, level, type code), in the same order as in the text file.
+    # Pages are a list of (index of the first word, byte offset of its line) of each page. It's read only after all the words are,
+    # so it can be filled while the words are streamed.
+    # The columns are written to temporary files first, because the header needs the counts of words and bytes in the pool.
+    # Returns True if the compiled file was written.
+    def compile_streamed(words, language_a: str, language_b: str, filepath: str, pages: list[tuple[int, int]]) -> bool:
+        try:
+            source_stat = os.stat(filepath)
+            sha256 = CompiledDictionary.hash_file(filepath)
+        except OSError:
+            Logger.log_warning("Cannot compile dictionary, its file cannot be read - {}", filepath)
+            return False
+        flags = 0
+        if language_a is None:
+            flags |= CompiledDictionary.FLAG_NO_LANGUAGE_A
+        if language_b is None:
+            flags |= CompiledDictionary.FLAG_NO_LANGUAGE_B
+        compiled_filepath = CompiledDictionary.get_filepath(filepath)
+        temp_filepath = compiled_filepath + ".tmp"
+        try:
+            with tempfile.TemporaryFile() as levels_file, tempfile.TemporaryFile() as types_file,\
+                    tempfile.TemporaryFile() as offsets_file, tempfile.TemporaryFile() as pool_file:
+                levels = array('B')
+                types = array('B')
+                offsets = array('I', [0])
+                pool = bytearray()
+                pool_size = 0
+                words_count = 0
+                # Writes the buffered columns to their files
+                def flush() -> None:
+                    nonlocal pool_size
+                    levels_file.write(levels.tobytes())
+                    types_file.write(types.tobytes())
+                    offsets_file.write(CompiledDictionary.pack_column(offsets))
+                    pool_file.write(pool)
+                    pool_size += len(pool)
+                    del levels[:], types[:], offsets[:], pool[:]
+                # Appends a string to the pool and records where it ends
+                def add_string(string: str) -> None:
+                    if string is not None:
+                        pool.extend(string.encode("utf-8"))
+                    offsets.append(pool_size + len(pool))
+                add_string(language_a)
+                add_string(language_b)
+                for term_a, term_b, level, type_code in words:
+                    add_string(term_a)
+                    add_string(term_b)
+                    levels.append(level)
+                    types.append(type_code)
+                    words_count += 1
+                    if len(pool) >= CompiledDictionary.STREAM_BUFFER_BYTES:
+                        flush()
+                flush()
+                header = struct.pack(
+                    CompiledDictionary.HEADER_FORMAT,
+                    CompiledDictionary.MAGIC,
+                    CompiledDictionary.VERSION,
+                    flags,
+                    source_stat.st_mtime_ns,
+                    source_stat.st_size,
+                    sha256,
+                    words_count,
+                    pool_size,
+                    len(pages),
+                    # Streamed words are already valid
+                    0
+                )
+                with open(temp_filepath, 'wb') as file:
+                    file.write(header)
+                    file.write(CompiledDictionary.pack_column(array('Q', [offset for _, offset in pages])))
+                    file.write(CompiledDictionary.pack_column(array('I', [start for start, _ in pages])))
+                    for column_file in (levels_file, types_file, offsets_file, pool_file):
+                        column_file.seek(0)
+                        shutil.copyfileobj(column_file, file)
+            os.replace(temp_filepath, compiled_filepath)
+        except OSError:
+            Logger.log_warning("Cannot write compiled dictionary file - {}", compiled_filepath)
+            return False
+        return True
+
+    # Serializes a dictionary to the compiled format. Returns the resulting bytes
+    def serialize(dictionary: Dictionary, source_stat: os.stat_result, sha256: bytes) -> bytes:
+        flags = 0
+        if dictionary.language_a is None:
+            flags |= CompiledDictionary.FLAG_NO_LANGUAGE_A
+        if dictionary.language_b is None:
+            flags |= CompiledDictionary.FLAG_NO_LANGUAGE_B
+        offsets = array('I', [0])
+        pool = bytearray()
+        # Appends a string to the pool and records where it ends
+        def add_string(string: str) -> None:
+            if string is not None:
+                pool.extend(string.encode("utf-8"))
+            offsets.append(len(pool))
+        add_string(dictionary.language_a)
+        add_string(dictionary.language_b)
+        for term_a, term_b in zip(dictionary.terms_a, dictionary.terms_b):
+            add_string(term_a)
+            add_string(term_b)
+        header = struct.pack(
+            CompiledDictionary.HEADER_FORMAT,
+            CompiledDictionary.MAGIC,
+            CompiledDictionary.VERSION,
+            flags,
+            source_stat.st_mtime_ns,
+            source_stat.st_size,
+            sha256,
+            len(dictionary),
+            len(pool),
+            len(dictionary.page_starts),
+            dictionary.skipped_lines
+        )
+        return header\
+            + CompiledDictionary.pack_column(array('Q', dictionary.page_offsets))\
+            + CompiledDictionary.pack_column(array('I', dictionary.page_starts))\
+            + dictionary.levels.tobytes() + dictionary.types.tobytes() + CompiledDictionary.pack_column(offsets) + bytes(pool)
+
+    # Converts an array of numbers to little-endian bytes
+    def pack_column(column: array) -> bytes:
+        if sys.byteorder != "little":
+            column = array(column.typecode, column)
+            column.byteswap()
+        return column.tobytes()
+
+    # Converts little-endian bytes to an array of numbers of the given type
+    def unpack_column(typecode: str, data: bytes) -> array:
+        column = array(typecode)
+        column.frombytes(data)
+        if sys.byteorder != "little":
+            column.byteswap()
+        return column
+
+    # Returns the SHA-256 hash of a file's contents
+    def hash_file(filepath: str) -> bytes:
+        sha256 = hashlib.sha256()
+        with open(filepath, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b""):
+                sha256.update(chunk)
+        return sha256.digest()
+
+    # Suffix added to a dictionary file's path to get the path of its compiled file
+    FILE_SUFFIX = ".bin"
+    # Magic bytes at the beginning of a compiled dictionary file, and version of the format
+    MAGIC = b"SMDC"
+    VERSION = 3
+    # Header: magic, version, flags, source mtime (ns), source size, source SHA-256, words count, pool size, pages count,
+    # and the number of invalid lines of the text file that were skipped. Its size is a multiple of 8 bytes,
+    # so that the 64-bit page offsets after it are aligned
+    HEADER_FORMAT = "<4sHHqQ32sIIII"
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    # Flags marking that the dictionary file did not specify one of its languages
+    FLAG_NO_LANGUAGE_A = 1
+    FLAG_NO_LANGUAGE_B = 2
+    # Size of the string pool buffered in memory by compile_streamed() before the columns are written out
+    STREAM_BUFFER_BYTES = 1 << 20
+
+# A class for a read-only sequence of terms in the string pool of a mapped compiled dictionary.
+# Terms of one language are every other string of the pool, so term i is string (first + 2 * i).
+# Terms are decoded when they are accessed, and nothing is kept, so the only copy of the pool is the mapped file.
+class MappedTerms:
+    def __init__(self, pool: memoryview, offsets: memoryview, first: int, count: int):
+        self.pool = pool
+        self.offsets = offsets
+        self.first = first
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    # Returns the term for an integer index, or a list of terms for a slice
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[idx] for idx in range(*key.indices(self.count))]
+        if key < 0:
+            key += self.count
+        if key < 0 or key >= self.count:
+            raise IndexError("term index out of range")
+        string_idx = self.first + 2 * key
+        return str(self.pool[self.offsets[string_idx]:self.offsets[string_idx + 1]], "utf-8")
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield self[idx]
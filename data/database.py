@@ -1,53 +1,407 @@
 from user import User
 from logger import Logger
 from word import Word
-from dictionary import Dictionary
+from dictionary import Dictionary, LazyDictionary
+from data.compiled_dictionary import CompiledDictionary
+from data.journal import Journal
+from spaced_repetition import Schedule
+from array import array
+from collections import OrderedDict
+import functools
 import os
+import threading
 
 # A class for the database of the application.
-# It keeps track of all the data and reads/writes it to text files.
+# It keeps track of all the data and reads/writes it to text files,
+# or to another storage backend (like SqliteStorage) if one is given.
 class Database:
-    # Creates an empty database
-    def __init__(self):
+    # Creates an empty database.
+    # If a storage backend is given, users and dictionaries are loaded from it and changes are saved to it, instead of text files.
+    def __init__(self, storage = None):
+        self.storage = storage
         self.users = []
+        # Index of the users by their username. Usernames are unique
+        self.users_by_username = {}
+        # File that users were loaded from, and the journal of changes to them since the file was last written
+        self.users_filepath = None
+        # Users of the users file (or the storage backend) that are not loaded yet, when users are loaded lazily.
+        # Keys are usernames, values are (byte offset of the user's line in the file, user's password hash).
+        # Users of a storage backend have no offset, it's None
+        self.user_records = {}
+        # Whether users of the storage backend are indexed one by one, on first access by their username,
+        # instead of all of them up front. Then user_records has only the users that were accessed
+        self.users_indexed_on_demand = False
+        self.journal = None
+        # Locks of the users that are logged in, by username, so that a user can be logged in only once at a time
+        self.user_locks = {}
         self.dictionaries = []
         self.dict_filepaths = []
+        # Index of the dictionaries by their pair of languages.
+        # Keys are unordered pairs of languages (frozensets), values are (dictionary, language A of the dictionary)
+        # so that the orientation of the dictionary is known without looking at it.
+        self.language_pairs = {}
+        # All unique languages across the dictionaries, in the order they were first seen
+        self.languages = []
+        # For each language, the set of languages it has a dictionary with
+        self.paired_languages = {}
+        # Dictionaries composed through a pivot language, for pairs without a dictionary of their own.
+        # Keys are unordered pairs of languages, like in language_pairs. The least recently used ones are dropped first,
+        # when the composed dictionaries have more than COMPOSED_DICTIONARIES_MAX_WORDS words together
+        self.composed_dictionaries = OrderedDict()
+        self.composed_lock = threading.Lock()
 
 ########## User ##########
 
-    # Exports users to a file
+    # Exports users to a file.
+    # The file is written to a temporary file first and then replaces the old one, so a crash never leaves it half-written.
+    # Users that are not loaded yet are copied from the users file verbatim, without parsing them.
+    # If this is the file that users were loaded from, its journal is emptied, because all the changes are now in the file.
     def export_users(self, filepath: str) -> None:
-        file = open(filepath, 'w')
-        # Write all the users
-        for user in self.users:
-            # Serialize each user
-            serialized = Database.serialize_user(user)
-            # and write it to a line of the file
-            file.write(serialized + "\n")
-        file.close()
+        with Logger.span("Database.export_users"):
+            # Users that are not loaded from a storage backend yet are not in any file, so they are loaded now
+            if self.storage is not None:
+                self.index_all_users()
+                for username in list(self.user_records):
+                    self.get_user(username)
+            temp_filepath = filepath + ".tmp"
+            file = open(temp_filepath, 'wb')
+            written_usernames = set()
+            # Offsets of the not loaded users in the new file
+            new_user_records = {}
+            # First go through the users file, so that users keep their order.
+            # Not loaded users are copied, loaded ones are serialized again
+            if self.user_records:
+                source = open(self.users_filepath, 'rb')
+                offset = 0
+                for line in source:
+                    username = line.split(Database.PROPERTY_SEPARATOR.encode(), 1)[0].decode("utf-8")
+                    record = self.user_records.get(username)
+                    if record is not None and record[0] == offset:
+                        new_user_records[username] = (file.tell(), record[1])
+                        file.write(line if line.endswith(b"\n") else line + b"\n")
+                        written_usernames.add(username)
+                    elif username in self.users_by_username and username not in written_usernames:
+                        file.write((Database.serialize_user(self.users_by_username[username]) + "\n").encode("utf-8"))
+                        written_usernames.add(username)
+                    offset += len(line)
+                source.close()
+            # Write all the (remaining) users
+            for user in self.users:
+                if user.username in written_usernames:
+                    continue
+                # Serialize each user
+                serialized = Database.serialize_user(user)
+                # and write it to a line of the file
+                file.write((serialized + "\n").encode("utf-8"))
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+            os.replace(temp_filepath, filepath)
+            if filepath == self.users_filepath:
+                self.user_records = new_user_records
+                if self.journal is not None:
+                    self.journal.clear()
 
-    # Loads users from a file
-    def load_users(self, filepath: str) -> None:
-        self.users = []
+    # Saves the changes to users.
+    # Changes are already saved in the journal as they happen, so the users file is rewritten
+    # (and the journal emptied) only if the journal has grown big.
+    # With a storage backend, the changes it has buffered are written.
+    def save_users(self) -> None:
+        with Logger.span("Database.save_users"):
+            if self.storage is not None:
+                self.storage.flush()
+                return
+            if self.journal is None:
+                return
+            if self.journal.records_count >= Database.JOURNAL_COMPACTION_THRESHOLD:
+                self.export_users(self.users_filepath)
+            self.journal.close()
+
+    # Loads users from a file, and then applies the changes from the file's journal.
+    # Later changes to the users should be recorded to the journal with the record_* functions.
+    # If lazy = True, only usernames, password hashes and the positions of users in the file are read.
+    # The rest of a user is loaded on first access with get_user().
+    # With a storage backend, users are loaded from it and the file is not needed. If lazy = True, nothing is read up front:
+    # a user is indexed on first access by their username, reading only what the storage needs for them (e.g. a single shard).
+    def load_users(self, filepath: str = None, lazy: bool = False) -> None:
+        with Logger.span("Database.load_users"):
+            self.users = []
+            self.users_by_username = {}
+            self.user_records = {}
+            self.users_indexed_on_demand = False
+            if self.storage is not None:
+                if lazy:
+                    self.users_indexed_on_demand = True
+                else:
+                    self.load_users_from_storage()
+                return
+            self.users_filepath = filepath
+            if self.journal is not None:
+                self.journal.close()
+            if lazy:
+                self.index_users()
+                self.replay_journal()
+                return
+            try:
+                file = open(filepath, 'r', encoding = "utf-8")
+            except FileNotFoundError:
+                # If file is not found act as if it's empty
+                file = []
+            # Traverse lines of the file
+            for line_idx, line in enumerate(file):
+                serialized = line.strip()
+                user = Database.deserialize_user(serialized)
+                if user is None:
+                    Logger.log_error("Invalid user on line {} of file {} will be skipped.", line_idx + 1, filepath)
+                    continue
+                # Usernames must be unique, so only the first user with a given username is kept
+                if user.username in self.users_by_username:
+                    Logger.log_error("Duplicate username {} on line {} of file {}. The user will be skipped.", user.username, line_idx + 1, filepath)
+                    continue
+                # Set up user's dictionaries.
+                self.setup_user_dictionaries(user)
+                # Set up user's confidences
+                self.setup_user_confidences(user)
+                # Add the user to the database
+                self.add_user(user)
+            if file:
+                file.close()
+            self.replay_journal()
+
+    # Indexes the users in the users file, without loading them.
+    # Only the username and password hash of each user are read, together with the position of the user in the file
+    def index_users(self) -> None:
         try:
-            file = open(filepath, 'r')
+            file = open(self.users_filepath, 'rb')
         except FileNotFoundError:
             # If file is not found act as if it's empty
             return
-        # Traverse lines of the file
+        offset = 0
         for line_idx, line in enumerate(file):
-            serialized = line.strip()
-            user = Database.deserialize_user(serialized)
+            parts = line.split(Database.PROPERTY_SEPARATOR.encode(), 2)
+            # The rest of the properties are checked when the user is loaded
+            if len(parts) < 3:
+                Logger.log_error("Invalid user on line {} of file {} will be skipped.", line_idx + 1, self.users_filepath)
+            else:
+                username = parts[0].decode("utf-8")
+                if self.has_user(username):
+                    Logger.log_error("Duplicate username {} on line {} of file {}. The user will be skipped.", username, line_idx + 1, self.users_filepath)
+                else:
+                    self.user_records[username] = (offset, parts[1])
+            offset += len(line)
+        file.close()
+
+    # Loads a user that was indexed but not loaded yet, and adds it to the database. Returns the user.
+    # Returns None if the user's line in the users file turns out to be invalid.
+    def load_indexed_user(self, username: str) -> User:
+        offset, _ = self.user_records.pop(username)
+        if self.storage is not None:
+            user = self.storage.load_user(username)
+            if user is None:
+                Logger.log_error("Invalid user {} in storage will be skipped.", username)
+                return None
+        else:
+            file = open(self.users_filepath, 'rb')
+            file.seek(offset)
+            line = file.readline()
+            file.close()
+            user = Database.deserialize_user(line.decode("utf-8").strip())
             if user is None:
-                Logger.log_error("Invalid user on line {} of file {} will be skipped.".format(line_idx + 1, filepath))
+                Logger.log_error("Invalid user {} in file {} will be skipped.", username, self.users_filepath)
+                return None
+        self.setup_user_dictionaries(user)
+        self.setup_user_confidences(user)
+        # Not through add_user(), which would find the user in the storage again when users are indexed on demand
+        self.users.append(user)
+        self.users_by_username[user.username] = user
+        return user
+
+    # Indexes the users in the storage backend, without loading them.
+    # Only their usernames and password hashes are read, the rest of a user is loaded from the storage by get_user()
+    def index_users_from_storage(self) -> None:
+        # Users that were indexed (or loaded) on demand already are not duplicates
+        known_usernames = set(self.users_by_username) | set(self.user_records)
+        self.users_indexed_on_demand = False
+        for username, password_hash in self.storage.index_users():
+            if username in known_usernames:
+                continue
+            if self.has_user(username):
+                Logger.log_error("Duplicate username {} in storage. The user will be skipped.", username)
+                continue
+            self.user_records[username] = (None, password_hash)
+
+    # Loads users from the storage backend
+    def load_users_from_storage(self) -> None:
+        for user in self.storage.load_users():
+            if user.username in self.users_by_username:
+                Logger.log_error("Duplicate username {} in storage. The user will be skipped.", user.username)
                 continue
-            # Set up user's dictionaries.
             self.setup_user_dictionaries(user)
-            # Set up user's confidences
             self.setup_user_confidences(user)
-            # Add the user to the list
-            self.users.append(user)
-        file.close()
+            self.add_user(user)
+
+    # Applies the records from the journal of the users file to the loaded users
+    def replay_journal(self) -> None:
+        journal_filepath = Journal.get_filepath(self.users_filepath)
+        records_count = 0
+        for line_idx, kind, fields in Journal.read(journal_filepath, Database.JOURNAL_RECORD_FIELDS):
+            records_count += 1
+            if not self.apply_journal_record(kind, fields):
+                Logger.log_error("Invalid record on line {} of journal {} will be skipped.", line_idx + 1, journal_filepath)
+        self.journal = Journal(journal_filepath, records_count)
+
+    # Applies a single journal record to the users. Returns False if the record is invalid.
+    # Records hold the new values rather than the differences, so applying a record twice is the same as applying it once.
+    def apply_journal_record(self, kind: str, fields: list[str]) -> bool:
+        if len(fields) != Database.JOURNAL_RECORD_FIELDS[kind]:
+            return False
+        # A new user - their whole serialized data
+        if kind == Database.RECORD_USER:
+            user = Database.deserialize_user(fields[0])
+            if user is None:
+                return False
+            self.setup_user_dictionaries(user)
+            self.setup_user_confidences(user)
+            self.add_user(user)
+            return True
+        user = self.get_user(fields[0])
+        if user is None:
+            return False
+        try:
+            # A new password hash of a user
+            if kind == Database.RECORD_PASSWORD:
+                user.password = fields[1].encode()
+            # A new active language of a user
+            elif kind == Database.RECORD_LANGUAGE:
+                if fields[1] not in user.active_languages:
+                    user.active_languages.append(fields[1])
+                    user.active_words.append(0)
+                    self.setup_user_dictionaries(user)
+                    self.setup_user_confidences(user)
+            # A new count of active words of a user in one of their languages
+            elif kind == Database.RECORD_ACTIVE_WORDS:
+                lang_idx = int(fields[1])
+                user.active_words[lang_idx] = int(fields[2])
+                self.setup_user_confidences(user)
+            # A new confidence of a user for one of their words
+            elif kind == Database.RECORD_CONFIDENCE:
+                user.confidences[int(fields[1])][int(fields[2])] = int(fields[3])
+            # A new spaced repetition schedule of a user for one of their words
+            elif kind == Database.RECORD_SCHEDULE:
+                schedule = user.schedules[int(fields[1])]
+                Database.set_word_schedule(schedule, int(fields[2]), fields[3])
+        except (ValueError, IndexError, OverflowError):
+            return False
+        return True
+
+    # Records a change to the journal of the users file.
+    # If the journal grows too big, it's folded into the users file.
+    def record(self, kind: str, fields: list[str]) -> None:
+        if self.journal is None:
+            return
+        self.journal.append(kind, fields)
+        if self.journal.records_count >= Database.JOURNAL_COMPACTION_THRESHOLD:
+            self.export_users(self.users_filepath)
+
+    # Records a newly registered user
+    def record_new_user(self, user: User) -> None:
+        if self.storage is not None:
+            self.storage.save_new_user(user)
+            return
+        self.record(Database.RECORD_USER, [Database.serialize_user(user)])
+
+    # Records a new password hash of a user
+    def record_password(self, user: User) -> None:
+        if self.storage is not None:
+            self.storage.save_password(user)
+            return
+        self.record(Database.RECORD_PASSWORD, [user.username, user.password.decode()])
+
+    # Records a new active language of a user
+    def record_new_language(self, user: User, language: str) -> None:
+        if self.storage is not None:
+            self.storage.save_new_language(user, user.active_languages.index(language))
+            return
+        self.record(Database.RECORD_LANGUAGE, [user.username, language])
+
+    # Records a change of a user's count of active words in one of their languages
+    def record_active_words(self, user: User, lang_idx: int) -> None:
+        if self.storage is not None:
+            self.storage.save_active_words(user, lang_idx)
+            return
+        self.record(Database.RECORD_ACTIVE_WORDS, [user.username, str(lang_idx), str(user.active_words[lang_idx])])
+
+    # Records a change of a user's spaced repetition schedule for one of their words
+    def record_schedule(self, user: User, lang_idx: int, word_idx: int) -> None:
+        if self.storage is not None:
+            self.storage.save_schedule(user, lang_idx, word_idx)
+            return
+        schedule = user.schedules[lang_idx]
+        self.record(Database.RECORD_SCHEDULE, [user.username, str(lang_idx), str(word_idx), Database.serialize_word_schedule(schedule, word_idx)])
+
+    # Records a change of a user's confidence for one of their words
+    def record_confidence(self, user: User, lang_idx: int, word_idx: int) -> None:
+        if self.storage is not None:
+            self.storage.save_confidence(user, lang_idx, word_idx)
+            return
+        self.record(Database.RECORD_CONFIDENCE, [user.username, str(lang_idx), str(word_idx), str(user.confidences[lang_idx][word_idx])])
+
+    # Adds a user to the database. Returns False, without adding the user, if their username is already taken
+    def add_user(self, user: User) -> bool:
+        if self.has_user(user.username):
+            return False
+        self.users.append(user)
+        self.users_by_username[user.username] = user
+        return True
+
+    # Returns the user with the given username, or None if there is no such user.
+    # If users are loaded lazily, the user is loaded here on first access.
+    def get_user(self, username: str) -> User:
+        user = self.users_by_username.get(username)
+        if user is None and self.get_user_record(username) is not None:
+            user = self.load_indexed_user(username)
+        return user
+
+    # Returns the password hash of the user with the given username, without loading the user.
+    # Returns None if there is no such user
+    def get_password_hash(self, username: str) -> bytes:
+        user = self.users_by_username.get(username)
+        if user is not None:
+            return user.password
+        record = self.get_user_record(username)
+        if record is not None:
+            return record[1]
+        return None
+
+    # Checks if there is a user with the given username
+    def has_user(self, username: str) -> bool:
+        return username in self.users_by_username or self.get_user_record(username) is not None
+
+    # Returns the record of a user who is indexed but not loaded yet, or None if there is no such user.
+    # When users are indexed on demand, a user who is not indexed yet is looked up in the storage backend and indexed now
+    def get_user_record(self, username: str) -> tuple[int, bytes]:
+        record = self.user_records.get(username)
+        if record is None and self.users_indexed_on_demand and username not in self.users_by_username:
+            password_hash = self.storage.index_user(username)
+            if password_hash is not None:
+                record = self.user_records[username] = (None, password_hash)
+        return record
+
+    # Indexes all the users of the storage backend that are not indexed yet, if users are indexed on demand.
+    # Must be called before going through all the users in user_records
+    def index_all_users(self) -> None:
+        if self.users_indexed_on_demand:
+            self.index_users_from_storage()
+
+    # Locks a user for a session, so that they cannot be logged in by another session at the same time.
+    # Returns False, without waiting, if the user is already locked
+    def lock_user(self, username: str) -> bool:
+        lock = self.user_locks.setdefault(username, threading.Lock())
+        return lock.acquire(blocking = False)
+
+    # Unlocks a user that was locked by lock_user(), at the end of their session
+    def unlock_user(self, username: str) -> None:
+        self.user_locks[username].release()
 
     # Serializes a user to a string. Returns the resulting string.
     def serialize_user(user: User) -> str:
@@ -67,29 +421,28 @@ class Database:
             active_words_serialized += Database.ELEMENTS_SEPARATOR + str(word)
         # Serialize confidences by connecting them with elements separators
         if user.confidences:
-            if user.confidences[0]:
-                confidences_serialized = str(user.confidences[0][0])
-                for confidence in user.confidences[0][1:]:
-                    confidences_serialized += Database.NESTED_ELEMENTS_SEPARATOR + str(confidence)
-            else:
-                confidences_serialized = Database.NESTED_EMPTY_LIST_CHAR
+            lang_confidences_serialized = []
+            for lang_confidences in user.confidences:
+                if lang_confidences:
+                    lang_confidences_serialized.append(Database.NESTED_ELEMENTS_SEPARATOR.join(map(str, lang_confidences)))
+                else:
+                    lang_confidences_serialized.append(Database.NESTED_EMPTY_LIST_CHAR)
+            confidences_serialized = Database.ELEMENTS_SEPARATOR.join(lang_confidences_serialized)
         else:
             confidences_serialized = Database.EMPTY_LIST_CHAR
-        for lang_confidences in user.confidences[1:]:
-            confidences_serialized += Database.ELEMENTS_SEPARATOR
-            if lang_confidences:
-                confidences_serialized += str(lang_confidences[0])
-            else:
-                confidences_serialized += Database.NESTED_EMPTY_LIST_CHAR
-            for confidence in lang_confidences[1:]:
-                confidences_serialized += Database.NESTED_ELEMENTS_SEPARATOR + str(confidence)
+        # Serialize schedules the same way as confidences
+        if user.schedules:
+            schedules_serialized = Database.ELEMENTS_SEPARATOR.join(Database.serialize_schedule(schedule) for schedule in user.schedules)
+        else:
+            schedules_serialized = Database.EMPTY_LIST_CHAR
         # Serialize the user
         serialized = user.username + Database.PROPERTY_SEPARATOR\
             + user.password.decode() + Database.PROPERTY_SEPARATOR\
             + user.main_language + Database.PROPERTY_SEPARATOR\
             + active_languages_serialized + Database.PROPERTY_SEPARATOR\
             + active_words_serialized + Database.PROPERTY_SEPARATOR\
-            + confidences_serialized
+            + confidences_serialized + Database.PROPERTY_SEPARATOR\
+            + schedules_serialized
         return serialized
 
     # Deserializes a user from a string. The string should be a serialized user.
@@ -98,9 +451,11 @@ class Database:
     #       They need to be set up separately.
     def deserialize_user(serialized: str) -> User:
         parts = serialized.split(Database.PROPERTY_SEPARATOR)
-        # Users have exactly 6 properties
-        if len(parts) != 6:
-            Logger.log_error("Serialized user is invalid. Must have exactly 6 properties.")
+        # Users have exactly 7 properties. Users serialized before there were schedules have 6
+        if len(parts) == 6:
+            parts.append(Database.EMPTY_LIST_CHAR)
+        if len(parts) != 7:
+            Logger.log_error("Serialized user is invalid. Must have exactly 7 properties.")
             return None
         # Extract the properties from the string parts
         username = parts[0]
@@ -111,74 +466,126 @@ class Database:
             active_languages = []
         else:
             active_languages = [lang.strip() for lang in parts[3].split(Database.ELEMENTS_SEPARATOR)]
-        # Handle active words
-        if parts[4] == Database.EMPTY_LIST_CHAR:
-            active_words = []
-        else:
-            active_words = [int(words_count) for words_count in parts[4].split(Database.ELEMENTS_SEPARATOR)]
-        # Handle confidences
-        confidences = []
-        if parts[5] != Database.EMPTY_LIST_CHAR:
-            for lang_confidence_str in parts[5].split(Database.ELEMENTS_SEPARATOR):
-                if lang_confidence_str == Database.NESTED_EMPTY_LIST_CHAR:
-                    confidences.append([])
-                    continue
-                lang_confidences = []
-                for confidence_str in lang_confidence_str.split(Database.NESTED_ELEMENTS_SEPARATOR):
-                    lang_confidences.append(int(confidence_str))
-                confidences.append(lang_confidences)
+        try:
+            # Handle active words
+            if parts[4] == Database.EMPTY_LIST_CHAR:
+                active_words = []
+            else:
+                active_words = [int(words_count) for words_count in parts[4].split(Database.ELEMENTS_SEPARATOR)]
+            # Handle confidences. Confidences of each language are kept in a compact array of bytes
+            confidences = []
+            if parts[5] != Database.EMPTY_LIST_CHAR:
+                for lang_confidence_str in parts[5].split(Database.ELEMENTS_SEPARATOR):
+                    if lang_confidence_str == Database.NESTED_EMPTY_LIST_CHAR:
+                        confidences.append(array('B'))
+                        continue
+                    confidences.append(array('B', map(int, lang_confidence_str.split(Database.NESTED_ELEMENTS_SEPARATOR))))
+            # Handle schedules
+            schedules = []
+            if parts[6] != Database.EMPTY_LIST_CHAR:
+                for lang_schedule_str in parts[6].split(Database.ELEMENTS_SEPARATOR):
+                    schedules.append(Database.deserialize_schedule(lang_schedule_str))
+        except (ValueError, OverflowError):
+            Logger.log_error("Serialized user has an invalid number of active words, an invalid confidence or an invalid schedule.")
+            return None
         # Create a user and return it
-        user = User(username, password, main_language, active_languages, active_words, confidences, [])
+        user = User(username, password, main_language, active_languages, active_words, confidences, [], schedules)
         return user
 
+    # Serializes a spaced repetition schedule of a user in one language to a string. Returns the resulting string.
+    # Words are connected with the nested elements separator.
+    def serialize_schedule(schedule: Schedule) -> str:
+        if not len(schedule):
+            return Database.NESTED_EMPTY_LIST_CHAR
+        return Database.NESTED_ELEMENTS_SEPARATOR.join(
+            Database.serialize_word_schedule(schedule, word_idx) for word_idx in range(len(schedule))
+        )
+
+    # Serializes the schedule of a single word - its due day, interval, ease and repetitions. Returns the resulting string
+    def serialize_word_schedule(schedule: Schedule, word_idx: int) -> str:
+        return "{}{sep}{}{sep}{}{sep}{}".format(
+            schedule.due[word_idx], schedule.intervals[word_idx], schedule.eases[word_idx], schedule.repetitions[word_idx],
+            sep = Database.SCHEDULE_FIELDS_SEPARATOR
+        )
+
+    # Deserializes a spaced repetition schedule of a user in one language from a string. Returns the schedule.
+    # Raises ValueError if the string is invalid
+    def deserialize_schedule(serialized: str) -> Schedule:
+        schedule = Schedule()
+        if serialized == Database.NESTED_EMPTY_LIST_CHAR:
+            return schedule
+        words = serialized.split(Database.NESTED_ELEMENTS_SEPARATOR)
+        schedule.resize(len(words))
+        for word_idx, word_schedule_str in enumerate(words):
+            Database.set_word_schedule(schedule, word_idx, word_schedule_str)
+        return schedule
+
+    # Sets the schedule of a single word from its serialized string. Raises ValueError if the string is invalid
+    def set_word_schedule(schedule: Schedule, word_idx: int, serialized: str) -> None:
+        fields = serialized.split(Database.SCHEDULE_FIELDS_SEPARATOR)
+        if len(fields) != 4:
+            raise ValueError("Serialized word schedule must have exactly 4 fields")
+        schedule.due[word_idx] = int(fields[0])
+        schedule.intervals[word_idx] = int(fields[1])
+        schedule.eases[word_idx] = int(fields[2])
+        schedule.repetitions[word_idx] = int(fields[3])
+        # The word's position in the heap is outdated now
+        schedule.heap = None
+
     # Finds the dictionaries that user needs for his active languages.
-    # For each active language, a dictionary is found between it and the user's main language.
+    # For each active language, a dictionary is found between it and the user's main language,
+    # or composed through a pivot language if there is no dictionary between them.
     # User's dictionaries are updated with the found dictionaries
     def setup_user_dictionaries(self, user: User) -> None:
         user.dictionaries = []
         # Traverse active languages, looking for a dictionary for each one
         for language in user.active_languages:
-            dict_found = False
-            for dictionary in self.dictionaries:
-                # We are looking for a dictionary with one of its languages being user's main language
-                # and the other being the current active language in the traversal. They can be either (A,B) or (B,A)
-                if (dictionary.language_a == user.main_language and dictionary.language_b == language)\
-                or (dictionary.language_a == language and dictionary.language_b == user.main_language):
-                    user.dictionaries.append(dictionary)
-                    dict_found = True
-                    break
+            # We are looking for a dictionary with one of its languages being user's main language
+            # and the other being the current active language in the traversal. They can be either (A,B) or (B,A)
+            dictionary = self.get_or_compose_dictionary(user.main_language, language)
+            if dictionary is not None:
+                user.dictionaries.append(dictionary)
             # If a dictionary is not found for this active language, this is a problem.
             # Should not happen because if there is no such dictionary then the option of this active language
             # should not have been allowed for the user.
             # If it happens for some reason, log error and append None so that the index matching is kept for the rest of the languages
-            if not dict_found:
-                Logger.log_error(("A dictionary cannot be found between user's main language ({})"\
-                    + " and one of their active languages ({}).").format(user.main_language, language))
+            else:
+                Logger.log_error("A dictionary cannot be found between user's main language ({})"\
+                    + " and one of their active languages ({}).", user.main_language, language)
                 user.dictionaries.append(None)
 
     # Setup user's confidences.
     # If there are missing confidence values, this function will create them and initialize to 0.
     # If there are more than needed, it will cut the remaining part.
+    # Confidences are grown and cut in place, without copying the existing ones.
+    # User's schedules are set up too, so that they always match the confidences.
     def setup_user_confidences(self, user: User) -> None:
+        Database.setup_user_schedules(user)
         languages_count = len(user.active_languages)
-        # If there are no confidences, create all of them, fill with 0s
-        if not user.confidences:
-            user.confidences = []
-            for lang_idx in range(languages_count):
-                user.confidences.append([0] * user.active_words[lang_idx])
-            return
         # If for some of the languages that have confidences, the confidences are fewer than the active words, fill up with 0s
-        for lang_idx in range(len(user.confidences)):
-            if len(user.confidences[lang_idx]) < user.active_words[lang_idx]:
-                user.confidences[lang_idx] += [0] * (user.active_words[lang_idx] - len(user.confidences[lang_idx]))
-            elif len(user.confidences[lang_idx]) > user.active_words[lang_idx]:
-                user.confidences[lang_idx] = user.confidences[lang_idx][:user.active_words[lang_idx]]
+        for lang_idx in range(min(len(user.confidences), languages_count)):
+            lang_confidences = user.confidences[lang_idx]
+            if len(lang_confidences) < user.active_words[lang_idx]:
+                lang_confidences.frombytes(bytes(user.active_words[lang_idx] - len(lang_confidences)))
+            elif len(lang_confidences) > user.active_words[lang_idx]:
+                del lang_confidences[user.active_words[lang_idx]:]
         # If some languages don't have confidences, create and fill with 0s
         if len(user.confidences) < languages_count:
             for lang_idx in range(len(user.confidences), languages_count):
-                user.confidences.append([0] * user.active_words[lang_idx])
+                user.confidences.append(array('B', bytes(user.active_words[lang_idx])))
         elif len(user.confidences) > languages_count:
-            user.confidences = user.confidences[:languages_count]
+            del user.confidences[languages_count:]
+
+    # Setup user's spaced repetition schedules, the same way as their confidences
+    def setup_user_schedules(user: User) -> None:
+        languages_count = len(user.active_languages)
+        if len(user.schedules) > languages_count:
+            del user.schedules[languages_count:]
+        while len(user.schedules) < languages_count:
+            user.schedules.append(Schedule())
+        for lang_idx, schedule in enumerate(user.schedules):
+            if len(schedule) != user.active_words[lang_idx]:
+                schedule.resize(user.active_words[lang_idx])
 
 ########## Word ##########
 
@@ -221,36 +628,53 @@ class Database:
 
 ########## Dictionary ##########
 
-    # Writes a dictionary to a file
+    # Writes a dictionary to a file.
+    # Each page begins with an empty line, so the layout of a dictionary that was read from a file is kept
     def write_dictionary(dictionary: Dictionary, filepath: str) -> None:
         file = open(filepath, 'w', encoding = "utf-8")
         # Write the two languages
         file.write(Database.LANGUAGE_A_PREFIX + dictionary.language_a + "\n")
         file.write(Database.LANGUAGE_B_PREFIX + dictionary.language_b + "\n")
-        # Write all the words
-        for word in dictionary.words:
-            # Serialize each word
-            serialized = Database.serialize_word(word)
-            # and write it to a line of the file
-            file.write(serialized + "\n")
+        # Write all the words, page by page
+        for page_idx in range(dictionary.get_pages_count()):
+            file.write("\n")
+            for word in dictionary.get_page(page_idx):
+                # Serialize each word
+                serialized = Database.serialize_word(word)
+                # and write it to a line of the file
+                file.write(serialized + "\n")
         file.close()
 
-    # Reads a dictionary from a file. Returns the dictionary
+    # Reads a dictionary from a file. Returns the dictionary.
+    # The page index is built while the words are read: an empty line means that the next word begins a new page.
+    # The file is read as bytes, so that the byte offset of each page's first line is known
     def read_dictionary(filepath: str) -> Dictionary:
         try:
-            file = open(filepath, 'r', encoding = "utf-8")
+            file = open(filepath, 'rb')
         except FileNotFoundError:
-            Logger.log_error("Requested dictionary file does not exist - {}".format(filepath))
+            Logger.log_error("Requested dictionary file does not exist - {}", filepath)
             return None
         language_a = None
         language_b = None
-        words = []
+        dictionary = Dictionary(None, None)
         word_index = 0
+        offset = 0
+        skipped_lines = 0
+        # The first word begins the first page, even without an empty line before it
+        new_page = True
         # Traverse lines of the file
-        for line_idx, line in enumerate(file):
-            # For now skip empty lines
-            # TODO: An empty line should indicate next page, we should keep track of the page of each word
-            if len(line) <= 1:
+        for line_idx, raw_line in enumerate(file):
+            line_offset = offset
+            offset += len(raw_line)
+            try:
+                line = raw_line.decode("utf-8")
+            except UnicodeDecodeError:
+                Logger.log_error("Line {} of dictionary file {} is not valid UTF-8 and will be skipped.", line_idx + 1, filepath)
+                skipped_lines += 1
+                continue
+            # An empty line means that the next word begins a new page
+            if len(line.strip()) == 0:
+                new_page = True
                 continue
             # Handle lines that specify the languages
             if line.startswith(Database.LANGUAGE_A_PREFIX):
@@ -263,17 +687,54 @@ class Database:
             serialized = line.strip()
             word = Database.deserialize_word(serialized, word_index)
             if word is None:
-                Logger.log_error("Invalid word on line {} of dictionary file {} will be skipped.".format(line_idx + 1, filepath))
+                Logger.log_error("Invalid word on line {} of dictionary file {} will be skipped.", line_idx + 1, filepath)
+                skipped_lines += 1
                 continue
+            if new_page:
+                dictionary.start_page(line_offset)
+                new_page = False
             word_index += 1
-            words.append(word)
+            dictionary.append_word(word)
         file.close()
-        # Create a dictionary and return it
-        dictionary = Dictionary(language_a, language_b, words)
+        # Set the languages of the dictionary and return it
+        dictionary.language_a = language_a
+        dictionary.language_b = language_b
+        dictionary.skipped_lines = skipped_lines
         return dictionary
 
-    # Exports all the dictionaries in the database to their files
+    # Reads a single page of a dictionary file, given the byte offset of the page's first line.
+    # Words are read until the next empty line. Returns a dictionary with the words of the page, without languages,
+    # or None if the file cannot be read
+    def read_dictionary_page(filepath: str, offset: int) -> Dictionary:
+        try:
+            file = open(filepath, 'rb')
+        except FileNotFoundError:
+            Logger.log_error("Requested dictionary file does not exist - {}", filepath)
+            return None
+        page = Dictionary(None, None)
+        with file:
+            file.seek(offset)
+            for raw_line in file:
+                try:
+                    line = raw_line.decode("utf-8")
+                except UnicodeDecodeError:
+                    Logger.log_error("A line of dictionary file {} is not valid UTF-8 and will be skipped.", filepath)
+                    continue
+                if len(line.strip()) == 0:
+                    break
+                if line.startswith(Database.LANGUAGE_A_PREFIX) or line.startswith(Database.LANGUAGE_B_PREFIX):
+                    continue
+                # Invalid words are skipped, the same way as when the whole file is read
+                word = Database.deserialize_word(line.strip(), len(page))
+                if word is not None:
+                    page.append_word(word)
+        return page
+
+    # Exports all the dictionaries in the database to their files, or to the storage backend if there is one
     def export_dictionaries(self):
+        if self.storage is not None:
+            self.storage.export_dictionaries(self.dictionaries, self.dict_filepaths)
+            return
         if len(self.dictionaries) != len(self.dictionaries):
             Logger.log_error("Different number of dictionaries and filepaths to them.")
             return
@@ -282,18 +743,136 @@ class Database:
             Database.write_dictionary(dictionary, filepath)
 
     # Loads dictionaries to the database from text files.
-    # If filepaths are not provided, the files from the default dictionary directory will be used
-    def load_dictionaries(self, filepaths: list[str] = []):
-        if not filepaths:
-            filepaths = Database.get_dict_filepaths_from_default_directory()
-        self.dictionaries = []
-        self.dict_filepaths = filepaths
-        # Traverse filepaths
+    # If filepaths are not provided, the dictionaries from the storage backend will be used,
+    # or if there is no storage backend (or it has no dictionaries), the files from the default dictionary directory will be used.
+    # If parallel = True and the dictionary files are big enough together, they are parsed in a process pool.
+    # If lazy = True, only the languages of the dictionary files are read, and the words of a dictionary are loaded on first access.
+    # Either way the dictionaries end up in the same order as their filepaths.
+    def load_dictionaries(self, filepaths: list[str] = [], parallel: bool = False, lazy: bool = False):
+        with Logger.span("Database.load_dictionaries"):
+            if not filepaths and self.storage is not None:
+                self.dictionaries, self.dict_filepaths = self.storage.load_dictionaries()
+                if self.dictionaries:
+                    self.build_language_index()
+                    return
+            if not filepaths:
+                filepaths = Database.get_dict_filepaths_from_default_directory()
+            self.dictionaries = []
+            self.dict_filepaths = filepaths
+            dictionaries = None
+            if lazy:
+                dictionaries = [Database.load_dictionary_lazily(filepath) for filepath in filepaths]
+            elif parallel and not Database.MAP_COMPILED_DICTIONARIES and Database.is_worth_loading_in_parallel(filepaths):
+                # Mapped dictionaries cannot be sent from the worker processes, and mapping a compiled file is fast anyway
+                dictionaries = Database.load_dictionaries_in_parallel(filepaths)
+            if dictionaries is not None:
+                self.dictionaries = dictionaries
+            else:
+                # Traverse filepaths
+                for filepath in filepaths:
+                    # Load the dictionary from each file
+                    dictionary = Database.load_dictionary(filepath)
+                    # Add it to the database's dictionaries
+                    self.dictionaries.append(dictionary)
+            self.build_language_index()
+
+    # Checks if dictionary files are many and big enough, so that loading them in a process pool pays off.
+    # For a small corpus starting the worker processes takes longer than just loading the files.
+    def is_worth_loading_in_parallel(filepaths: list[str]) -> bool:
+        if len(filepaths) < 2:
+            return False
+        total_size = 0
         for filepath in filepaths:
-            # Read the dictionary from each file
-            dictionary = Database.read_dictionary(filepath)
-            # Add it to the database's dictionaries
-            self.dictionaries.append(dictionary)
+            try:
+                total_size += os.path.getsize(filepath)
+            except OSError:
+                pass
+        return total_size >= Database.PARALLEL_LOAD_MIN_BYTES
+
+    # Loads dictionaries from files in a process pool. Returns the dictionaries in the same order as the filepaths.
+    # Messages logged by the workers are printed here, file by file in the same order.
+    # Returns None if the process pool cannot be used, so that the caller can load the dictionaries serially.
+    def load_dictionaries_in_parallel(filepaths: list[str]) -> list[Dictionary]:
+        # Imported here, because process pools are slow to import and rarely needed
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        dictionaries = []
+        try:
+            with ProcessPoolExecutor(max_workers = Database.PARALLEL_LOAD_MAX_WORKERS) as executor:
+                for dictionary, messages in executor.map(Database.load_dictionary_captured, filepaths):
+                    Logger.replay(messages)
+                    dictionaries.append(dictionary)
+        except (BrokenProcessPool, OSError):
+            Logger.log_warning("Cannot load dictionaries in parallel, they will be loaded one by one.")
+            return None
+        return dictionaries
+
+    # Loads a dictionary from a file, capturing the messages logged meanwhile.
+    # Returns the dictionary and the captured messages. Runs in the worker processes of parallel loading.
+    def load_dictionary_captured(filepath: str) -> tuple[Dictionary, list[str]]:
+        Logger.start_capture()
+        try:
+            dictionary = Database.load_dictionary(filepath)
+        finally:
+            messages = Logger.stop_capture()
+        return dictionary, messages
+
+    # Loads a dictionary from a file. Returns the dictionary.
+    # If compiled dictionaries are used, the dictionary is loaded from its compiled file, skipping the text parsing.
+    # If the compiled file is missing or outdated, the text file is read and compiled again for the next load.
+    def load_dictionary(filepath: str) -> Dictionary:
+        if not Database.USE_COMPILED_DICTIONARIES:
+            return Database.read_dictionary(filepath)
+        dictionary = CompiledDictionary.load(filepath, Database.MAP_COMPILED_DICTIONARIES)
+        if dictionary is not None:
+            return dictionary
+        dictionary = Database.read_dictionary(filepath)
+        if dictionary is not None and CompiledDictionary.compile(dictionary, filepath) and Database.MAP_COMPILED_DICTIONARIES:
+            # Use the mapped file rather than the dictionary that was just parsed, so that it's shared with other processes
+            mapped_dictionary = CompiledDictionary.load(filepath, True)
+            if mapped_dictionary is not None:
+                dictionary = mapped_dictionary
+        return dictionary
+
+    # Returns a dictionary of a file whose words are loaded on first access.
+    # Only the languages at the top of the file are read now. If the file doesn't start with both languages, it's loaded fully.
+    # If the file has an up-to-date compiled file, its page index is read from there, so its pages can be loaded one by one
+    def load_dictionary_lazily(filepath: str) -> Dictionary:
+        languages = Database.read_dictionary_languages(filepath)
+        if languages is None:
+            return Database.load_dictionary(filepath)
+        page_index_loader = None
+        if Database.USE_COMPILED_DICTIONARIES:
+            page_index_loader = functools.partial(CompiledDictionary.read_page_index, filepath)
+        return LazyDictionary(
+            languages[0],
+            languages[1],
+            functools.partial(Database.load_dictionary, filepath),
+            page_index_loader,
+            functools.partial(Database.read_dictionary_page, filepath)
+        )
+
+    # Reads the languages from the lines at the top of a dictionary file, before its first word.
+    # Returns (language A, language B), or None if the file cannot be read or doesn't start with both languages
+    def read_dictionary_languages(filepath: str) -> tuple[str, str]:
+        language_a = None
+        language_b = None
+        try:
+            with open(filepath, 'r', encoding = "utf-8") as file:
+                for line in file:
+                    if len(line.strip()) == 0:
+                        continue
+                    if line.startswith(Database.LANGUAGE_A_PREFIX):
+                        language_a = line[len(Database.LANGUAGE_A_PREFIX):].strip()
+                    elif line.startswith(Database.LANGUAGE_B_PREFIX):
+                        language_b = line[len(Database.LANGUAGE_B_PREFIX):].strip()
+                    else:
+                        break
+        except (OSError, UnicodeDecodeError):
+            return None
+        if language_a is None or language_b is None:
+            return None
+        return language_a, language_b
 
     # Returns a list of paths to the dictionary files in the default dictionary directory
     def get_dict_filepaths_from_default_directory() -> list[str]:
@@ -305,26 +884,201 @@ class Database:
                 txt_files.append(filepath)
         return txt_files
 
+    # Adds a dictionary to the database, together with the path to its file
+    def add_dictionary(self, dictionary: Dictionary, filepath: str) -> None:
+        self.dictionaries.append(dictionary)
+        self.dict_filepaths.append(filepath)
+        self.index_dictionary(dictionary)
+
+    # Removes a dictionary, and the path to its file, from the database
+    def remove_dictionary(self, dictionary: Dictionary) -> None:
+        idx = self.dictionaries.index(dictionary)
+        del self.dictionaries[idx]
+        if idx < len(self.dict_filepaths):
+            del self.dict_filepaths[idx]
+        # Another dictionary might be covering the same pair of languages, so rebuild the whole index
+        self.build_language_index()
+
+    # Builds the index of dictionaries by language pairs, and the cached sets of languages, from scratch
+    def build_language_index(self) -> None:
+        self.clear_composed_dictionaries()
+        self.language_pairs = {}
+        self.languages = []
+        self.paired_languages = {}
+        for dictionary in self.dictionaries:
+            self.index_dictionary(dictionary)
+
+    # Adds a dictionary to the index of dictionaries by language pairs.
+    # If there is already a dictionary for the same pair, the first one is kept.
+    def index_dictionary(self, dictionary: Dictionary) -> None:
+        # Dictionaries that failed to load, or don't specify their languages, cannot be indexed
+        if dictionary is None or dictionary.language_a is None or dictionary.language_b is None:
+            return
+        # A new dictionary might cover a composed pair, or be a better pivot for it
+        self.clear_composed_dictionaries()
+        for language in (dictionary.language_a, dictionary.language_b):
+            if language not in self.paired_languages:
+                self.paired_languages[language] = set()
+                self.languages.append(language)
+        pair = frozenset((dictionary.language_a, dictionary.language_b))
+        if pair not in self.language_pairs:
+            self.language_pairs[pair] = (dictionary, dictionary.language_a)
+            self.paired_languages[dictionary.language_a].add(dictionary.language_b)
+            self.paired_languages[dictionary.language_b].add(dictionary.language_a)
+
+    # Returns the dictionary between two languages, in whichever orientation it is. Returns None if there is no such dictionary
+    def get_dictionary_between(self, language_1: str, language_2: str) -> Dictionary:
+        entry = self.language_pairs.get(frozenset((language_1, language_2)))
+        if entry is None:
+            return None
+        return entry[0]
+
+    # Returns the set of languages that have a dictionary with the given language
+    def get_paired_languages(self, language: str) -> set[str]:
+        return self.paired_languages.get(language, set())
+
     # Returns a list of all unique languages across the loaded dictionaries
     def get_all_languages(self) -> list[str]:
-        languages = []
-        for dictionary in self.dictionaries:
-            if dictionary.language_a not in languages:
-                languages.append(dictionary.language_a)
-            if dictionary.language_b not in languages:
-                languages.append(dictionary.language_b)
-        return languages
+        return self.languages.copy()
+
+    # Returns the set of languages that don't have a dictionary with the given language,
+    # but that a dictionary can be composed with, through a pivot language
+    def get_composable_languages(self, language: str) -> set[str]:
+        paired_languages = self.get_paired_languages(language)
+        composable_languages = set()
+        for pivot in paired_languages:
+            composable_languages.update(self.get_paired_languages(pivot))
+        return composable_languages - paired_languages - {language}
+
+    # Returns the pivot language for composing a dictionary between two languages - one that has a dictionary with both of them.
+    # If there are several, the first one in alphabetical order is used, so the choice doesn't depend on the order of loading.
+    # Returns None if there is no such language
+    def get_pivot_language(self, language_1: str, language_2: str) -> str:
+        pivots = (self.get_paired_languages(language_1) & self.get_paired_languages(language_2)) - {language_1, language_2}
+        return min(pivots) if pivots else None
+
+    # Returns the dictionary between two languages, in whichever orientation it is.
+    # If there is no such dictionary, one is composed through a pivot language, once for each pair of languages:
+    # it's kept in the cache of composed dictionaries and shared by everyone who asks for the same pair.
+    # Returns None if there is no dictionary between the languages and none can be composed
+    def get_or_compose_dictionary(self, language_1: str, language_2: str) -> Dictionary:
+        dictionary = self.get_dictionary_between(language_1, language_2)
+        if dictionary is not None or language_1 == language_2:
+            return dictionary
+        pair = frozenset((language_1, language_2))
+        # Users are set up from several threads in the server, and a pair should not be composed by more than one of them
+        with self.composed_lock:
+            dictionary = self.composed_dictionaries.get(pair)
+            if dictionary is not None:
+                self.composed_dictionaries.move_to_end(pair)
+                return dictionary
+            pivot = self.get_pivot_language(language_1, language_2)
+            if pivot is None:
+                return None
+            # The languages are in alphabetical order, so the words are in the same order whichever way the pair is asked for
+            language_a, language_b = sorted((language_1, language_2))
+            with Logger.span("Database.compose_dictionary"):
+                dictionary = Database.compose_dictionary(
+                    self.get_dictionary_between(language_a, pivot), self.get_dictionary_between(pivot, language_b), language_a, pivot, language_b
+                )
+            self.composed_dictionaries[pair] = dictionary
+            # The newest dictionary is kept even if it's bigger than the limit on its own
+            words_count = sum(len(composed) for composed in self.composed_dictionaries.values())
+            while words_count > Database.COMPOSED_DICTIONARIES_MAX_WORDS and len(self.composed_dictionaries) > 1:
+                _, evicted = self.composed_dictionaries.popitem(last = False)
+                words_count -= len(evicted)
+            return dictionary
+
+    # Drops all the composed dictionaries, e.g. when the dictionaries they were composed from change.
+    # Users who were set up with a composed dictionary keep it, later users get a newly composed one
+    def clear_composed_dictionaries(self) -> None:
+        with self.composed_lock:
+            self.composed_dictionaries.clear()
+
+    # Composes a dictionary between languages A and B from a dictionary between A and a pivot language,
+    # and one between the pivot language and B, by joining their words on equal terms in the pivot language.
+    # The second dictionary is indexed by its pivot terms in a hash table, and the words of the first one are looked up in it.
+    # Words are in the order of the first dictionary, then of the second, and keep its pages, so a composed dictionary
+    # has the same words at the same indices every time it's composed from the same dictionaries - users' confidences stay valid.
+    # A composed word has the higher of the two levels, and their type if they have the same one.
+    # Returns the composed dictionary
+    def compose_dictionary(dictionary_1: Dictionary, dictionary_2: Dictionary, language_a: str, pivot: str, language_b: str) -> Dictionary:
+        if dictionary_1.language_a == language_a:
+            terms_1, pivot_terms_1 = dictionary_1.terms_a, dictionary_1.terms_b
+        else:
+            terms_1, pivot_terms_1 = dictionary_1.terms_b, dictionary_1.terms_a
+        if dictionary_2.language_a == pivot:
+            pivot_terms_2, terms_2 = dictionary_2.terms_a, dictionary_2.terms_b
+        else:
+            pivot_terms_2, terms_2 = dictionary_2.terms_b, dictionary_2.terms_a
+        # Hash index of the words of the second dictionary by their pivot term
+        index = {}
+        for idx, term in enumerate(pivot_terms_2):
+            index.setdefault(term, []).append(idx)
+        composed = Dictionary(language_a, language_b)
+        # Different words in the pivot language can join the same pair of terms, it's added only once
+        composed_pairs = set()
+        for page_idx in range(dictionary_1.get_pages_count()):
+            start, stop = dictionary_1.get_page_range(page_idx)
+            page_started = False
+            for idx_1 in range(start, stop):
+                for idx_2 in index.get(pivot_terms_1[idx_1], ()):
+                    pair = (terms_1[idx_1], terms_2[idx_2])
+                    if pair in composed_pairs:
+                        continue
+                    composed_pairs.add(pair)
+                    # Pages without any composed words are skipped, pages are never empty
+                    if not page_started:
+                        composed.start_page()
+                        page_started = True
+                    type_code = dictionary_1.types[idx_1]
+                    if type_code != dictionary_2.types[idx_2]:
+                        type_code = Word.TYPE_CODES[Database.COMPOSED_MIXED_TYPE]
+                    composed.append(pair[0], pair[1], max(dictionary_1.levels[idx_1], dictionary_2.levels[idx_2]), Word.TYPES[type_code])
+        return composed
 
+    # Kinds of records in the journal of the users file, and number of fields of each kind
+    RECORD_USER = "user"
+    RECORD_LANGUAGE = "language"
+    RECORD_ACTIVE_WORDS = "words"
+    RECORD_CONFIDENCE = "confidence"
+    RECORD_SCHEDULE = "schedule"
+    RECORD_PASSWORD = "password"
+    JOURNAL_RECORD_FIELDS = {
+        RECORD_USER: 1,
+        RECORD_LANGUAGE: 2,
+        RECORD_ACTIVE_WORDS: 3,
+        RECORD_CONFIDENCE: 4,
+        RECORD_SCHEDULE: 4,
+        RECORD_PASSWORD: 2
+    }
+    # Number of records in the journal, after which the journal is folded into the users file
+    JOURNAL_COMPACTION_THRESHOLD = 1000
     # String used to separate properties of an object when serializing it
     PROPERTY_SEPARATOR = ", "
     # String used to separate elements of properties with multi elements
     ELEMENTS_SEPARATOR = " & "
     NESTED_ELEMENTS_SEPARATOR = "-"
+    # String used to separate the fields of a single word's schedule
+    SCHEDULE_FIELDS_SEPARATOR = "/"
     # Prefixes of lines in a dictionary file that specify the two languages of the dictionary
     LANGUAGE_A_PREFIX = "__language_a="
     LANGUAGE_B_PREFIX = "__language_b="
     # Default directory for dictionary files
     DEFAULT_DICT_DIRECTORY = "data/dictionaries/"
+    # Whether dictionaries are loaded from compiled files when those are up to date
+    USE_COMPILED_DICTIONARIES = True
+    # Whether compiled dictionary files stay mapped, with the dictionaries reading from them instead of keeping their own copies.
+    # Processes that map the same files share them in memory
+    MAP_COMPILED_DICTIONARIES = False
+    # Minimum total size of dictionary files (in bytes) for them to be loaded in parallel, when parallel loading is requested
+    PARALLEL_LOAD_MIN_BYTES = 4 * 1024 * 1024
+    # Maximum number of worker processes for parallel loading of dictionaries. None means the number of CPUs
+    PARALLEL_LOAD_MAX_WORKERS = None
+    # Maximum number of words of the cached composed dictionaries together
+    COMPOSED_DICTIONARIES_MAX_WORDS = 500000
+    # Type of a composed word whose two words have different types
+    COMPOSED_MIXED_TYPE = "unknown"
     # A character representing an empty list in a serialized object
     EMPTY_LIST_CHAR = "_"
     NESTED_EMPTY_LIST_CHAR = "."
\ No newline at end of file
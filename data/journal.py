@@ -0,0 +1,92 @@
+from logger import Logger
+import os
+
+# A class for an append-only journal of changes to the users' data.
+# Each change is written as a small record on its own line as soon as it happens,
+# so a crash doesn't lose the session and saving a change doesn't rewrite the whole users file.
+# A record consists of a kind and a list of fields, separated by the same separator as user properties.
+class Journal:
+    # Creates a journal for the given file. The file is opened for appending on the first record
+    def __init__(self, filepath: str, records_count: int = 0):
+        self.filepath = filepath
+        self.file = None
+        # Number of records in the journal file
+        self.records_count = records_count
+
+    # Appends a record to the journal and flushes it to the file
+    def append(self, kind: str, fields: list[str]) -> None:
+        if self.file is None:
+            Journal.truncate_incomplete_record(self.filepath)
+            self.file = open(self.filepath, 'a', encoding = "utf-8")
+        self.file.write(Journal.SEPARATOR.join([kind] + fields) + "\n")
+        self.file.flush()
+        if Journal.FSYNC:
+            os.fsync(self.file.fileno())
+        self.records_count += 1
+
+    # Empties the journal. Should be called once its records are folded into the users file
+    def clear(self) -> None:
+        self.close()
+        open(self.filepath, 'w').close()
+        self.records_count = 0
+
+    # Cuts off an incomplete record at the end of a journal file, left by a crash while it was being written.
+    # Otherwise the next record would be appended right after it, on the same line, and both would be lost or misread.
+    # The file is searched backwards from its end for the last line ending, so only its tail is read
+    def truncate_incomplete_record(filepath: str) -> None:
+        try:
+            file = open(filepath, 'r+b')
+        except FileNotFoundError:
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - Journal.TAIL_CHUNK_SIZE)
+                file.seek(chunk_start)
+                line_ending = file.read(position - chunk_start).rfind(b"\n")
+                if line_ending >= 0:
+                    position = chunk_start + line_ending + 1
+                    break
+                position = chunk_start
+            if position < end:
+                file.truncate(position)
+
+    # Closes the journal file
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # Reads the records of a journal file, one by one.
+    # Yields tuples of (line index, kind, fields). The last field of a record can contain the separator.
+    # A missing journal file is the same as an empty one.
+    def read(filepath: str, max_fields: dict[str, int]):
+        try:
+            file = open(filepath, 'r', encoding = "utf-8")
+        except FileNotFoundError:
+            return
+        with file:
+            for line_idx, line in enumerate(file):
+                # A line without a line ending was being written during a crash, so it's incomplete
+                if not line.endswith("\n"):
+                    Logger.log_warning("Incomplete record on line {} of journal {} will be skipped.", line_idx + 1, filepath)
+                    continue
+                kind, _, rest = line[:-1].partition(Journal.SEPARATOR)
+                if kind not in max_fields:
+                    Logger.log_error("Unknown record on line {} of journal {} will be skipped.", line_idx + 1, filepath)
+                    continue
+                yield line_idx, kind, rest.split(Journal.SEPARATOR, max_fields[kind] - 1)
+
+    # Returns the path to the journal of a users file
+    def get_filepath(users_filepath: str) -> str:
+        return users_filepath + Journal.FILE_SUFFIX
+
+    # Separator between the kind and the fields of a record
+    SEPARATOR = ", "
+    # Suffix added to a users file's path to get the path of its journal
+    FILE_SUFFIX = ".journal"
+    # Number of bytes read at a time when looking for the end of the last complete record
+    TAIL_CHUNK_SIZE = 4096
+    # Whether every record is forced to disk with fsync. Without it, records survive a crash of the application but not of the OS
+    FSYNC = False
@@ -0,0 +1,294 @@
+from user import User
+from logger import Logger
+from dictionary import Dictionary
+from data.database import Database
+import json
+import os
+import zlib
+
+# A class for storing users in shards - a directory of N text files, each holding the users whose username hashes to it.
+# Users are written in the same format as in the users file, one per line.
+# A change to a user makes only their shard dirty, and only dirty shards are rewritten.
+# Each shard is written to a temporary file, forced to disk and renamed over the old shard,
+# so a crash leaves every shard either in its old or in its new state, never half-written.
+# Changes are buffered and written in batches, like in SqliteStorage. New users and passwords are written right away.
+#
+# Shards are loaded when they are first needed. Lines of a loaded shard are parsed only when their user is needed,
+# and users that were not parsed are written back as they were.
+# Dictionaries are not kept in the shards, they stay in their text files.
+class ShardedStorage:
+    # Opens the sharded storage in the given directory, creating it if needed.
+    # The number of shards is fixed when the storage is created, and kept in the directory's manifest.
+    # If parallel = True, loading all users parses the shards in a process pool, if they are big enough together.
+    def __init__(self, directory: str, shards_count: int = None, parallel: bool = False):
+        self.directory = directory
+        self.parallel = parallel
+        os.makedirs(directory, exist_ok = True)
+        manifest = ShardedStorage.read_manifest(directory)
+        if manifest is None:
+            self.shards_count = shards_count if shards_count is not None else ShardedStorage.DEFAULT_SHARDS_COUNT
+            ShardedStorage.write_atomically(
+                os.path.join(directory, ShardedStorage.MANIFEST_FILENAME),
+                json.dumps({"version": ShardedStorage.VERSION, "shards": self.shards_count}).encode("utf-8")
+            )
+        else:
+            self.shards_count = manifest["shards"]
+            if shards_count is not None and shards_count != self.shards_count:
+                Logger.log_warning("Sharded storage {} has {} shards, not {}. Use the migration tool to change it.", directory, self.shards_count, shards_count)
+        # Loaded shards, None for shards that are not loaded yet.
+        # A loaded shard is a dictionary of usernames and their users, or their lines if they are not parsed yet
+        self.shards = [None] * self.shards_count
+        # Indices of the shards with changes that are not written yet, and the number of those changes
+        self.dirty_shards = set()
+        self.pending_changes = 0
+
+    # Writes any buffered changes
+    def close(self) -> None:
+        self.flush()
+
+    # Reads the manifest of a sharded storage directory. Returns None if there is none
+    def read_manifest(directory: str) -> dict:
+        try:
+            with open(os.path.join(directory, ShardedStorage.MANIFEST_FILENAME), 'r', encoding = "utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+########## User ##########
+
+    # Loads all users from the shards. Returns a list of users.
+    # NOTE: Users' dictionaries are not set up here, same as in Database.deserialize_user()
+    def load_users(self) -> list[User]:
+        shard_idxs = [shard_idx for shard_idx in range(self.shards_count) if self.shards[shard_idx] is None]
+        filepaths = [self.get_shard_filepath(shard_idx) for shard_idx in shard_idxs]
+        parsed_shards = None
+        if self.parallel and Database.is_worth_loading_in_parallel(filepaths):
+            # Imported here, because process pools are slow to import and rarely needed
+            from concurrent.futures import ProcessPoolExecutor
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                with ProcessPoolExecutor(max_workers = Database.PARALLEL_LOAD_MAX_WORKERS) as executor:
+                    parsed_shards = list(executor.map(ShardedStorage.parse_shard_captured, filepaths))
+            except (BrokenProcessPool, OSError):
+                Logger.log_warning("Cannot load shards in parallel, they will be loaded one by one.")
+        for idx, shard_idx in enumerate(shard_idxs):
+            if parsed_shards is not None:
+                shard, messages = parsed_shards[idx]
+                Logger.replay(messages)
+                self.shards[shard_idx] = shard
+            else:
+                self.load_shard(shard_idx)
+        users = []
+        for shard in self.shards:
+            for username in list(shard):
+                user = self.get_parsed_user(shard, username)
+                if user is not None:
+                    users.append(user)
+        return users
+
+    # Returns a list of (username, password hash) of all the users, without parsing them
+    def index_users(self) -> list[tuple[str, bytes]]:
+        index = []
+        for shard_idx in range(self.shards_count):
+            shard = self.get_shard(shard_idx)
+            for username, user in shard.items():
+                index.append((username, ShardedStorage.get_password_hash(user)))
+        return index
+
+    # Returns the password hash of a single user, without parsing them. Only the user's shard is read.
+    # Returns None if there is no user with this username
+    def index_user(self, username: str) -> bytes:
+        user = self.get_shard(self.get_shard_idx(username)).get(username)
+        if user is None:
+            return None
+        return ShardedStorage.get_password_hash(user)
+
+    # Returns the password hash of a user in a loaded shard, either parsed or still a line
+    def get_password_hash(user) -> bytes:
+        if isinstance(user, User):
+            return user.password
+        return user.split(Database.PROPERTY_SEPARATOR.encode(), 2)[1]
+
+    # Loads a single user. Only the user's shard is read. Returns None if there is no user with this username
+    def load_user(self, username: str) -> User:
+        shard = self.get_shard(self.get_shard_idx(username))
+        if username not in shard:
+            return None
+        return self.get_parsed_user(shard, username)
+
+    # Returns the user with the given username from a loaded shard, parsing it if it's not parsed yet.
+    # Invalid users are removed from the shard, and None is returned
+    def get_parsed_user(self, shard: dict, username: str) -> User:
+        user = shard[username]
+        if isinstance(user, User):
+            return user
+        user = Database.deserialize_user(user.decode("utf-8").strip())
+        if user is None:
+            Logger.log_error("Invalid user {} in sharded storage {} will be skipped.", username, self.directory)
+            del shard[username]
+            return None
+        shard[username] = user
+        return user
+
+    # Replaces all users in the storage with the given users, rewriting every shard
+    def export_users(self, users: list[User]) -> None:
+        self.shards = [{} for _ in range(self.shards_count)]
+        for user in users:
+            self.shards[self.get_shard_idx(user.username)][user.username] = user
+        self.dirty_shards = set(range(self.shards_count))
+        self.flush()
+
+    # Saves a newly registered user
+    def save_new_user(self, user: User) -> None:
+        shard_idx = self.get_shard_idx(user.username)
+        self.get_shard(shard_idx)[user.username] = user
+        self.mark_dirty(shard_idx)
+        self.flush()
+
+    # Saves a new password hash of a user
+    def save_password(self, user: User) -> None:
+        self.mark_dirty(self.get_shard_idx(user.username))
+        self.flush()
+
+    # Saves a new active language of a user
+    def save_new_language(self, user: User, lang_idx: int) -> None:
+        self.save_change(user)
+
+    # Saves a change of a user's count of active words in one of their languages
+    def save_active_words(self, user: User, lang_idx: int) -> None:
+        self.save_change(user)
+
+    # Saves a change of a user's confidence for one of their words
+    def save_confidence(self, user: User, lang_idx: int, word_idx: int) -> None:
+        self.save_change(user)
+
+    # Saves a change of a user's schedule for one of their words
+    def save_schedule(self, user: User, lang_idx: int, word_idx: int) -> None:
+        self.save_change(user)
+
+    # Marks the shard of a changed user dirty, and writes the dirty shards if enough changes are buffered
+    def save_change(self, user: User) -> None:
+        self.mark_dirty(self.get_shard_idx(user.username))
+        if self.pending_changes >= ShardedStorage.BATCH_SIZE:
+            self.flush()
+
+    # Marks a shard dirty, so that it's rewritten on the next flush
+    def mark_dirty(self, shard_idx: int) -> None:
+        self.dirty_shards.add(shard_idx)
+        self.pending_changes += 1
+
+    # Rewrites the dirty shards
+    def flush(self) -> None:
+        for shard_idx in sorted(self.dirty_shards):
+            self.write_shard(shard_idx)
+        self.dirty_shards = set()
+        self.pending_changes = 0
+
+    # Writes a loaded shard to its file. Users that are not parsed are written as they were read
+    def write_shard(self, shard_idx: int) -> None:
+        lines = []
+        for user in self.shards[shard_idx].values():
+            if isinstance(user, User):
+                lines.append((Database.serialize_user(user) + "\n").encode("utf-8"))
+            else:
+                lines.append(user if user.endswith(b"\n") else user + b"\n")
+        ShardedStorage.write_atomically(self.get_shard_filepath(shard_idx), b"".join(lines))
+
+    # Returns a shard, loading it if it's not loaded yet
+    def get_shard(self, shard_idx: int) -> dict:
+        if self.shards[shard_idx] is None:
+            self.load_shard(shard_idx)
+        return self.shards[shard_idx]
+
+    # Loads a shard from its file, without parsing its users
+    def load_shard(self, shard_idx: int) -> None:
+        self.shards[shard_idx] = ShardedStorage.read_shard(self.get_shard_filepath(shard_idx))
+
+    # Reads the lines of a shard file. Returns a dictionary of usernames and their lines.
+    # A missing shard file is the same as an empty one
+    def read_shard(filepath: str) -> dict:
+        shard = {}
+        try:
+            file = open(filepath, 'rb')
+        except FileNotFoundError:
+            return shard
+        with file:
+            for line_idx, line in enumerate(file):
+                parts = line.split(Database.PROPERTY_SEPARATOR.encode(), 2)
+                if len(parts) < 3:
+                    Logger.log_error("Invalid user on line {} of file {} will be skipped.", line_idx + 1, filepath)
+                    continue
+                username = parts[0].decode("utf-8")
+                if username in shard:
+                    Logger.log_error("Duplicate username {} on line {} of file {}. The user will be skipped.", username, line_idx + 1, filepath)
+                    continue
+                shard[username] = line
+        return shard
+
+    # Reads a shard file and parses all its users, capturing the messages logged meanwhile.
+    # Returns the shard and the captured messages. Runs in the worker processes of parallel loading.
+    def parse_shard_captured(filepath: str) -> tuple[dict, list[str]]:
+        Logger.start_capture()
+        try:
+            shard = ShardedStorage.read_shard(filepath)
+            for username, line in list(shard.items()):
+                user = Database.deserialize_user(line.decode("utf-8").strip())
+                if user is None:
+                    # Left as a line, so the main process reports it when it parses it again
+                    continue
+                shard[username] = user
+        finally:
+            messages = Logger.stop_capture()
+        return shard, messages
+
+    # Returns the index of the shard of a username.
+    # The hash must be the same in every run, so Python's hash() of strings, which is randomized, cannot be used
+    def get_shard_idx(self, username: str) -> int:
+        return zlib.crc32(username.encode("utf-8")) % self.shards_count
+
+    # Returns the path to a shard file
+    def get_shard_filepath(self, shard_idx: int) -> str:
+        return os.path.join(self.directory, ShardedStorage.SHARD_FILENAME_FORMAT.format(shard_idx))
+
+    # Writes data to a file atomically: to a temporary file first, which is forced to disk and then renamed over the file.
+    # The directory is forced to disk too, so that the rename survives a crash of the OS
+    def write_atomically(filepath: str, data: bytes) -> None:
+        temp_filepath = filepath + ".tmp"
+        with open(temp_filepath, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filepath, filepath)
+        try:
+            directory_fd = os.open(os.path.dirname(os.path.abspath(filepath)), os.O_RDONLY)
+        except OSError:
+            # Directories cannot be opened on some systems, e.g. Windows
+            return
+        try:
+            os.fsync(directory_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(directory_fd)
+
+########## Dictionary ##########
+
+    # Dictionaries are not kept in the shards, so the ones from the default dictionary directory are used
+    def load_dictionaries(self) -> tuple[list[Dictionary], list[str]]:
+        return [], []
+
+    # Writes the dictionaries back to their files
+    def export_dictionaries(self, dictionaries: list[Dictionary], filepaths: list[str]) -> None:
+        for dictionary, filepath in zip(dictionaries, filepaths):
+            if dictionary is not None:
+                Database.write_dictionary(dictionary, filepath)
+
+    # Number of shards of a new storage
+    DEFAULT_SHARDS_COUNT = 16
+    # Number of buffered changes after which the dirty shards are written
+    BATCH_SIZE = 500
+    # Names of the files in a sharded storage directory
+    MANIFEST_FILENAME = "manifest.json"
+    SHARD_FILENAME_FORMAT = "users-{:04d}.txt"
+    # Version of the layout of a sharded storage directory
+    VERSION = 1
@@ -0,0 +1,357 @@
+from user import User
+from dictionary import Dictionary
+from spaced_repetition import Schedule
+from array import array
+import sqlite3
+
+# A class for storing the application's data in an SQLite database file.
+# It's an alternative to the text files of the default storage, for when there are many users with a lot of progress.
+# Users, their active languages with their counts of active words, their per-word confidences and schedules, and the dictionaries
+# are kept in indexed tables, so a single user or a single change can be read or written without touching the rest.
+# Changes of active words and confidences are buffered and written in batches, each batch in one transaction.
+class SqliteStorage:
+    # Opens (or creates) the SQLite database file at the given path.
+    # If shared = True, the connection can be used from other threads, as long as they don't use it at the same time
+    def __init__(self, filepath: str, shared: bool = False):
+        self.filepath = filepath
+        self.connection = sqlite3.connect(filepath, check_same_thread = not shared)
+        self.connection.executescript(SqliteStorage.SCHEMA)
+        # IDs of the users in the database, by username
+        self.user_ids = {}
+        # Buffered changes, waiting to be written in a batch.
+        # Keys identify the changed value, so that multiple changes of the same value are written once.
+        self.pending_active_words = {}
+        self.pending_confidences = {}
+        self.pending_schedules = {}
+
+    # Closes the database file, writing any buffered changes first
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+########## User ##########
+
+    # Loads all users from the database. Returns a list of users.
+    # NOTE: Users' dictionaries are not set up here, same as in Database.deserialize_user()
+    def load_users(self) -> list[User]:
+        self.flush()
+        users = {}
+        for user_id, username, password, main_language in self.connection.execute(
+            "SELECT id, username, password, main_language FROM users ORDER BY id"
+        ):
+            users[user_id] = User(username, password, main_language, [], [], [], [])
+            self.user_ids[username] = user_id
+        for user_id, language, active_words in self.connection.execute(
+            "SELECT user_id, language, active_words FROM user_languages ORDER BY user_id, lang_idx"
+        ):
+            user = users[user_id]
+            user.active_languages.append(language)
+            user.active_words.append(active_words)
+            user.confidences.append(array('B'))
+            user.schedules.append(Schedule())
+        for user_id, lang_idx, word_idx, confidence in self.connection.execute(
+            "SELECT user_id, lang_idx, word_idx, confidence FROM confidences ORDER BY user_id, lang_idx, word_idx"
+        ):
+            SqliteStorage.put_confidence(users[user_id], lang_idx, word_idx, confidence)
+        for user_id, lang_idx, word_idx, due, interval, ease, repetitions in self.connection.execute(
+            "SELECT user_id, lang_idx, word_idx, due, interval, ease, repetitions FROM schedules ORDER BY user_id, lang_idx, word_idx"
+        ):
+            SqliteStorage.put_schedule(users[user_id], lang_idx, word_idx, due, interval, ease, repetitions)
+        return list(users.values())
+
+    # Returns a list of (username, password hash) of all the users, without loading them
+    def index_users(self) -> list[tuple[str, bytes]]:
+        self.flush()
+        return self.connection.execute("SELECT username, password FROM users ORDER BY id").fetchall()
+
+    # Returns the password hash of a single user, without loading them. Returns None if there is no user with this username
+    def index_user(self, username: str) -> bytes:
+        self.flush()
+        row = self.connection.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row is not None else None
+
+    # Loads a single user from the database. Returns None if there is no user with this username
+    def load_user(self, username: str) -> User:
+        self.flush()
+        row = self.connection.execute(
+            "SELECT id, password, main_language FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        user_id, password, main_language = row
+        self.user_ids[username] = user_id
+        user = User(username, password, main_language, [], [], [], [])
+        for language, active_words in self.connection.execute(
+            "SELECT language, active_words FROM user_languages WHERE user_id = ? ORDER BY lang_idx", (user_id,)
+        ):
+            user.active_languages.append(language)
+            user.active_words.append(active_words)
+            user.confidences.append(array('B'))
+            user.schedules.append(Schedule())
+        for lang_idx, word_idx, confidence in self.connection.execute(
+            "SELECT lang_idx, word_idx, confidence FROM confidences WHERE user_id = ? ORDER BY lang_idx, word_idx", (user_id,)
+        ):
+            SqliteStorage.put_confidence(user, lang_idx, word_idx, confidence)
+        for lang_idx, word_idx, due, interval, ease, repetitions in self.connection.execute(
+            "SELECT lang_idx, word_idx, due, interval, ease, repetitions FROM schedules WHERE user_id = ? ORDER BY lang_idx, word_idx", (user_id,)
+        ):
+            SqliteStorage.put_schedule(user, lang_idx, word_idx, due, interval, ease, repetitions)
+        return user
+
+    # Puts a loaded confidence at its place in a user's confidences.
+    # Words without a saved confidence, that come before it, get confidence 0
+    def put_confidence(user: User, lang_idx: int, word_idx: int, confidence: int) -> None:
+        lang_confidences = user.confidences[lang_idx]
+        if len(lang_confidences) < word_idx:
+            lang_confidences.frombytes(bytes(word_idx - len(lang_confidences)))
+        lang_confidences.append(confidence)
+
+    # Puts a loaded word schedule at its place in a user's schedules.
+    # Words without a saved schedule, that come before it, get a new schedule
+    def put_schedule(user: User, lang_idx: int, word_idx: int, due: int, interval: int, ease: int, repetitions: int) -> None:
+        schedule = user.schedules[lang_idx]
+        if len(schedule) <= word_idx:
+            schedule.resize(word_idx + 1)
+        schedule.due[word_idx] = due
+        schedule.intervals[word_idx] = interval
+        schedule.eases[word_idx] = ease
+        schedule.repetitions[word_idx] = repetitions
+
+    # Replaces all users in the database with the given users, in a single transaction
+    def export_users(self, users: list[User]) -> None:
+        self.pending_active_words = {}
+        self.pending_confidences = {}
+        self.pending_schedules = {}
+        self.user_ids = {}
+        with self.connection:
+            self.connection.execute("DELETE FROM schedules")
+            self.connection.execute("DELETE FROM confidences")
+            self.connection.execute("DELETE FROM user_languages")
+            self.connection.execute("DELETE FROM users")
+            for user in users:
+                self.insert_user(user)
+
+    # Writes a new user with all their data. Should be called inside a transaction
+    def insert_user(self, user: User) -> None:
+        cursor = self.connection.execute(
+            "INSERT INTO users (username, password, main_language) VALUES (?, ?, ?)",
+            (user.username, user.password, user.main_language)
+        )
+        user_id = cursor.lastrowid
+        self.user_ids[user.username] = user_id
+        self.connection.executemany(
+            "INSERT INTO user_languages (user_id, lang_idx, language, active_words) VALUES (?, ?, ?, ?)",
+            [(user_id, lang_idx, language, user.active_words[lang_idx]) for lang_idx, language in enumerate(user.active_languages)]
+        )
+        for lang_idx, lang_confidences in enumerate(user.confidences):
+            self.connection.executemany(
+                "INSERT INTO confidences (user_id, lang_idx, word_idx, confidence) VALUES (?, ?, ?, ?)",
+                [(user_id, lang_idx, word_idx, confidence) for word_idx, confidence in enumerate(lang_confidences)]
+            )
+        for lang_idx, schedule in enumerate(user.schedules):
+            self.connection.executemany(
+                "INSERT INTO schedules (user_id, lang_idx, word_idx, due, interval, ease, repetitions) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, lang_idx) + SqliteStorage.get_word_schedule(schedule, word_idx) for word_idx in range(len(schedule))]
+            )
+
+    # Saves a newly registered user
+    def save_new_user(self, user: User) -> None:
+        with self.connection:
+            self.insert_user(user)
+
+    # Saves a new active language of a user, together with its confidences
+    def save_new_language(self, user: User, lang_idx: int) -> None:
+        user_id = self.get_user_id(user.username)
+        if user_id is None:
+            return
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO user_languages (user_id, lang_idx, language, active_words) VALUES (?, ?, ?, ?)",
+                (user_id, lang_idx, user.active_languages[lang_idx], user.active_words[lang_idx])
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO confidences (user_id, lang_idx, word_idx, confidence) VALUES (?, ?, ?, ?)",
+                [(user_id, lang_idx, word_idx, confidence) for word_idx, confidence in enumerate(user.confidences[lang_idx])]
+            )
+
+    # Saves a new password hash of a user
+    def save_password(self, user: User) -> None:
+        user_id = self.get_user_id(user.username)
+        if user_id is None:
+            return
+        with self.connection:
+            self.connection.execute("UPDATE users SET password = ? WHERE id = ?", (user.password, user_id))
+
+    # Saves a change of a user's count of active words in one of their languages.
+    # New words don't need their confidences saved, because a missing confidence is loaded as 0.
+    # The change is buffered until the next batch is written.
+    def save_active_words(self, user: User, lang_idx: int) -> None:
+        user_id = self.get_user_id(user.username)
+        if user_id is None:
+            return
+        self.pending_active_words[(user_id, lang_idx)] = user.active_words[lang_idx]
+        self.flush_if_needed()
+
+    # Saves a change of a user's confidence for one of their words. The change is buffered until the next batch is written
+    def save_confidence(self, user: User, lang_idx: int, word_idx: int) -> None:
+        user_id = self.get_user_id(user.username)
+        if user_id is None:
+            return
+        self.pending_confidences[(user_id, lang_idx, word_idx)] = user.confidences[lang_idx][word_idx]
+        self.flush_if_needed()
+
+    # Saves a change of a user's spaced repetition schedule for one of their words. The change is buffered until the next batch is written
+    def save_schedule(self, user: User, lang_idx: int, word_idx: int) -> None:
+        user_id = self.get_user_id(user.username)
+        if user_id is None:
+            return
+        self.pending_schedules[(user_id, lang_idx, word_idx)] = SqliteStorage.get_word_schedule(user.schedules[lang_idx], word_idx)
+        self.flush_if_needed()
+
+    # Returns the schedule of a single word, as (word index, due day, interval, ease, repetitions)
+    def get_word_schedule(schedule: Schedule, word_idx: int) -> tuple:
+        return (word_idx, schedule.due[word_idx], schedule.intervals[word_idx], schedule.eases[word_idx], schedule.repetitions[word_idx])
+
+    # Writes the buffered changes if there are enough of them for a batch
+    def flush_if_needed(self) -> None:
+        if len(self.pending_active_words) + len(self.pending_confidences) + len(self.pending_schedules) >= SqliteStorage.BATCH_SIZE:
+            self.flush()
+
+    # Writes all buffered changes in a single transaction
+    def flush(self) -> None:
+        if not self.pending_active_words and not self.pending_confidences and not self.pending_schedules:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE user_languages SET active_words = ? WHERE user_id = ? AND lang_idx = ?",
+                [(active_words, user_id, lang_idx) for (user_id, lang_idx), active_words in self.pending_active_words.items()]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO confidences (user_id, lang_idx, word_idx, confidence) VALUES (?, ?, ?, ?)",
+                [key + (confidence,) for key, confidence in self.pending_confidences.items()]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO schedules (user_id, lang_idx, word_idx, due, interval, ease, repetitions) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, lang_idx) + word_schedule for (user_id, lang_idx, _), word_schedule in self.pending_schedules.items()]
+            )
+        self.pending_active_words = {}
+        self.pending_confidences = {}
+        self.pending_schedules = {}
+
+    # Returns the ID of the user with the given username, or None if there is no such user
+    def get_user_id(self, username: str) -> int:
+        user_id = self.user_ids.get(username)
+        if user_id is None:
+            row = self.connection.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            user_id = row[0]
+            self.user_ids[username] = user_id
+        return user_id
+
+########## Dictionary ##########
+
+    # Loads all dictionaries from the database.
+    # Returns a list of the dictionaries and a list of the paths of the files they originally came from
+    def load_dictionaries(self) -> tuple[list[Dictionary], list[str]]:
+        dictionaries = []
+        filepaths = []
+        for dictionary_id, filepath, language_a, language_b in self.connection.execute(
+            "SELECT id, filepath, language_a, language_b FROM dictionaries ORDER BY id"
+        ).fetchall():
+            dictionary = Dictionary(language_a, language_b)
+            for term_a, term_b, level, type in self.connection.execute(
+                "SELECT term_a, term_b, level, type FROM words WHERE dictionary_id = ? ORDER BY idx", (dictionary_id,)
+            ):
+                dictionary.append(term_a, term_b, level, type)
+            for start, byte_offset in self.connection.execute(
+                "SELECT start, byte_offset FROM dictionary_pages WHERE dictionary_id = ? ORDER BY page_idx", (dictionary_id,)
+            ):
+                dictionary.page_starts.append(start)
+                dictionary.page_offsets.append(byte_offset)
+            dictionaries.append(dictionary)
+            filepaths.append(filepath)
+        return dictionaries, filepaths
+
+    # Replaces all dictionaries in the database with the given dictionaries, in a single transaction
+    def export_dictionaries(self, dictionaries: list[Dictionary], filepaths: list[str]) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM words")
+            self.connection.execute("DELETE FROM dictionary_pages")
+            self.connection.execute("DELETE FROM dictionaries")
+            for dictionary, filepath in zip(dictionaries, filepaths):
+                if dictionary is None:
+                    continue
+                cursor = self.connection.execute(
+                    "INSERT INTO dictionaries (filepath, language_a, language_b) VALUES (?, ?, ?)",
+                    (filepath, dictionary.language_a, dictionary.language_b)
+                )
+                dictionary_id = cursor.lastrowid
+                self.connection.executemany(
+                    "INSERT INTO words (dictionary_id, idx, term_a, term_b, level, type) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(dictionary_id, idx, word.term_a, word.term_b, word.level, word.type) for idx, word in enumerate(dictionary.words)]
+                )
+                self.connection.executemany(
+                    "INSERT INTO dictionary_pages (dictionary_id, page_idx, start, byte_offset) VALUES (?, ?, ?, ?)",
+                    [(dictionary_id, page_idx, start, byte_offset) for page_idx, (start, byte_offset)
+                        in enumerate(zip(dictionary.page_starts, dictionary.page_offsets))]
+                )
+
+    # Number of buffered changes after which they are written
+    BATCH_SIZE = 500
+    # Tables of the database. Rows that belong together are keyed so that they are stored next to each other
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password BLOB NOT NULL,
+            main_language TEXT
+        );
+        CREATE TABLE IF NOT EXISTS user_languages (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            lang_idx INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            active_words INTEGER NOT NULL,
+            PRIMARY KEY (user_id, lang_idx)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS confidences (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            lang_idx INTEGER NOT NULL,
+            word_idx INTEGER NOT NULL,
+            confidence INTEGER NOT NULL,
+            PRIMARY KEY (user_id, lang_idx, word_idx)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS schedules (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            lang_idx INTEGER NOT NULL,
+            word_idx INTEGER NOT NULL,
+            due INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            ease INTEGER NOT NULL,
+            repetitions INTEGER NOT NULL,
+            PRIMARY KEY (user_id, lang_idx, word_idx)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS dictionaries (
+            id INTEGER PRIMARY KEY,
+            filepath TEXT,
+            language_a TEXT,
+            language_b TEXT
+        );
+        CREATE INDEX IF NOT EXISTS dictionaries_languages ON dictionaries (language_a, language_b);
+        CREATE TABLE IF NOT EXISTS words (
+            dictionary_id INTEGER NOT NULL REFERENCES dictionaries(id),
+            idx INTEGER NOT NULL,
+            term_a TEXT NOT NULL,
+            term_b TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            PRIMARY KEY (dictionary_id, idx)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS dictionary_pages (
+            dictionary_id INTEGER NOT NULL REFERENCES dictionaries(id),
+            page_idx INTEGER NOT NULL,
+            start INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            PRIMARY KEY (dictionary_id, page_idx)
+        ) WITHOUT ROWID;
+    """
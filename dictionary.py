@@ -1,8 +1,236 @@
 from word import Word
+from array import array
+import bisect
 
 # A class for a dictionary of words between two languages.
+# Words are stored by columns rather than as Word objects:
+# a list of terms in each language, an array of levels and an array of type codes (indices into Word.TYPES).
+# Word objects are created on demand when accessing dictionary.words, as lightweight views of a single row.
+# The columns can also be read-only views of a mapped compiled dictionary file (see CompiledDictionary), then words cannot be appended.
+#
+# The words are split into pages, like in the dictionary file, where an empty line begins the next page.
+# The page index is two more columns: the index of the first word of each page, and the byte offset of its line in the dictionary file,
+# so that a single page can be read from the file without reading the rest. Pages are never empty.
+# A dictionary without a page index (e.g. one that was built word by word) is a single page.
 class Dictionary:
-    def __init__(self, language_a: str, language_b: str, words: list[Word]):
+    def __init__(self, language_a: str, language_b: str, words: list[Word] = []):
         self.language_a = language_a
         self.language_b = language_b
-        self.words = words
\ No newline at end of file
+        self.terms_a = []
+        self.terms_b = []
+        self.levels = array('B')
+        self.types = array('B')
+        self.page_starts = array('I')
+        self.page_offsets = array('Q')
+        # Number of lines of the dictionary file that were skipped because they were invalid, kept for its compiled file
+        self.skipped_lines = 0
+        for word in words:
+            self.append_word(word)
+        # Sequence of all the words of the dictionary, as Word objects
+        self.words = DictionaryWords(self, 0, None)
+
+    # Creates a dictionary directly from its columns, and optionally its page index. Returns the dictionary
+    def from_columns(language_a: str, language_b: str, terms_a: list[str], terms_b: list[str], levels: array, types: array,
+                     page_starts: array = None, page_offsets: array = None):
+        dictionary = Dictionary(language_a, language_b)
+        dictionary.terms_a = terms_a
+        dictionary.terms_b = terms_b
+        dictionary.levels = levels
+        dictionary.types = types
+        if page_starts is not None:
+            dictionary.page_starts = page_starts
+            dictionary.page_offsets = page_offsets
+        return dictionary
+
+    # Appends a word at the end of the dictionary.
+    # The word's index is not used, the word gets the next index of the dictionary.
+    def append_word(self, word: Word) -> None:
+        self.append(word.term_a, word.term_b, word.level, word.type)
+
+    # Appends a word, given by its properties, at the end of the dictionary
+    def append(self, term_a: str, term_b: str, level: int, type: str) -> None:
+        self.terms_a.append(term_a)
+        self.terms_b.append(term_b)
+        self.levels.append(level)
+        self.types.append(Word.TYPE_CODES.get(type, Word.TYPE_CODES[Word.DEFAULT_TYPE]))
+
+    # Returns the number of words in the dictionary
+    def __len__(self) -> int:
+        return len(self.terms_a)
+
+    # Returns a Word view of the word at the given index
+    def get_word(self, index: int) -> Word:
+        return Word.view(self.terms_a[index], self.terms_b[index], self.levels[index], Word.TYPES[self.types[index]], index)
+
+    # Returns the levels of the words with indices in [start, stop), as an array
+    def get_levels(self, start: int, stop: int) -> array:
+        return self.levels[start:stop]
+
+    # Begins a new page, whose first word is the next appended word.
+    # The offset is the byte offset of that word's line in the dictionary file
+    def start_page(self, offset: int = 0) -> None:
+        self.page_starts.append(len(self))
+        self.page_offsets.append(offset)
+
+    # Returns the number of pages of the dictionary
+    def get_pages_count(self) -> int:
+        if len(self.page_starts) == 0:
+            return 1 if len(self) > 0 else 0
+        return len(self.page_starts)
+
+    # Returns the range of indices [start, stop) of the words of a page
+    def get_page_range(self, page_idx: int) -> tuple[int, int]:
+        if len(self.page_starts) == 0:
+            return 0, len(self)
+        start = self.page_starts[page_idx]
+        stop = self.page_starts[page_idx + 1] if page_idx + 1 < len(self.page_starts) else len(self)
+        return start, stop
+
+    # Returns the words of a page, as a view of the dictionary's words
+    def get_page(self, page_idx: int):
+        start, stop = self.get_page_range(page_idx)
+        return DictionaryWords(self, start, stop)
+
+    # Returns the index of the page that a word is on
+    def get_page_of(self, word_idx: int) -> int:
+        return max(0, bisect.bisect_right(self.page_starts, word_idx) - 1)
+
+# A class for a dictionary whose words are loaded on first access.
+# Only its languages are known up front, so it can be indexed by its pair of languages without reading its words.
+# The columns are loaded by the given loader function, which should return the full dictionary (or None if it cannot be loaded).
+#
+# If it's given a page index loader and a page loader, single pages can be loaded before (or instead of) the whole dictionary.
+# The page index loader should return (words count, page starts, page offsets), or None if there is no cheap way to get them,
+# then the whole dictionary is loaded to get its page index. The page loader should return a dictionary of the words of the page
+# that begins at the given byte offset of the dictionary file.
+class LazyDictionary(Dictionary):
+    def __init__(self, language_a: str, language_b: str, loader, page_index_loader = None, page_loader = None):
+        self.language_a = language_a
+        self.language_b = language_b
+        self.loader = loader
+        self.page_index_loader = page_index_loader
+        self.page_loader = page_loader
+        # Pages that were loaded on their own, by page index. Dropped when the whole dictionary is loaded
+        self.loaded_pages = {}
+        self.words = DictionaryWords(self, 0, None)
+
+    # Called only for attributes that are not set - the columns, until the words or the page index are loaded
+    def __getattr__(self, name: str):
+        if name in LazyDictionary.PAGE_INDEX_ATTRIBUTES:
+            self.load_page_index()
+        elif name in LazyDictionary.COLUMNS:
+            self.load()
+        else:
+            raise AttributeError(name)
+        return self.__dict__[name]
+
+    # Loads the words of the dictionary. A dictionary that cannot be loaded stays empty
+    def load(self) -> None:
+        dictionary = self.loader()
+        if dictionary is None:
+            dictionary = Dictionary(self.language_a, self.language_b)
+        self.terms_a = dictionary.terms_a
+        self.terms_b = dictionary.terms_b
+        self.levels = dictionary.levels
+        self.types = dictionary.types
+        self.words_count = len(dictionary)
+        self.page_starts = dictionary.page_starts
+        self.page_offsets = dictionary.page_offsets
+        self.loader = None
+        self.loaded_pages = {}
+
+    # Loads the page index of the dictionary, without its words if possible
+    def load_page_index(self) -> None:
+        index = self.page_index_loader() if self.page_index_loader is not None and not self.is_loaded() else None
+        if index is None:
+            self.load()
+            return
+        self.words_count, self.page_starts, self.page_offsets = index
+
+    # Loads the words of a single page, unless the whole dictionary is loaded already.
+    # The page index is loaded again first, because the byte offsets are only valid if the dictionary file hasn't changed since.
+    # If it has changed, or the page doesn't match the page index, the whole dictionary is loaded instead
+    def load_page(self, page_idx: int) -> None:
+        if self.is_loaded() or page_idx in self.loaded_pages:
+            return
+        start, stop = self.get_page_range(page_idx)
+        page = None
+        if self.page_loader is not None and self.page_index_loader is not None and page_idx < len(self.page_offsets)\
+                and self.page_index_loader() is not None:
+            page = self.page_loader(self.page_offsets[page_idx])
+        if page is None or len(page) != stop - start:
+            self.load()
+            return
+        self.loaded_pages[page_idx] = page
+
+    # Checks if the words of the dictionary are loaded
+    def is_loaded(self) -> bool:
+        return self.loader is None
+
+    def __len__(self) -> int:
+        return self.words_count
+
+    # Returns a Word view of the word at the given index, from its page if only the page is loaded
+    def get_word(self, index: int) -> Word:
+        if not self.is_loaded():
+            page_idx = self.get_page_of(index)
+            page = self.loaded_pages.get(page_idx)
+            if page is not None:
+                word = page.get_word(index - self.page_starts[page_idx])
+                return Word.view(word.term_a, word.term_b, word.level, word.type, index)
+        return Dictionary.get_word(self, index)
+
+    # Returns the levels of the words with indices in [start, stop), from their page if only the page is loaded
+    def get_levels(self, start: int, stop: int) -> array:
+        if not self.is_loaded() and start < stop:
+            page_idx = self.get_page_of(start)
+            page = self.loaded_pages.get(page_idx)
+            page_start = self.page_starts[page_idx] if page is not None else 0
+            if page is not None and stop - page_start <= len(page):
+                return page.get_levels(start - page_start, stop - page_start)
+        return Dictionary.get_levels(self, start, stop)
+
+    # Returns the words of a page, loading only that page if the dictionary is not loaded yet
+    def get_page(self, page_idx: int):
+        self.load_page(page_idx)
+        return Dictionary.get_page(self, page_idx)
+
+    # Attributes that are loaded on first access, with the words
+    COLUMNS = ("terms_a", "terms_b", "levels", "types")
+    # Attributes that are loaded on first access, with the page index
+    PAGE_INDEX_ATTRIBUTES = ("words_count", "page_starts", "page_offsets")
+
+# A class for a read-only sequence of a dictionary's words, as Word objects.
+# It's a view over a range of the dictionary's columns, so slicing it doesn't copy anything.
+class DictionaryWords:
+    # Creates a view of the words with indices in [start, stop) of a dictionary. If stop is None, the view reaches the end of the dictionary
+    def __init__(self, dictionary: Dictionary, start: int, stop: int):
+        self.dictionary = dictionary
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        stop = len(self.dictionary) if self.stop is None else self.stop
+        return max(0, stop - self.start)
+
+    # Returns a Word for an integer index, or another view for a slice
+    def __getitem__(self, key):
+        length = len(self)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(length)
+            if step != 1:
+                return [self[idx] for idx in range(start, stop, step)]
+            return DictionaryWords(self.dictionary, self.start + start, self.start + max(start, stop))
+        if key < 0:
+            key += length
+        if key < 0 or key >= length:
+            raise IndexError("word index out of range")
+        return self.dictionary.get_word(self.start + key)
+
+    def __iter__(self):
+        for idx in range(self.start, self.start + len(self)):
+            yield self.dictionary.get_word(idx)
+
+    # Returns the levels of the words in the view, as an array
+    def get_levels(self) -> array:
+        return self.dictionary.get_levels(self.start, self.start + len(self))
@@ -1,7 +1,13 @@
-import pwinput
+from interface.console_io import ConsoleIO
+import contextvars
 
-# A class for common CLI functions, making sure CLI is used the same way across the whole application
+# A class for common CLI functions, making sure CLI is used the same way across the whole application.
+# All input and output goes through an I/O object (see ConsoleIO), which can be replaced, e.g. by a network session in the server.
+# The I/O object is kept in a context variable, so that every session of the server has its own.
 class CLI:
+    # I/O of the current context, the console by default
+    io = contextvars.ContextVar("io", default = ConsoleIO())
+
     # Prefix that is printed before any message to indicate that it's printed by the application's CLI
     MSG_PREFIX = "---> "
     BIG_MSG_PREFIX = "-------> "
@@ -11,26 +17,31 @@ class CLI:
 
     # Prints a message on the console
     def print(msg: str) -> None:
-        print(CLI.MSG_PREFIX, msg, end="", sep="")
+        CLI.io.get().write(CLI.MSG_PREFIX + msg)
     def print_big(msg: str) -> None:
-        print("\n", CLI.BIG_MSG_PREFIX, msg, CLI.BIG_MSG_SUFFIX, end="", sep="")
+        CLI.io.get().write("\n" + CLI.BIG_MSG_PREFIX + msg + CLI.BIG_MSG_SUFFIX)
     def print_clearly(msg: str) -> None:
-        print(CLI.CLEAR_MSG_PREFIX, msg, CLI.CLEAR_MSG_SUFFIX, end="", sep="")
+        CLI.io.get().write(CLI.CLEAR_MSG_PREFIX + msg + CLI.CLEAR_MSG_SUFFIX)
 
     # Asks user for their input by printing some message and waiting for their answer.
     # Returns the answer.
     def ask_for(msg: str) -> str:
         CLI.print(msg)
-        answer = input().strip()
+        answer = CLI.io.get().read_line().strip()
         return answer
 
     # Asks user for their password by printing some message and waiting for their answer.
     # Hides the input characters with '*'
     # Returns the password
     def ask_password(msg: str) -> str:
-        password = pwinput.pwinput(prompt = CLI.MSG_PREFIX + msg, mask='*')
+        password = CLI.io.get().read_password(CLI.MSG_PREFIX + msg)
         return password
 
+    # Waits for the result of slow work that runs in another thread, like hashing a password. Returns the result.
+    # The I/O decides how to wait, e.g. the server lets other sessions run meanwhile
+    def wait(future):
+        return CLI.io.get().wait(future)
+
     # Asks for a CLI option. Returns the number of the chosen option.
     def ask_option_num(msg: str, options: list[str]) -> int:
         CLI.print(msg + "\n")
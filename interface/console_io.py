@@ -0,0 +1,22 @@
+
+# A class for the I/O of the CLI on the console.
+# Other I/O classes (like the server's SessionIO) have the same functions, so the CLI can use any of them.
+class ConsoleIO:
+    # Writes text to the console, without adding a line ending
+    def write(self, text: str) -> None:
+        print(text, end = "")
+
+    # Reads a line from the console. Returns it without the line ending.
+    # Raises EOFError if there is no more input
+    def read_line(self) -> str:
+        return input()
+
+    # Reads a password from the console, after printing the prompt. Hides the input characters with '*'.
+    # pwinput is imported here, so that it doesn't slow down the start of the application
+    def read_password(self, prompt: str) -> str:
+        import pwinput
+        return pwinput.pwinput(prompt = prompt, mask = '*')
+
+    # Waits for the result of work done in another thread. Returns the result
+    def wait(self, future):
+        return future.result()
@@ -1,11 +1,23 @@
 from interface.cli import CLI
 from user import User
 from data.database import Database
-from dictionary import Dictionary
+from dictionary import Dictionary, DictionaryWords
 from word import Word
-from random import shuffle, randint
+from weighted_shuffle import WeightedShuffle
+from spaced_repetition import Schedule
+from logger import Logger
+from random import Random
+from array import array
 
 CONFIDENCE_DELTA = 1
+# Weight functions for ordering words by confidence with some shuffling.
+# The weight of a word is the chance for it to come before the other remaining words.
+ASCENDING_CONFIDENCE_WEIGHT = lambda confidence: 100 - confidence
+DESCENDING_CONFIDENCE_WEIGHT = lambda confidence: confidence
+# Mode of ordering words where only the words that are due for review are tested, by the spaced repetition schedule
+SPACED_REPETITION_MODE = 8
+# Maximum number of words in a spaced repetition test
+SPACED_REPETITION_SESSION_SIZE = 20
 
 # A class for a home page of a user
 # Each user has their own home page with their languages and words
@@ -25,19 +37,32 @@ class HomePage:
                 "Start learning a new language",
                 "What languages am I learning?",
                 "Learn a new word",
-                "Do a word test"
+                "Do a word test",
+                "Learn the rest of a page of words",
+                "Do a word test on a page"
             ])
             # If option is None we need to exit
             if option is None:
                 return
+            # Each action is a timing span, so its duration is logged if timings are turned on
             elif option == 1:
-                self.start_learning_new_language(database)
+                with Logger.span("HomePage.start_learning_new_language"):
+                    self.start_learning_new_language(database)
             elif option == 2:
-                self.show_active_languages()
+                with Logger.span("HomePage.show_active_languages"):
+                    self.show_active_languages()
             elif option == 3:
-                self.learn_new_word(database)
+                with Logger.span("HomePage.learn_new_word"):
+                    self.learn_new_word(database)
             elif option == 4:
-                self.do_word_test()
+                with Logger.span("HomePage.do_word_test"):
+                    self.do_word_test(database)
+            elif option == 5:
+                with Logger.span("HomePage.learn_page"):
+                    self.learn_page(database)
+            elif option == 6:
+                with Logger.span("HomePage.do_page_word_test"):
+                    self.do_word_test(database, by_page = True)
 
     # Asks a user what language they want to start learning, gives them a list of only the languages that are available for them.
     # Adds the chosen language to the user's active languages
@@ -55,26 +80,21 @@ class HomePage:
         database.setup_user_dictionaries(self.user)
         # Setup user's confidences again to handle the new language
         database.setup_user_confidences(self.user)
+        database.record_new_language(self.user, language)
         CLI.print("Okay. {} added to your active languages.\n".format(language))
 
-    # Returns a list with languages that the user can learn and that have a dictionary with the user's main language.
+    # Returns a list with languages that the user can learn and that have a dictionary with the user's main language,
+    # or that a dictionary can be composed with, through a pivot language.
     def get_learnable_languages_with_dict(self, database: Database) -> list[str]:
-        languages = database.get_all_languages()
-        # User cannot be learning their own language or a language they're already learning,
-        # so remove those from the list of languages
-        learnable_languages = languages.copy()
-        learnable_languages.remove(self.user.main_language)
-        for language in self.user.active_languages:
-            learnable_languages.remove(language)
-        # Also remove languages that don't have a dictionary with the user's main language
+        # Only languages that have (or can have) a dictionary with the user's main language can be learned
+        languages_with_dict = database.get_paired_languages(self.user.main_language) | database.get_composable_languages(self.user.main_language)
+        # User cannot be learning their own language or a language they're already learning
+        active_languages = set(self.user.active_languages)
         learnable_languages_with_dict = []
-        for language in learnable_languages:
-            for dictionary in database.dictionaries:
-                if (dictionary.language_a == self.user.main_language and dictionary.language_b == language)\
-                or (dictionary.language_a == language and dictionary.language_b == self.user.main_language):
-                    learnable_languages_with_dict.append(language)
-                    break
-        # Return the remaining languages
+        # Keep the order of all languages, so that the options are always listed the same way
+        for language in database.get_all_languages():
+            if language in languages_with_dict and language not in active_languages and language != self.user.main_language:
+                learnable_languages_with_dict.append(language)
         return learnable_languages_with_dict
 
     # Shows the user their active languages.
@@ -103,10 +123,59 @@ class HomePage:
         self.user.active_words[language_idx] += 1
         # Setup user's confidences again to handle the change of active words
         database.setup_user_confidences(self.user)
+        database.record_active_words(self.user, language_idx)
         # Show the new word to the user
         CLI.print("Okay, here's a new word in {}:\n".format(language))
         CLI.print_clearly("{} <-----means-----> {}".format(word.term_a, word.term_b))
 
+    # Lets user learn the rest of the page that their next new word is on, in one of their active languages.
+    # Only that page of the dictionary is read, so a big dictionary can be learned page by page.
+    # User's active words are increased up to the end of the page
+    def learn_page(self, database: Database) -> None:
+        # Choose a language
+        language_idx = self.choose_active_language()
+        if language_idx is None:
+            CLI.print("You have no active languages. Start learning a language first.\n")
+            return
+        language = self.user.active_languages[language_idx]
+        dictionary = self.user.dictionaries[language_idx]
+        start = self.user.active_words[language_idx]
+        if start >= len(dictionary):
+            CLI.print("You know all the words in {}.\n".format(language))
+            return
+        # The words from the next new word to the end of its page
+        page_idx = dictionary.get_page_of(start)
+        page = dictionary.get_page(page_idx)
+        words = page[start - page.start:]
+        # Increase the count of active words for the chosen language, up to the end of the page
+        self.user.active_words[language_idx] = page.start + len(page)
+        # Setup user's confidences again to handle the change of active words
+        database.setup_user_confidences(self.user)
+        database.record_active_words(self.user, language_idx)
+        # Show the new words to the user
+        CLI.print("Okay, here are {} new words in {}, from page {} of {}:\n".format(len(words), language, page_idx + 1, dictionary.get_pages_count()))
+        for word in words:
+            CLI.print_clearly("{} <-----means-----> {}".format(word.term_a, word.term_b))
+
+    # Lets user choose one of the pages of a dictionary that have words they know, or if it's just a single page, directly returns it.
+    # Returns the index of the chosen page (0-based), or None if user exits
+    def choose_page(self, dictionary: Dictionary, words_count: int) -> int:
+        pages_count = dictionary.get_page_of(words_count - 1) + 1
+        if pages_count == 1:
+            return 0
+        # Pages can be too many to list them as options, so ask for a number
+        while True:
+            answer = CLI.ask_for("Choose a page from 1 to {}, or type \"exit\": ".format(pages_count))
+            if answer == "exit":
+                return None
+            try:
+                page_num = int(answer)
+            except ValueError:
+                page_num = -1
+            if 1 <= page_num <= pages_count:
+                return page_num - 1
+            CLI.print("Invalid page. Try again.\n")
+
     # Lets user choose one of their active languages, or if it's just a single language, directly returns it.
     # Returns the index of the chosen language (0-based)
     def choose_active_language(self) -> int:
@@ -119,7 +188,10 @@ class HomePage:
         language_num = CLI.ask_option_num("Choose one of the languages that you're learning.", self.user.active_languages)
         return language_num - 1
 
-    def do_word_test(self) -> None:
+    # Tests the user on the words they know in one of their active languages.
+    # If by_page = True, user chooses a page of the dictionary and is tested only on the words they know on that page.
+    # Each answer changes user's confidence for the word, and the change is recorded to the database
+    def do_word_test(self, database: Database, by_page: bool = False) -> None:
         # Choose a language
         language_idx = self.choose_active_language()
         if language_idx is None:
@@ -133,10 +205,14 @@ class HomePage:
             return
         # Get the dictionary between that language and user's main language
         dictionary = self.user.dictionaries[language_idx]
-        # Check the direction of the dictionary, whether it's from known to unknown or the other way
-        dict_from_kn = False
-        if dictionary.language_a == self.user.main_language:
-            dict_from_kn = True
+        words = dictionary.words[:words_count]
+        # Only the chosen page is read from a dictionary that is not loaded yet
+        if by_page:
+            page_idx = self.choose_page(dictionary, words_count)
+            if page_idx is None:
+                return
+            page = dictionary.get_page(page_idx)
+            words = page[:words_count - page.start]
         # Choose the direction of the test, whether to be from known to unknown or vice versa
         from_kn = CLI.ask_option_num(
             "Choose direction of the test:", [
@@ -144,7 +220,7 @@ class HomePage:
             "Questions in {}, answers in {}".format(self.user.main_language, language)
         ]) == 2
         # Check whether dictionary languages should be swapped
-        should_swap_dict = (from_kn != dict_from_kn)
+        should_swap_dict = self.should_swap_dictionary(dictionary, from_kn)
         # Ask user for mode of ordering the words
         order_mode = CLI.ask_option_num(
             "Choose mode:", [
@@ -154,103 +230,115 @@ class HomePage:
             "Order words by your confidence (descending)",
             "Shuffle words",
             "Order words by your confidence, but with some shuffling (ascending)",
-            "Order words by your confidence, but with some shuffling (descending)"
+            "Order words by your confidence, but with some shuffling (descending)",
+            "Spaced repetition - only the words that are due for review"
         ])
-        # Get word indices in the correct order
-        word_idxs = self.get_words_ordered_in_mode(dictionary.words[:words_count], order_mode, language_idx)
+        # Get word indices in the correct order. They are indices in the tested words, so they are moved to the indices in the dictionary
+        word_idxs = [words.start + idx for idx in self.get_words_ordered_in_mode(words, order_mode, language_idx)]
+        if order_mode == SPACED_REPETITION_MODE and not word_idxs:
+            CLI.print("No words are due for review. Come back later or learn some new words.\n")
+            return
+        today = Schedule.today()
         # Traverse the words that user knows
         for word_idx in word_idxs:
             word = dictionary.words[word_idx]
-            # Retrieve the term that will be asked and the term that should be answered, based on the direction of the test
-            asked_term = word.term_a
-            real_answer = word.term_b
-            if should_swap_dict:
-                asked_term = word.term_b
-                real_answer = word.term_a
-            # Determine the question, based on the direction of the test
-            question = "How do you say \"{}\" in {}?\n".format(asked_term, language)
-            if from_kn == 0:
-                question = "What's \"{}\" in {}?\n".format(asked_term, self.user.main_language)
+            question, real_answer = self.get_question(word, language, from_kn, should_swap_dict)
             # Ask the question
             CLI.print(question)
             # Get user's answer
             answer = CLI.ask_for("Answer: ")
             # Check if it matches the real answer
-            if answer == real_answer:
-                if self.user.confidences[language_idx][word_idx] <= 100 - CONFIDENCE_DELTA:
-                    self.user.confidences[language_idx][word_idx] += CONFIDENCE_DELTA
+            correct = self.grade_answer(database, language_idx, word_idx, answer, real_answer, order_mode == SPACED_REPETITION_MODE, today)
+            if correct:
                 CLI.print("Correct!    (confidence: {})\n".format(self.user.confidences[language_idx][word_idx]))
             else:
-                if self.user.confidences[language_idx][word_idx] >= CONFIDENCE_DELTA:
-                    self.user.confidences[language_idx][word_idx] -= CONFIDENCE_DELTA
                 CLI.print("No. It's {}    (confidence: {})\n".format(real_answer, self.user.confidences[language_idx][word_idx]))
 
-    # Orders words in the given mode and returns a list of indices to the words in the original list. Does not modify the original list
-    def get_words_ordered_in_mode(self, words: list[Word], mode: int, lang_idx: int) -> list[int]:
+    # Checks whether the languages of a dictionary should be swapped for a test in the given direction,
+    # i.e. whether the questions are in its language B
+    def should_swap_dictionary(self, dictionary: Dictionary, from_kn: bool) -> bool:
+        # Check the direction of the dictionary, whether it's from known to unknown or the other way
+        dict_from_kn = dictionary.language_a == self.user.main_language
+        return from_kn != dict_from_kn
+
+    # Returns the question about a word and the answer that's expected, based on the direction of the test
+    def get_question(self, word: Word, language: str, from_kn: bool, should_swap_dict: bool) -> tuple[str, str]:
+        # Retrieve the term that will be asked and the term that should be answered, based on the direction of the test
+        asked_term = word.term_a
+        real_answer = word.term_b
+        if should_swap_dict:
+            asked_term = word.term_b
+            real_answer = word.term_a
+        # Determine the question, based on the direction of the test
+        question = "How do you say \"{}\" in {}?\n".format(asked_term, language)
+        if from_kn == 0:
+            question = "What's \"{}\" in {}?\n".format(asked_term, self.user.main_language)
+        return question, real_answer
+
+    # Grades user's answer for a word. User's confidence for the word goes up or down, and the change is recorded to the database.
+    # If review = True (in spaced repetition), the answer also decides when the word is reviewed next.
+    # Returns whether the answer is correct
+    def grade_answer(self, database: Database, language_idx: int, word_idx: int, answer: str, real_answer: str, review: bool, today: int) -> bool:
+        correct = answer == real_answer
+        confidences = self.user.confidences[language_idx]
+        if correct:
+            if confidences[word_idx] <= 100 - CONFIDENCE_DELTA:
+                confidences[word_idx] += CONFIDENCE_DELTA
+        else:
+            if confidences[word_idx] >= CONFIDENCE_DELTA:
+                confidences[word_idx] -= CONFIDENCE_DELTA
+        database.record_confidence(self.user, language_idx, word_idx)
+        if review:
+            quality = Schedule.CORRECT_QUALITY if correct else Schedule.WRONG_QUALITY
+            self.user.schedules[language_idx].review(word_idx, quality, today)
+            database.record_schedule(self.user, language_idx, word_idx)
+        return correct
+
+    # Orders words in the given mode and returns a list of indices to the words in the original list. Does not modify the original list.
+    # The words can be any range of the user's words in the language, e.g. a page.
+    # Modes that shuffle the words can be made reproducible by giving a seed.
+    def get_words_ordered_in_mode(self, words: DictionaryWords, mode: int, lang_idx: int, seed: int = None) -> list[int]:
         word_idxs = None
         if mode == 1:
-            word_idxs = [tup[0] for tup in sorted(enumerate(words), key=lambda x:x[1].level)]
+            # Sort the indices by the levels they point to, without creating the words
+            levels = words.get_levels()
+            word_idxs = sorted(range(len(words)), key = levels.__getitem__)
         elif mode == 2:
-            word_idxs = [tup[0] for tup in sorted(enumerate(words), key=lambda x:x[1].level, reverse = True)]
+            levels = words.get_levels()
+            word_idxs = sorted(range(len(words)), key = levels.__getitem__, reverse = True)
         elif mode == 3:
-            # Workaround for the case of same confidences:
-            # In this case the second element of the tuple is compared when sorting,
-            # and the second element is of type Word so they cannot be compared.
-            # We just need something that can be compared and won't be the same there
-            # and the word will be at index 2
-            dummy_list = list(range(len(words)))
-            word_idxs = list(tup[2].index for tup in sorted(zip(self.user.confidences[lang_idx], dummy_list, words)))
+            # Sort the indices by the confidences they point to.
+            # Sorting is stable, so words with same confidences stay in their original order
+            confidences = self.get_confidences_of(words, lang_idx)
+            word_idxs = sorted(range(len(words)), key = confidences.__getitem__)
         elif mode == 4:
-            dummy_list = list(range(len(words)))
-            word_idxs = list(tup[2].index for tup in sorted(zip(self.user.confidences[lang_idx], dummy_list, words), reverse = True))
+            confidences = self.get_confidences_of(words, lang_idx)
+            word_idxs = sorted(range(len(words)), key = confidences.__getitem__)
+            word_idxs.reverse()
         elif mode == 5:
             word_idxs = list(range(len(words)))
-            shuffle(word_idxs)
-        # NOT TESTED
+            Random(seed).shuffle(word_idxs)
+        # Words with lower confidence are more likely to come first
         elif mode == 6:
-            word_idxs = []
-            how_much_prob = 30
-
-            confs = [x * how_much_prob for x in self.user.confidences[lang_idx]]
-            confs_sum = sum(confs)
-
-            word_is_used = [False] * len(words)
-            words_used = 0
-            remaining_length = confs_sum
-            weat = 0
-            while words_used < len(words):
-                walk = randint(0, remaining_length)
-                while walk > 0:
-                    walk -= confs[weat]
-                    weat = (weat + 1) % len(words)
-                    while word_is_used[weat]:
-                        weat = (weat + 1) % len(words)
-                word_is_used[weat] = True
-                word_idxs.append(weat)
-                remaining_length -= confs[weat]
-                words_used += 1
-        # NOT TESTED
+            word_idxs = WeightedShuffle.permutation_by(self.get_confidences_of(words, lang_idx), ASCENDING_CONFIDENCE_WEIGHT, seed)
+        # Words with higher confidence are more likely to come first
         elif mode == 7:
-            word_idxs = []
-            how_much_prob = 30
-
-            confs = [(100 - x) * how_much_prob for x in self.user.confidences[lang_idx]]
-            confs_sum = sum(confs)
+            word_idxs = WeightedShuffle.permutation_by(self.get_confidences_of(words, lang_idx), DESCENDING_CONFIDENCE_WEIGHT, seed)
+        # Only the words that are due for review, the most overdue first
+        elif mode == SPACED_REPETITION_MODE:
+            schedule = self.user.schedules[lang_idx]
+            if words.start == 0 and len(words) == len(schedule):
+                word_idxs = schedule.get_due(SPACED_REPETITION_SESSION_SIZE, Schedule.today())
+            else:
+                due_idxs = schedule.get_due_between(words.start, words.start + len(words), SPACED_REPETITION_SESSION_SIZE, Schedule.today())
+                word_idxs = [word_idx - words.start for word_idx in due_idxs]
 
-            word_is_used = [False] * len(words)
-            words_used = 0
-            remaining_length = confs_sum
-            weat = 0
-            while words_used < len(words):
-                walk = randint(0, remaining_length)
-                while walk > 0:
-                    walk -= confs[weat]
-                    weat = (weat + 1) % len(words)
-                    while word_is_used[weat]:
-                        weat = (weat + 1) % len(words)
-                word_is_used[weat] = True
-                word_idxs.append(weat)
-                remaining_length -= confs[weat]
-                words_used += 1
+        return word_idxs
 
-        return word_idxs
\ No newline at end of file
+    # Returns user's confidences for a range of their words in a language, in the same order.
+    # If the range is all their words, the confidences are not copied
+    def get_confidences_of(self, words: DictionaryWords, lang_idx: int) -> array:
+        confidences = self.user.confidences[lang_idx]
+        if words.start == 0 and len(words) == len(confidences):
+            return confidences
+        return confidences[words.start:words.start + len(words)]
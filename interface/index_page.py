@@ -10,8 +10,8 @@ from data.database import Database
 # It lets you login or register.
 class IndexPage:
     # Runs the index page.
-    # Expects a list of registered users, as a parameter.
-    def run(users: list[User], database: Database) -> None:
+    # Expects the database with the registered users, as a parameter.
+    def run(database: Database) -> None:
         while True:
             # Print welcome message and ask user to choose login or register
             CLI.print_big("Welcome to SuperMem!")
@@ -25,13 +25,23 @@ class IndexPage:
                 return
             # Redirect to login or register page based on the chosen option
             elif option == 1:
-                user = LoginPage.run(users)
-                home_page = HomePage(user)
-                home_page.run(database)
+                user = LoginPage.run(database)
+                # A user can have only one session at a time, e.g. when many sessions are served by the server
+                if not database.lock_user(user.username):
+                    CLI.print("User {} is already logged in somewhere else.\n".format(user.username))
+                    continue
+                try:
+                    home_page = HomePage(user)
+                    home_page.run(database)
+                finally:
+                    database.unlock_user(user.username)
                 # After exiting the home page user is back to the index page
             else:
-                # Register a user and add it to the list of users
-                user = RegisterPage.run(database.get_all_languages())
-                users.append(user)
+                # Register a user and add it to the database
+                user = RegisterPage.run(database)
+                if database.add_user(user):
+                    database.record_new_user(user)
+                else:
+                    CLI.print("Username {} is already taken.\n".format(user.username))
                 # After registration user is back to the index page so that they can login
                 
\ No newline at end of file
@@ -1,39 +1,68 @@
 from interface.cli import CLI
 from user import User
-import bcrypt
+from data.database import Database
+from password_hasher import PasswordHasher
+import time
 
 # A class for a CLI page for user login
 class LoginPage:
     # Runs the user login page. Returns the logged in user.
-    # Expects a list of registered users, as a parameter.
-    def run(users: list[User]) -> User:
+    # Expects the database with the registered users, as a parameter.
+    def run(database: Database) -> User:
         CLI.print_big("Login to SuperMem")
         while True:
             # Ask for username and password
             username = LoginPage.ask_username()
             password = LoginPage.ask_password()
+            # Repeated failures of a username make it wait before the password is checked again
+            wait_seconds = LoginPage.get_throttle_seconds(username)
+            if wait_seconds > 0:
+                CLI.print("Too many failed logins for {}. Try again in {} seconds.\n".format(username, int(wait_seconds) + 1))
+                continue
             # Get the user with the entered data from all the users
-            user = LoginPage.get_user(users, username, password)
+            user = LoginPage.get_user(database, username, password)
             # If found, return it, otherwise print message and repeat
             if user is None:
+                LoginPage.record_failure(username)
                 CLI.print("Wrong username or password. Try again.\n")
             else:
+                LoginPage.failures.pop(username, None)
                 return user
 
     # Finds the user with the given username, checks if the given password matches. Returns the user.
-    def get_user(users: list[User], username: str, password: str) -> User:
-        bytes = password.encode("utf-8")
-        for user in users:
-            # If username matches, this is surely the user, because usernames are unique
-            if username == user.username:
-                # If password matches, everything good - return the user
-                if bcrypt.checkpw(bytes, user.password):
-                    return user
-                # otherwise wrong password - stop looking for user
-                else:
-                    break
+    # If the user's password hash was made with a different cost than the current one, it's replaced with a new hash.
+    def get_user(database: Database, username: str, password: str) -> User:
+        # Usernames are unique, so there is at most one user with this username.
+        # Check the password first, so that the user is loaded only if it matches
+        password_hash = database.get_password_hash(username)
         # If user not found, or wrong password entered, return None
-        return None
+        if password_hash is None or not CLI.wait(PasswordHasher.check(password, password_hash)):
+            return None
+        user = database.get_user(username)
+        if user is not None and PasswordHasher.needs_rehash(password_hash):
+            user.password = CLI.wait(PasswordHasher.hash(password))
+            database.record_password(user)
+        return user
+
+    # Returns how many seconds a username has to wait before its next login attempt, 0 if it doesn't have to wait.
+    # The first few failures are free, then the wait doubles with every failure, up to a maximum
+    def get_throttle_seconds(username: str) -> float:
+        failure = LoginPage.failures.get(username)
+        if failure is None or failure[0] < LoginPage.FREE_FAILURES:
+            return 0
+        delay = min(LoginPage.THROTTLE_BASE_SECONDS * 2 ** (failure[0] - LoginPage.FREE_FAILURES), LoginPage.THROTTLE_MAX_SECONDS)
+        return max(0, failure[1] + delay - time.monotonic())
+
+    # Records a failed login of a username
+    def record_failure(username: str) -> None:
+        failure = LoginPage.failures.setdefault(username, [0, 0])
+        failure[0] += 1
+        failure[1] = time.monotonic()
+        # Forget old failures, so that the dictionary doesn't grow forever
+        if len(LoginPage.failures) > LoginPage.MAX_TRACKED_USERNAMES:
+            now = time.monotonic()
+            for name in [name for name, (_, last) in LoginPage.failures.items() if now - last > LoginPage.THROTTLE_MAX_SECONDS]:
+                del LoginPage.failures[name]
 
     # Asks user for their username.
     def ask_username() -> str:
@@ -43,4 +72,14 @@ class LoginPage:
     # Asks user for their password.
     def ask_password() -> str:
         password = CLI.ask_password("Password: ")
-        return password
\ No newline at end of file
+        return password
+
+    # Failed logins by username, shared by all the sessions. Values are [number of failures in a row, time of the last one]
+    failures = {}
+    # Number of failures in a row before logins of a username are throttled
+    FREE_FAILURES = 3
+    # Wait after the first throttled failure, and the longest wait, in seconds
+    THROTTLE_BASE_SECONDS = 1.0
+    THROTTLE_MAX_SECONDS = 300.0
+    # Number of usernames with failures after which the old ones are forgotten
+    MAX_TRACKED_USERNAMES = 10000
@@ -1,30 +1,35 @@
 from interface.cli import CLI
 from user import User
-import bcrypt
+from data.database import Database
+from password_hasher import PasswordHasher
 
 # A class for a CLI page for user registration
 class RegisterPage:
     # Runs the user registration page. Returns the registrated user.
-    def run(languages: list[str]) -> User:
+    # Expects the database with the registered users, as a parameter, so that usernames are kept unique.
+    def run(database: Database) -> User:
         CLI.print_big("Register to SuperMem")
         # Ask for username and password
-        username = RegisterPage.ask_username()
+        username = RegisterPage.ask_username(database)
         password = RegisterPage.ask_password()
-        main_language = CLI.ask_option("What's your main language?", languages)
+        main_language = CLI.ask_option("What's your main language?", database.get_all_languages())
         # Create the user and return it
         user = User(username, password, main_language, [], [], [], [])
         CLI.print("User {} created successfully.".format(username))
         return user
 
-    # Asks user to choose a username, until they choose a valid one. Returns the username.
-    def ask_username() -> str:
-        username = CLI.ask_for("Choose a username: ")
-        # Until the entered username is invalid, keep asking
-        while not User.is_username_valid(username):
-            CLI.print("Invalid username. " + User.VALID_USERNAME_MSG + "\n")
+    # Asks user to choose a username, until they choose a valid one that is not taken. Returns the username.
+    def ask_username(database: Database) -> str:
+        while True:
             username = CLI.ask_for("Choose a username: ")
-        # Return the valid username
-        return username
+            # Until the entered username is invalid or taken, keep asking
+            if not User.is_username_valid(username):
+                CLI.print("Invalid username. " + User.VALID_USERNAME_MSG + "\n")
+            elif database.has_user(username):
+                CLI.print("Username {} is already taken.\n".format(username))
+            else:
+                # Return the valid username
+                return username
 
     # Asks user to choose a password, until they choose a valid one. Returns the password hashed.
     def ask_password() -> str:
@@ -34,8 +39,6 @@ class RegisterPage:
             CLI.print("Invalid password. " + User.VALID_PASSWORD_MSG + "\n")
             password = CLI.ask_password("Choose a password: ")
         # Hash the valid password and return it
-        bytes = password.encode("utf-8")
-        salt = bcrypt.gensalt()
-        hash = bcrypt.hashpw(bytes, salt)
+        hash = CLI.wait(PasswordHasher.hash(password))
         return hash
         
@@ -0,0 +1,58 @@
+from concurrent.futures import CancelledError, Future
+import asyncio
+import threading
+
+# A class for the I/O of the CLI in a session of the server.
+# Pages run in a worker thread of the server and use this I/O like the console, while the connection is handled by the event loop.
+# Text is sent to the client as it is, and every line from the client is an answer.
+#
+# All the sessions share one loaded database, which is not thread-safe, so a session runs its pages only while it holds
+# the server's lock. The lock is released while the session waits for the client, which is where sessions spend most of their time.
+class SessionIO:
+    # Creates the I/O of a session on a connection, served by the given event loop
+    def __init__(self, loop: asyncio.AbstractEventLoop, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 lock: threading.Lock, timeout: float):
+        self.loop = loop
+        self.reader = reader
+        self.writer = writer
+        self.lock = lock
+        # Seconds of waiting for an answer after which the session is ended
+        self.timeout = timeout
+
+    # Sends text to the client
+    def write(self, text: str) -> None:
+        self.loop.call_soon_threadsafe(self.writer.write, text.encode("utf-8"))
+
+    # Waits for a line from the client. Returns it without the line ending.
+    # Raises EOFError if the client disconnected, didn't answer in time or the server is stopping, like input() at the end of the input
+    def read_line(self) -> str:
+        self.lock.release()
+        try:
+            line = asyncio.run_coroutine_threadsafe(self.receive_line(), self.loop).result()
+        except (TimeoutError, asyncio.TimeoutError, CancelledError, ConnectionError, ValueError):
+            line = b""
+        finally:
+            self.lock.acquire()
+        if not line:
+            raise EOFError
+        return line.decode("utf-8", errors = "replace").rstrip("\r\n")
+
+    # Reads a password from the client, after sending the prompt.
+    # The client's terminal is responsible for hiding it
+    def read_password(self, prompt: str) -> str:
+        self.write(prompt)
+        return self.read_line()
+
+    # Waits for the result of work done in another thread, e.g. hashing a password. Returns the result.
+    # Other sessions can use the database meanwhile
+    def wait(self, future: Future):
+        self.lock.release()
+        try:
+            return future.result()
+        finally:
+            self.lock.acquire()
+
+    # Sends everything written so far, and receives a line from the client. Runs in the event loop
+    async def receive_line(self) -> bytes:
+        await self.writer.drain()
+        return await asyncio.wait_for(self.reader.readline(), self.timeout)
@@ -1,36 +1,171 @@
-import inspect
+import sys
+import threading
+import time
 
-# Logger for logging messages to the user
+# Logger for logging messages to the user.
+# Messages are given as a format string and its arguments, and are formatted only if they are going to be printed.
+# Repeated messages (with the same format string) are rate-limited, so a broken file doesn't flood the console.
+# Messages can be printed as plain text or as JSON lines.
 class Logger:
     # Logs an error to the console.
+    # The message is formatted with the given arguments, only if it's printed.
     # Prints the name of the function where it came from, if show_func_name = True.
-    def log_error(msg, show_func_name = False):
+    def log_error(msg, *args, show_func_name = False):
         if Logger.log_level >= 2:
-            if show_func_name:
-                print('ERROR in ', inspect.stack()[1][3], '(): ', msg, sep='')
-            else:
-                print('ERROR:', msg)
-    
+            Logger.log("ERROR", msg, args, sys._getframe(1).f_code.co_name if show_func_name else None)
+
     # Logs a warning to the console.
+    # The message is formatted with the given arguments, only if it's printed.
     # Prints the name of the function where it came from, if show_func_name = True.
-    def log_warning(msg, show_func_name = False):
+    def log_warning(msg, *args, show_func_name = False):
         if Logger.log_level >= 1:
-            if show_func_name:
-                print('WARNING in ', inspect.stack()[1][3], '(): ', msg, sep='')
-            else:
-                print('WARNING:', msg)
+            Logger.log("WARNING", msg, args, sys._getframe(1).f_code.co_name if show_func_name else None)
 
     # Logs info to the console.
+    # The message is formatted with the given arguments, only if it's printed.
     # Prints the name of the function where it came from, if show_func_name = True.
-    def log_info(msg, show_func_name = False):
+    def log_info(msg, *args, show_func_name = False):
         if Logger.log_level >= 0:
-            if show_func_name:
-                print('INFO in ', inspect.stack()[1][3], '(): ', msg, sep='')
-            else:
-                print('INFO:', msg)
+            Logger.log("INFO", msg, args, sys._getframe(1).f_code.co_name if show_func_name else None)
+
+    # Logs a message of the given level, if it's not rate-limited
+    def log(level: str, msg, args: tuple, func_name: str) -> None:
+        if not Logger.is_allowed(level, msg):
+            return
+        text = str(msg).format(*args) if args else str(msg)
+        Logger.output(Logger.format_message(level, text, func_name))
+
+    # Checks if a message with the given format string can be printed now.
+    # At most RATE_LIMIT messages with the same format string are printed in RATE_LIMIT_WINDOW seconds, the rest are counted.
+    # When a new window starts, the count of messages suppressed in the last one is reported first.
+    def is_allowed(level: str, msg) -> bool:
+        if Logger.RATE_LIMIT is None:
+            return True
+        key = (level, msg)
+        now = time.monotonic()
+        window = Logger.rate_windows.get(key)
+        if window is None or now - window[0] >= Logger.RATE_LIMIT_WINDOW:
+            if window is not None and window[2] > 0:
+                Logger.report_suppressed_message(level, msg, window[2])
+            Logger.rate_windows[key] = [now, 1, 0]
+            return True
+        if window[1] < Logger.RATE_LIMIT:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+    # Reports how many messages were suppressed by rate-limiting, for every format string, and starts new windows.
+    # Should be called at the end of an operation that might have logged many similar messages.
+    def report_suppressed() -> None:
+        for (level, msg), window in Logger.rate_windows.items():
+            if window[2] > 0:
+                Logger.report_suppressed_message(level, msg, window[2])
+        Logger.rate_windows = {}
+
+    # Reports how many messages with a format string were suppressed
+    def report_suppressed_message(level: str, msg, count: int) -> None:
+        Logger.output(Logger.format_message(level, "{} more messages like \"{}\" were suppressed.".format(count, msg), None))
+
+    # Formats a message as a line of text, or as a JSON object if json_output = True. Returns the resulting string
+    def format_message(level: str, text: str, func_name: str, **fields) -> str:
+        if Logger.json_output:
+            # Imported here, so that it doesn't slow down the start of the application when JSON is not used
+            import json
+            record = {"time": time.time(), "level": level.lower(), "message": text}
+            if func_name is not None:
+                record["function"] = func_name
+            record.update(fields)
+            return json.dumps(record, ensure_ascii = False)
+        if func_name is not None:
+            return level + " in " + func_name + "(): " + text
+        return level + ": " + text
+
+    # Prints a logged message to the console, or stores it if messages are being captured
+    def output(text: str) -> None:
+        if Logger.captured is not None:
+            Logger.captured.append(text)
+        else:
+            print(text, file = Logger.file)
+
+    # Starts capturing logged messages instead of printing them.
+    # Used in worker processes, so that their messages can be printed by the main process.
+    def start_capture() -> None:
+        Logger.captured = []
+
+    # Stops capturing logged messages. Returns the messages captured since the capture was started
+    def stop_capture() -> list[str]:
+        Logger.report_suppressed()
+        captured = Logger.captured
+        Logger.captured = None
+        return captured if captured is not None else []
+
+    # Prints messages that were captured earlier, possibly in another process
+    def replay(messages: list[str]) -> None:
+        for text in messages:
+            Logger.output(text)
+
+    # Returns a timing span with the given name, to be used in a with statement.
+    # When the with block ends, its duration is logged as info, if log_timings = True.
+    def span(name: str):
+        return Span(name)
+
+    # Messages captured since start_capture() was called, or None if messages are not being captured
+    captured = None
+    # File that messages are printed to, the standard output if None.
+    # Commands whose output goes to the standard output (like JSON lines) print the messages to the standard error instead
+    file = None
 
     # Level of verbosity of the the logger
     # On level 0 only info messages are printed
     # On level 1 info and warning messages are printed
     # On level 2 info, warning and error messages are printed
-    log_level = 2
\ No newline at end of file
+    log_level = 2
+
+    # Whether messages are printed as JSON objects, one per line, instead of plain text
+    json_output = False
+    # Whether timing spans log their durations
+    log_timings = False
+
+    # Maximum number of messages with the same format string in a window of RATE_LIMIT_WINDOW seconds.
+    # None turns off rate-limiting
+    RATE_LIMIT = 5
+    RATE_LIMIT_WINDOW = 10.0
+    # Rate-limiting windows by (level, format string). Values are [start time of the window, messages printed, messages suppressed]
+    rate_windows = {}
+
+# A class for a timing span - a named block of code whose duration is measured and logged.
+# Spans can be nested, nested spans are logged with the names of the spans around them.
+class Span:
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+        self.seconds = None
+
+    def __enter__(self):
+        Span.get_stack().append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.start
+        stack = Span.get_stack()
+        path = "/".join(stack)
+        stack.pop()
+        if Logger.log_timings and Logger.log_level >= 0:
+            text = "{} took {:.3f} ms".format(path, self.seconds * 1000)
+            Logger.output(Logger.format_message("INFO", text, None, span = path, seconds = self.seconds))
+        # Messages suppressed during the span are reported when it ends
+        if not stack:
+            Logger.report_suppressed()
+        return False
+
+    # Returns the names of the spans that are currently open in this thread, outermost first
+    def get_stack() -> list[str]:
+        stack = getattr(Span.local, "stack", None)
+        if stack is None:
+            stack = Span.local.stack = []
+        return stack
+
+    # Each thread has its own stack of spans, e.g. every session of the server
+    local = threading.local()
@@ -1,21 +1,62 @@
 from interface.index_page import IndexPage
 from interface.home_page import HomePage
 from data.database import Database
+from data.sqlite_storage import SqliteStorage
+from data.sharded_storage import ShardedStorage
+from logger import Logger
+from password_hasher import PasswordHasher
+import argparse
 
 USERS_DATA_FILE = "data/users/users.txt"
+SQLITE_DATA_FILE = "data/supermem.db"
+SHARDS_DIRECTORY = "data/users/shards"
+# Whether dictionary files are parsed in a process pool (only if there are enough of them, see Database.PARALLEL_LOAD_MIN_BYTES)
+PARALLEL_DICTIONARY_LOADING = False
+# Whether users are loaded lazily - each user is fully loaded only when they log in
+LAZY_USER_LOADING = True
+# Whether only the languages of the dictionaries are read at startup, and the words of a dictionary are loaded on first use
+LAZY_DICTIONARY_LOADING = True
+# Whether the shards of the sharded storage are parsed in a process pool, when users are not loaded lazily
+PARALLEL_USER_LOADING = False
 
-database = Database()
-database.load_dictionaries()
-database.load_users(USERS_DATA_FILE)
+# The guard is needed, because processes for parallel dictionary loading may import this module
+if __name__ == "__main__":
+    # Storage of the data can be chosen at startup. Text files are the default,
+    # and python -m tools.migrate_storage converts the data between the storages
+    parser = argparse.ArgumentParser(description = "SuperMem - learn words in a foreign language.")
+    parser.add_argument("--storage", choices = ["text", "sqlite", "sharded"], default = "text")
+    parser.add_argument("--timings", action = "store_true", help = "log how long loading, saving and each action take")
+    parser.add_argument("--mapped-dictionaries", action = "store_true", help = "read dictionaries from their mapped compiled files, shared by all processes on the host")
+    parser.add_argument("--json-logs", action = "store_true", help = "print log messages as JSON lines")
+    parser.add_argument("--bcrypt-cost", type = int, default = PasswordHasher.cost, help = "bcrypt cost of new password hashes, older hashes are upgraded on login")
+    args = parser.parse_args()
+    if not PasswordHasher.MIN_COST <= args.bcrypt_cost <= PasswordHasher.MAX_COST:
+        parser.error("--bcrypt-cost must be between {} and {}".format(PasswordHasher.MIN_COST, PasswordHasher.MAX_COST))
+    PasswordHasher.cost = args.bcrypt_cost
+    Logger.log_timings = args.timings
+    Database.MAP_COMPILED_DICTIONARIES = args.mapped_dictionaries
+    Logger.json_output = args.json_logs
+    storage = None
+    if args.storage == "sqlite":
+        storage = SqliteStorage(SQLITE_DATA_FILE)
+    elif args.storage == "sharded":
+        storage = ShardedStorage(SHARDS_DIRECTORY, parallel = PARALLEL_USER_LOADING)
 
-languages = database.get_all_languages()
-IndexPage.run(database.users, database)
-#home_page = HomePage(database.users[1])
-#home_page.run(database)
+    database = Database(storage)
+    database.load_dictionaries(parallel = PARALLEL_DICTIONARY_LOADING, lazy = LAZY_DICTIONARY_LOADING)
+    database.load_users(USERS_DATA_FILE, lazy = LAZY_USER_LOADING)
 
-database.export_users(USERS_DATA_FILE)
+    languages = database.get_all_languages()
+    IndexPage.run(database)
+    #home_page = HomePage(database.users[1])
+    #home_page.run(database)
 
-# For now do not export dictionaries back to their files,
-# because there's no functionality that changes a dictionary,
-# and because empty lines are not handled yet and they are lost when exporting a dictionary
-#database.export_dictionaries()
\ No newline at end of file
+    # Changes to users are saved to a journal as they happen.
+    # The users file is rewritten only once the journal has grown big
+    database.save_users()
+    if storage is not None:
+        storage.close()
+
+    # For now do not export dictionaries back to their files, because there's no functionality that changes a dictionary.
+    # Exporting keeps the pages of the dictionaries, so it's safe to turn on once there is
+    #database.export_dictionaries()
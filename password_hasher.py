@@ -0,0 +1,55 @@
+import os
+
+# A class for hashing and checking passwords with bcrypt.
+# bcrypt is slow on purpose - a hash takes hundreds of milliseconds of CPU at the default cost.
+# The work is done in a bounded pool of threads (bcrypt releases the GIL), and the functions return futures,
+# so the caller decides how to wait: CLI.wait() lets other sessions of the server run meanwhile,
+# and asyncio code can await asyncio.wrap_future(future).
+# bcrypt and the thread pool are imported on first use, so that they don't slow down the start of the application.
+class PasswordHasher:
+    # Hashes a password with the current cost. Returns a future of the hash
+    def hash(password: str):
+        return PasswordHasher.get_executor().submit(PasswordHasher.hash_now, password, PasswordHasher.cost)
+
+    # Checks if a password matches a hash. Returns a future of the result
+    def check(password: str, password_hash: bytes):
+        return PasswordHasher.get_executor().submit(PasswordHasher.check_now, password, password_hash)
+
+    # Hashes a password with the given cost, in the calling thread. Returns the hash
+    def hash_now(password: str, cost: int) -> bytes:
+        import bcrypt
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds = cost))
+
+    # Checks if a password matches a hash, in the calling thread. Returns the result
+    def check_now(password: str, password_hash: bytes) -> bool:
+        import bcrypt
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), password_hash)
+        except ValueError:
+            # A malformed hash doesn't match any password
+            return False
+
+    # Checks if a hash was made with a different cost than the current one, so it should be replaced
+    # with a new hash of the same password. Hashes look like $2b$12$..., where 12 is the cost
+    def needs_rehash(password_hash: bytes) -> bool:
+        parts = password_hash.split(b"$")
+        try:
+            return int(parts[2]) != PasswordHasher.cost
+        except (IndexError, ValueError):
+            return True
+
+    # Returns the pool of threads for hashing, creating it on first use
+    def get_executor():
+        if PasswordHasher.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            PasswordHasher.executor = ThreadPoolExecutor(max_workers = PasswordHasher.MAX_WORKERS, thread_name_prefix = "bcrypt")
+        return PasswordHasher.executor
+
+    # Cost (log2 of the number of rounds) of new hashes. Each step doubles the time of hashing and checking.
+    # Hashes made with another cost are replaced on the next login
+    cost = 12
+    MIN_COST = 4
+    MAX_COST = 31
+    # Maximum number of hashes computed at the same time. More requests wait in a queue
+    MAX_WORKERS = os.cpu_count() or 2
+    executor = None
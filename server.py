@@ -0,0 +1,125 @@
+from interface.index_page import IndexPage
+from interface.cli import CLI
+from interface.session_io import SessionIO
+from data.database import Database
+from data.sqlite_storage import SqliteStorage
+from data.sharded_storage import ShardedStorage
+from logger import Logger
+from password_hasher import PasswordHasher
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import contextvars
+import threading
+
+# Server mode of the application. The database is loaded once, and many users are served at the same time over TCP,
+# each connection being a session with the same pages as the console application.
+# Clients can be as simple as a terminal:
+#   python server.py --port 7777
+#   nc localhost 7777
+# See tools/load_client.py for a scripted client.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+USERS_DATA_FILE = "data/users/users.txt"
+SQLITE_DATA_FILE = "data/supermem.db"
+SHARDS_DIRECTORY = "data/users/shards"
+# Maximum number of sessions that run at the same time. Further connections wait for a free one
+DEFAULT_MAX_SESSIONS = 64
+# Seconds of waiting for a client's answer after which its session is ended
+DEFAULT_SESSION_TIMEOUT = 15 * 60
+
+# A class for the server. Connections are accepted by an asyncio event loop,
+# and the pages of each session run in a thread of a pool, with the session's I/O set as the CLI's I/O.
+class Server:
+    # Creates a server of the given (loaded) database
+    def __init__(self, database: Database, max_sessions: int = DEFAULT_MAX_SESSIONS, session_timeout: float = DEFAULT_SESSION_TIMEOUT):
+        self.database = database
+        self.session_timeout = session_timeout
+        # Only one session uses the database at a time, see SessionIO
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers = max_sessions, thread_name_prefix = "session")
+        self.sessions_count = 0
+
+    # Serves connections on the given address until the server is stopped
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        Logger.log_info("Serving on {}:{}", host, port)
+        async with server:
+            await server.serve_forever()
+
+    # Handles a connection, by running a session on it
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        io = SessionIO(loop, reader, writer, self.lock, self.session_timeout)
+        self.sessions_count += 1
+        try:
+            # Every session runs in its own context, so that it has its own I/O
+            await loop.run_in_executor(self.executor, contextvars.copy_context().run, self.run_session, io)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions_count -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    # Runs the pages of a session. Runs in a thread of the pool
+    def run_session(self, io: SessionIO) -> None:
+        CLI.io.set(io)
+        with self.lock:
+            try:
+                IndexPage.run(self.database)
+            except EOFError:
+                # The client disconnected, or didn't answer in time
+                pass
+            except Exception as error:
+                Logger.log_error("Session ended because of an error - {}", repr(error))
+
+    # Saves the changes to users. Waits for the running sessions to let go of the database first
+    def save(self) -> None:
+        with self.lock:
+            self.database.save_users()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "SuperMem server - many users learning with one loaded database.")
+    parser.add_argument("--host", default = DEFAULT_HOST)
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    parser.add_argument("--storage", choices = ["text", "sqlite", "sharded"], default = "text")
+    parser.add_argument("--users", default = USERS_DATA_FILE, help = "path to the users file, for the text storage")
+    parser.add_argument("--max-sessions", type = int, default = DEFAULT_MAX_SESSIONS, help = "maximum number of sessions that run at the same time")
+    parser.add_argument("--session-timeout", type = float, default = DEFAULT_SESSION_TIMEOUT, help = "seconds of waiting for an answer before a session is ended")
+    parser.add_argument("--timings", action = "store_true", help = "log how long loading, saving and each action take")
+    parser.add_argument("--mapped-dictionaries", action = "store_true", help = "read dictionaries from their mapped compiled files, shared by all processes on the host")
+    parser.add_argument("--json-logs", action = "store_true", help = "print log messages as JSON lines")
+    parser.add_argument("--bcrypt-cost", type = int, default = PasswordHasher.cost, help = "bcrypt cost of new password hashes, older hashes are upgraded on login")
+    args = parser.parse_args()
+    if not PasswordHasher.MIN_COST <= args.bcrypt_cost <= PasswordHasher.MAX_COST:
+        parser.error("--bcrypt-cost must be between {} and {}".format(PasswordHasher.MIN_COST, PasswordHasher.MAX_COST))
+    PasswordHasher.cost = args.bcrypt_cost
+    Logger.log_timings = args.timings
+    Database.MAP_COMPILED_DICTIONARIES = args.mapped_dictionaries
+    Logger.json_output = args.json_logs
+    storage = None
+    if args.storage == "sqlite":
+        # Sessions use the storage from their threads, one at a time
+        storage = SqliteStorage(SQLITE_DATA_FILE, shared = True)
+    elif args.storage == "sharded":
+        storage = ShardedStorage(SHARDS_DIRECTORY)
+
+    database = Database(storage)
+    database.load_dictionaries(lazy = True)
+    database.load_users(args.users, lazy = True)
+
+    server = Server(database, args.max_sessions, args.session_timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    # Changes to users are saved to a journal as they happen, as in the console application
+    server.save()
+    if storage is not None:
+        storage.close()
@@ -0,0 +1,124 @@
+from array import array
+from datetime import date
+import heapq
+
+# A class for a user's spaced repetition schedule in one of their languages.
+# Words are scheduled with the SM-2 algorithm: each word has a due day, an interval (in days) until its next review,
+# an ease factor that says how fast the interval grows, and a count of successful reviews in a row.
+# The properties are kept in compact arrays, one element per active word, next to the user's confidences.
+#
+# A heap of (due day, word index) makes fetching the next k due words cost O(k log n) instead of sorting all the words.
+# The heap is not updated in place when a word is reviewed - a new entry is pushed instead,
+# and entries whose due day doesn't match the word's current due day are skipped as outdated.
+class Schedule:
+    # Creates a schedule from its arrays. All arrays should have the same length
+    def __init__(self, due: array = None, intervals: array = None, eases: array = None, repetitions: array = None):
+        self.due = due if due is not None else array('i')
+        self.intervals = intervals if intervals is not None else array('H')
+        self.eases = eases if eases is not None else array('H')
+        self.repetitions = repetitions if repetitions is not None else array('B')
+        # Heap of (due day, word index), built on first use
+        self.heap = None
+
+    # Returns the number of words in the schedule
+    def __len__(self) -> int:
+        return len(self.due)
+
+    # Makes the schedule have the given number of words.
+    # New words are due right away, so they are reviewed in the next session.
+    def resize(self, words_count: int) -> None:
+        old_count = len(self.due)
+        if words_count > old_count:
+            added = words_count - old_count
+            self.due.extend([0] * added)
+            self.intervals.extend([0] * added)
+            self.eases.extend([Schedule.INITIAL_EASE] * added)
+            self.repetitions.frombytes(bytes(added))
+            if self.heap is not None:
+                for word_idx in range(old_count, words_count):
+                    heapq.heappush(self.heap, (0, word_idx))
+        elif words_count < old_count:
+            del self.due[words_count:]
+            del self.intervals[words_count:]
+            del self.eases[words_count:]
+            del self.repetitions[words_count:]
+            # Entries of removed words are dropped
+            self.heap = None
+
+    # Returns indices of up to count words that are due on the given day (or earlier), the most overdue first
+    def get_due(self, count: int, today: int) -> list[int]:
+        if self.heap is None or len(self.heap) > 2 * len(self.due) + Schedule.HEAP_SLACK:
+            self.build_heap()
+        word_idxs = []
+        taken = []
+        while self.heap and len(word_idxs) < count:
+            due, word_idx = self.heap[0]
+            if due > today:
+                break
+            entry = heapq.heappop(self.heap)
+            # Skip outdated entries of words that were reviewed since the entry was pushed
+            if self.due[word_idx] != due:
+                continue
+            word_idxs.append(word_idx)
+            taken.append(entry)
+        # The words stay in the heap until they are reviewed
+        for entry in taken:
+            heapq.heappush(self.heap, entry)
+        return word_idxs
+
+    # Returns indices of up to count words with indices in [start, stop) that are due on the given day (or earlier), the most overdue first.
+    # Only the words in the range are looked at, so it's for a small part of the schedule, like a page of a dictionary
+    def get_due_between(self, start: int, stop: int, count: int, today: int) -> list[int]:
+        due_idxs = [word_idx for word_idx in range(start, min(stop, len(self.due))) if self.due[word_idx] <= today]
+        due_idxs.sort(key = self.due.__getitem__)
+        return due_idxs[:count]
+
+    # Returns the number of words that are due on the given day (or earlier)
+    def count_due(self, today: int) -> int:
+        return sum(1 for due in self.due if due <= today)
+
+    # Reviews a word on the given day, with a quality of the answer from 0 (total blackout) to 5 (perfect).
+    # Updates the word's interval, ease and due day.
+    def review(self, word_idx: int, quality: int, today: int) -> None:
+        if quality < Schedule.MIN_PASSING_QUALITY:
+            # Failed words start over
+            self.repetitions[word_idx] = 0
+            interval = 1
+        else:
+            if self.repetitions[word_idx] == 0:
+                interval = 1
+            elif self.repetitions[word_idx] == 1:
+                interval = 6
+            else:
+                interval = round(self.intervals[word_idx] * self.eases[word_idx] / 100)
+            self.repetitions[word_idx] = min(self.repetitions[word_idx] + 1, 255)
+        # Ease changes by 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02), here in hundredths
+        miss = 5 - quality
+        ease = self.eases[word_idx] + 10 - miss * (8 + miss * 2)
+        self.eases[word_idx] = max(Schedule.MIN_EASE, ease)
+        self.intervals[word_idx] = min(interval, Schedule.MAX_INTERVAL)
+        self.due[word_idx] = today + self.intervals[word_idx]
+        if self.heap is not None:
+            heapq.heappush(self.heap, (self.due[word_idx], word_idx))
+
+    # Builds the heap of due words from scratch
+    def build_heap(self) -> None:
+        self.heap = [(due, word_idx) for word_idx, due in enumerate(self.due)]
+        heapq.heapify(self.heap)
+
+    # Returns today's day number, the unit of due days
+    def today() -> int:
+        return date.today().toordinal()
+
+    # Ease factor of new words (2.5), and the lowest ease factor (1.3), in hundredths
+    INITIAL_EASE = 250
+    MIN_EASE = 130
+    # Longest interval between two reviews, in days
+    MAX_INTERVAL = 36500
+    # Answers with lower quality than this are failed
+    MIN_PASSING_QUALITY = 3
+    # Qualities given to correct and wrong answers in word tests
+    CORRECT_QUALITY = 4
+    WRONG_QUALITY = 1
+    # How many outdated entries the heap can collect before it's rebuilt
+    HEAP_SLACK = 64
@@ -0,0 +1,61 @@
+from weighted_shuffle import WeightedShuffle
+import unittest
+
+# Tests of the weighted shuffle. All the random draws are seeded, so the tests always give the same results.
+# Run from the root directory of the project:
+#   python -m unittest discover tests
+class TestWeightedShuffle(unittest.TestCase):
+    # The first item of a permutation is drawn with probability proportional to its weight.
+    # The counts of first items over many seeds are checked with a chi-square test against the expected counts
+    def test_first_pick_frequencies(self):
+        weights = [1, 2, 3, 0, 0]
+        trials = 6000
+        counts = [0] * len(weights)
+        for seed in range(trials):
+            counts[WeightedShuffle.permutation(weights, seed)[0]] += 1
+        self.assertEqual(counts[3:], [0, 0])
+        total_weight = sum(weights)
+        chi_square = 0
+        for weight, count in zip(weights[:3], counts[:3]):
+            expected = trials * weight / total_weight
+            chi_square += (count - expected) ** 2 / expected
+        self.assertLess(chi_square, TestWeightedShuffle.CHI_SQUARE_2_DF_P001)
+
+    # Items with zero weight always come after all the items with positive weight
+    def test_zero_weights_last(self):
+        weights = [0, 5, 0, 1, 0.5, 0]
+        for seed in range(200):
+            permutation = WeightedShuffle.permutation(weights, seed)
+            self.assertEqual(sorted(permutation), list(range(len(weights))))
+            self.assertEqual(set(permutation[3:]), {0, 2, 5})
+
+    # Every permutation of items with zero weight only is possible, they are shuffled uniformly
+    def test_all_zero_weights(self):
+        permutations = set(tuple(WeightedShuffle.permutation([0, 0, 0], seed)) for seed in range(200))
+        self.assertEqual(len(permutations), 6)
+
+    def test_negative_weight(self):
+        with self.assertRaises(ValueError):
+            WeightedShuffle.permutation([1, -1, 2])
+        with self.assertRaises(ValueError):
+            WeightedShuffle.permutation_by(["a", "b"], lambda item: -1 if item == "b" else 1)
+
+    # The same weights and seed always give the same permutation, and different seeds give different ones
+    def test_seed_reproducibility(self):
+        weights = [3, 1, 4, 1, 5, 9, 2, 6]
+        self.assertEqual(WeightedShuffle.permutation(weights, 42), WeightedShuffle.permutation(weights, 42))
+        permutations = set(tuple(WeightedShuffle.permutation(weights, seed)) for seed in range(20))
+        self.assertGreater(len(permutations), 1)
+
+    def test_permutation_by_seed_reproducibility(self):
+        items = ["a", "bb", "ccc", "", "dddd"]
+        self.assertEqual(WeightedShuffle.permutation_by(items, len, 7), WeightedShuffle.permutation_by(items, len, 7))
+        # Weights given by a function give the same permutation as the same weights given directly
+        self.assertEqual(WeightedShuffle.permutation_by(items, len, 7), WeightedShuffle.permutation([len(item) for item in items], 7))
+        self.assertEqual(WeightedShuffle.permutation_by(items, len, 7)[-1], 3)
+
+    # Critical value of the chi-square distribution with 2 degrees of freedom, at significance 0.001
+    CHI_SQUARE_2_DF_P001 = 13.816
+
+if __name__ == "__main__":
+    unittest.main()
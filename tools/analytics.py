@@ -0,0 +1,310 @@
+from data.database import Database
+from data.sqlite_storage import SqliteStorage
+from data.sharded_storage import ShardedStorage
+from logger import Logger
+import argparse
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+
+# Command for analytics of the learning progress across all users.
+# For each dictionary, the confidences of all users who learn with it are packed into a users x words matrix,
+# with a mask of the words each user has learned (a user's confidences cover only their active words).
+# From the matrices, with vectorized operations:
+#   hardest words      - the words with the lowest mean confidence among the users who learned them
+#   level histograms   - for each word level, how many learned words fall into each range of confidences
+#   retention curves   - for each language, the mean confidence of words by how many words were learned after them
+#
+# The matrices are cached in a file, together with a fingerprint of every user. On the next run only the users whose
+# fingerprint changed (or who are new) are loaded and packed again, the rows of the rest are taken from the cache.
+# Users that are not loaded are fingerprinted from their lines in the users file, without parsing them.
+# Needs NumPy, which the application itself doesn't.
+# Run from the root directory of the project:
+#   python -m tools.analytics [--top N] [--min-learners N] [--cache FILE | --no-cache] [--storage STORAGE]
+
+DEFAULT_USERS_FILE = "data/users/users.txt"
+DEFAULT_SQLITE_FILE = "data/supermem.db"
+DEFAULT_SHARDS_DIRECTORY = "data/users/shards"
+DEFAULT_CACHE_FILE = "data/analytics_cache.npz"
+# Version of the layout of the cache file. A cache with another version is ignored
+CACHE_VERSION = 1
+# Number of hardest words listed for each dictionary
+DEFAULT_TOP_WORDS = 20
+# Minimum number of users who learned a word, for its difficulty to be reported
+DEFAULT_MIN_LEARNERS = 3
+# Number of equal ranges of confidences (0 to 100) in the level histograms
+CONFIDENCE_BINS = 10
+MAX_LEVEL = 100
+# Number of words learned after a word, that fall into one point of a retention curve
+RETENTION_BUCKET_WORDS = 25
+
+# Returns the fingerprint of a serialized user
+def fingerprint(serialized: bytes) -> str:
+    return hashlib.blake2b(serialized, digest_size = 16).hexdigest()
+
+# Returns the fingerprints of all the users in the database, by username.
+# Users that are not loaded are fingerprinted from their lines in the users file. A line is the same as the serialized user,
+# so the fingerprint of a user doesn't depend on whether they were loaded. Users of a storage backend are loaded
+def fingerprint_users(database: Database) -> dict[str, str]:
+    database.index_all_users()
+    fingerprints = {}
+    usernames_by_offset = {record[0]: username for username, record in database.user_records.items() if record[0] is not None}
+    if usernames_by_offset:
+        with open(database.users_filepath, 'rb') as file:
+            offset = 0
+            for line in file:
+                username = usernames_by_offset.get(offset)
+                if username is not None:
+                    fingerprints[username] = fingerprint(line.strip())
+                offset += len(line)
+    for username in [username for username, record in database.user_records.items() if record[0] is None]:
+        database.get_user(username)
+    for user in database.users:
+        fingerprints[user.username] = fingerprint(Database.serialize_user(user).encode("utf-8"))
+    return fingerprints
+
+# Loads the cache of an earlier run. Returns (fingerprints of users by username, matrices by dictionary filepath).
+# A missing, broken or outdated cache is the same as an empty one
+def load_cache(filepath: str) -> tuple[dict[str, str], dict[str, dict]]:
+    try:
+        with np.load(filepath, allow_pickle = False) as data:
+            if int(data["version"]) != CACHE_VERSION:
+                return {}, {}
+            fingerprints = dict(zip(data["fingerprint_usernames"].tolist(), data["fingerprint_values"].tolist()))
+            matrices = {}
+            for idx, dict_filepath in enumerate(data["dictionaries"].tolist()):
+                matrices[dict_filepath] = {
+                    "usernames": data["usernames_{}".format(idx)].tolist(),
+                    "languages": data["languages_{}".format(idx)].tolist(),
+                    "learned": data["learned_{}".format(idx)],
+                    "confidences": data["confidences_{}".format(idx)]
+                }
+            return fingerprints, matrices
+    except (OSError, KeyError, ValueError):
+        return {}, {}
+
+# Writes the cache for the next run. It's written to a temporary file first, so that a broken run doesn't leave a half-written cache
+def save_cache(filepath: str, fingerprints: dict[str, str], matrices: dict[str, dict]) -> None:
+    arrays = {
+        "version": np.array(CACHE_VERSION),
+        "fingerprint_usernames": np.array(list(fingerprints.keys()), dtype = str),
+        "fingerprint_values": np.array(list(fingerprints.values()), dtype = str),
+        "dictionaries": np.array(list(matrices.keys()), dtype = str)
+    }
+    for idx, matrix in enumerate(matrices.values()):
+        arrays["usernames_{}".format(idx)] = np.array(matrix["usernames"], dtype = str)
+        arrays["languages_{}".format(idx)] = np.array(matrix["languages"], dtype = str)
+        arrays["learned_{}".format(idx)] = matrix["learned"]
+        arrays["confidences_{}".format(idx)] = matrix["confidences"]
+    temp_filepath = filepath + ".tmp"
+    # A file object is given, so that NumPy doesn't add its extension to the temporary file's name
+    with open(temp_filepath, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temp_filepath, filepath)
+
+# Loads the given users and collects their rows for the matrices - one row for each of their active languages.
+# Returns a dictionary of dictionary filepaths and lists of (username, language, confidences)
+def collect_rows(database: Database, usernames: list[str]) -> dict[str, list[tuple]]:
+    filepaths_by_dictionary = {id(dictionary): filepath for dictionary, filepath in zip(database.dictionaries, database.dict_filepaths)}
+    rows = {}
+    for username in usernames:
+        user = database.get_user(username)
+        if user is None:
+            continue
+        for lang_idx, language in enumerate(user.active_languages):
+            # Dictionaries composed through a pivot language have no file, and are not analyzed
+            dict_filepath = filepaths_by_dictionary.get(id(user.dictionaries[lang_idx]))
+            if dict_filepath is None:
+                continue
+            rows.setdefault(dict_filepath, []).append((username, language, user.confidences[lang_idx]))
+    return rows
+
+# Builds the matrices of this run from the cached matrices and the rows of the changed users.
+# Rows of the changed (and removed) users are dropped from the cached matrices, and the new rows are added after the rest.
+# Returns the matrices by dictionary filepath. Each matrix is a dictionary with:
+#   usernames, languages - user and language of each row
+#   learned     - number of words each row's user has learned, as a NumPy array
+#   confidences - users x words matrix of confidences, as a NumPy array. Words a user hasn't learned have 0
+def update_matrices(cached: dict[str, dict], changed: set[str], rows: dict[str, list[tuple]], dict_filepaths: list[str]) -> dict[str, dict]:
+    matrices = {}
+    for dict_filepath in dict_filepaths:
+        old = cached.get(dict_filepath)
+        kept = []
+        if old is not None:
+            kept = [idx for idx, username in enumerate(old["usernames"]) if username not in changed]
+        new_rows = rows.get(dict_filepath, [])
+        if not kept and not new_rows:
+            continue
+        learned = np.array(
+            ([int(old["learned"][idx]) for idx in kept] if kept else []) + [len(confidences) for _, _, confidences in new_rows],
+            dtype = np.int64
+        )
+        width = int(learned.max()) if len(learned) > 0 else 0
+        matrix = np.zeros((len(learned), width), dtype = np.uint8)
+        if kept:
+            old_confidences = old["confidences"][kept]
+            kept_width = min(width, old_confidences.shape[1])
+            matrix[:len(kept), :kept_width] = old_confidences[:, :kept_width]
+        for row_idx, (_, _, confidences) in enumerate(new_rows, len(kept)):
+            if len(confidences) > 0:
+                matrix[row_idx, :len(confidences)] = np.frombuffer(confidences, dtype = np.uint8)
+        matrices[dict_filepath] = {
+            "usernames": [old["usernames"][idx] for idx in kept] + [username for username, _, _ in new_rows],
+            "languages": [old["languages"][idx] for idx in kept] + [language for _, language, _ in new_rows],
+            "learned": learned,
+            "confidences": matrix
+        }
+    return matrices
+
+# Returns the mask of the learned words of a matrix - True where the row's user has learned the word
+def get_learned_mask(learned: np.ndarray, width: int) -> np.ndarray:
+    return np.arange(width)[None, :] < learned[:, None]
+
+# Returns the number of users who learned each word, and the mean confidence of each word among them (NaN for words nobody learned)
+def get_word_difficulty(confidences: np.ndarray, mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    learners = mask.sum(axis = 0)
+    sums = np.where(mask, confidences, 0).sum(axis = 0, dtype = np.int64)
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        means = sums / learners
+    return learners, means
+
+# Returns a (levels x confidence bins) matrix of the numbers of learned words of each level whose confidence falls into each bin
+def get_level_histograms(confidences: np.ndarray, mask: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    word_levels = np.broadcast_to(levels[None, :], confidences.shape)[mask].astype(np.int64)
+    bins = np.minimum(confidences[mask].astype(np.int64) * CONFIDENCE_BINS // 100, CONFIDENCE_BINS - 1)
+    counts = np.bincount(word_levels * CONFIDENCE_BINS + bins, minlength = (MAX_LEVEL + 1) * CONFIDENCE_BINS)
+    return counts[:(MAX_LEVEL + 1) * CONFIDENCE_BINS].reshape(MAX_LEVEL + 1, CONFIDENCE_BINS)
+
+# Returns the sums of confidences and the numbers of learned words, by the number of words learned after them, in buckets.
+# The age of a word is how many words its user learned after it, so the last learned word has age 0
+def get_retention_sums(confidences: np.ndarray, mask: np.ndarray, learned: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    ages = learned[:, None] - 1 - np.arange(confidences.shape[1])[None, :]
+    buckets = ages[mask] // RETENTION_BUCKET_WORDS
+    sums = np.bincount(buckets, weights = confidences[mask])
+    counts = np.bincount(buckets)
+    return sums, counts
+
+# Adds an array to another, padding the shorter one with zeros. Returns the sum
+def add_padded(total: np.ndarray, values: np.ndarray) -> np.ndarray:
+    if total is None:
+        return values.astype(np.float64)
+    if len(total) < len(values):
+        total = np.pad(total, (0, len(values) - len(total)))
+    total[:len(values)] += values
+    return total
+
+# Computes the analytics of a dictionary's matrix. Returns its summary, and its retention sums by language
+def analyze_dictionary(dictionary, dict_filepath: str, matrix: dict, top_words: int, min_learners: int) -> tuple[dict, dict]:
+    # The dictionary might have fewer words now than when the users learned them
+    width = min(matrix["confidences"].shape[1], len(dictionary))
+    confidences = matrix["confidences"][:, :width]
+    learned = np.minimum(matrix["learned"], width)
+    mask = get_learned_mask(learned, width)
+    learners, means = get_word_difficulty(confidences, mask)
+    eligible = np.flatnonzero(learners >= max(min_learners, 1))
+    hardest = eligible[np.argsort(means[eligible], kind = "stable")[:top_words]]
+    levels = np.array(dictionary.get_levels(0, width), dtype = np.uint8)
+    histograms = get_level_histograms(confidences, mask, levels)
+    summary = {
+        "filepath": dict_filepath,
+        "language_a": dictionary.language_a,
+        "language_b": dictionary.language_b,
+        "learners": len(learned),
+        "learned_words": int(mask.sum()),
+        "hardest_words": [
+            {
+                "word_idx": int(word_idx),
+                "term_a": dictionary.terms_a[word_idx],
+                "term_b": dictionary.terms_b[word_idx],
+                "level": int(levels[word_idx]),
+                "learners": int(learners[word_idx]),
+                "mean_confidence": round(float(means[word_idx]), 2)
+            }
+            for word_idx in hardest.tolist()
+        ],
+        "level_histograms": [
+            {"level": level, "counts": histograms[level].tolist()}
+            for level in np.flatnonzero(histograms.sum(axis = 1)).tolist()
+        ]
+    }
+    # Rows are grouped by their language, so that the retention of a language covers all its dictionaries
+    retention = {}
+    languages = np.array(matrix["languages"], dtype = str)
+    for language in np.unique(languages).tolist():
+        rows = languages == language
+        retention[language] = get_retention_sums(confidences[rows], mask[rows], learned[rows])
+    return summary, retention
+
+# Runs the analytics over all the users in the database. Returns the report.
+# If a cache file is given, only the users that changed since the cache was written are loaded, and the cache is updated
+def analyze(database: Database, cache_filepath: str, top_words: int, min_learners: int) -> dict:
+    cached_fingerprints, cached_matrices = load_cache(cache_filepath) if cache_filepath is not None else ({}, {})
+    fingerprints = fingerprint_users(database)
+    changed = set(username for username, value in fingerprints.items() if cached_fingerprints.get(username) != value)
+    # Users that are gone are changed too, their rows are dropped
+    changed.update(username for username in cached_fingerprints if username not in fingerprints)
+    rows = collect_rows(database, [username for username in fingerprints if username in changed])
+    matrices = update_matrices(cached_matrices, changed, rows, database.dict_filepaths)
+    if cache_filepath is not None:
+        save_cache(cache_filepath, fingerprints, matrices)
+    dictionaries = dict(zip(database.dict_filepaths, database.dictionaries))
+    summaries = []
+    retention_sums = {}
+    for dict_filepath, matrix in matrices.items():
+        # A dictionary that cannot be loaded anymore keeps its cached rows, but it cannot be analyzed
+        if dictionaries[dict_filepath] is None:
+            continue
+        summary, retention = analyze_dictionary(dictionaries[dict_filepath], dict_filepath, matrix, top_words, min_learners)
+        summaries.append(summary)
+        for language, (sums, counts) in retention.items():
+            total_sums, total_counts = retention_sums.get(language, (None, None))
+            retention_sums[language] = (add_padded(total_sums, sums), add_padded(total_counts, counts))
+    retention_curves = {}
+    for language, (sums, counts) in retention_sums.items():
+        retention_curves[language] = [
+            {
+                "learned_after": [bucket * RETENTION_BUCKET_WORDS, (bucket + 1) * RETENTION_BUCKET_WORDS - 1],
+                "words": int(counts[bucket]),
+                "mean_confidence": round(float(sums[bucket] / counts[bucket]), 2)
+            }
+            for bucket in np.flatnonzero(counts).tolist()
+        ]
+    return {
+        "users": len(fingerprints),
+        "processed_users": len(set(fingerprints) & changed),
+        "cached_users": len(fingerprints) - len(set(fingerprints) & changed),
+        "dictionaries": summaries,
+        "retention_curves": retention_curves
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Analyze the learning progress of all SuperMem users and print a JSON report.")
+    parser.add_argument("--top", type = int, default = DEFAULT_TOP_WORDS, help = "number of hardest words listed for each dictionary")
+    parser.add_argument("--min-learners", type = int, default = DEFAULT_MIN_LEARNERS, help = "minimum number of users who learned a word, for it to be listed")
+    parser.add_argument("--cache", default = DEFAULT_CACHE_FILE, help = "file that caches the packed confidences between runs")
+    parser.add_argument("--no-cache", action = "store_true", help = "process all the users, without reading or writing the cache")
+    parser.add_argument("--storage", choices = ["text", "sqlite", "sharded"], default = "text")
+    parser.add_argument("--users", default = DEFAULT_USERS_FILE, help = "path to the users text file")
+    parser.add_argument("--sqlite", default = DEFAULT_SQLITE_FILE, help = "path to the SQLite database file")
+    parser.add_argument("--shards-directory", default = DEFAULT_SHARDS_DIRECTORY, help = "path to the directory of the sharded storage")
+    args = parser.parse_args()
+    # The report goes to the standard output, so log messages go to the standard error
+    Logger.file = sys.stderr
+
+    storage = None
+    if args.storage == "sqlite":
+        storage = SqliteStorage(args.sqlite)
+    elif args.storage == "sharded":
+        storage = ShardedStorage(args.shards_directory)
+    database = Database(storage)
+    # Dictionaries without learners are never loaded, and users that didn't change are never parsed
+    database.load_dictionaries(lazy = True)
+    database.load_users(args.users, lazy = True)
+    with Logger.span("analytics"):
+        report = analyze(database, None if args.no_cache else args.cache, args.top, args.min_learners)
+    if storage is not None:
+        storage.close()
+    Logger.report_suppressed()
+    print(json.dumps(report, indent = 4, ensure_ascii = False))
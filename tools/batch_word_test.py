@@ -0,0 +1,140 @@
+from data.database import Database
+from data.sqlite_storage import SqliteStorage
+from data.sharded_storage import ShardedStorage
+from interface.home_page import HomePage, SPACED_REPETITION_MODE
+from spaced_repetition import Schedule
+from logger import Logger
+from user import User
+import argparse
+import json
+import sys
+
+# Command for running a word test without prompts, e.g. for automated grading or regression runs.
+# The words are ordered the same way as in the interactive test (HomePage.do_word_test()), and the answers are read
+# one per line from a file or the standard input, in the order of the questions. Each answer is graded like in the interactive test -
+# user's confidence (and schedule, in spaced repetition mode) is updated and recorded - and its result is written as a JSON line.
+# Answers are streamed, so there are no prompts and no round-trips. The test ends when the words or the answers run out.
+# The summary of the test is printed to the standard error, together with any log messages.
+# Run from the root directory of the project:
+#   python -m tools.batch_word_test USERNAME LANGUAGE [--answers FILE] [--direction DIRECTION] [--mode N] [--page N] [--seed N] [--dry-run]
+
+DEFAULT_USERS_FILE = "data/users/users.txt"
+DEFAULT_SQLITE_FILE = "data/supermem.db"
+DEFAULT_SHARDS_DIRECTORY = "data/users/shards"
+# Directions of the test: questions in the learned language and answers in the main language, or the other way
+DIRECTIONS = ["to-main", "from-main"]
+# Modes of ordering the words, the same as the options of the interactive test
+MODES = list(range(1, SPACED_REPETITION_MODE + 1))
+
+# Runs a word test of a user in one of their active languages, answered by the given lines.
+# If a page is given (0-based), only the words the user knows on that page are tested.
+# Writes the result of each answer to the output as a JSON line. Returns the summary of the test
+def run_batch_test(database: Database, user: User, language: str, from_kn: bool, order_mode: int, answers, output,
+                   page_idx: int = None, seed: int = None) -> dict:
+    home_page = HomePage(user)
+    language_idx = user.active_languages.index(language)
+    dictionary = user.dictionaries[language_idx]
+    words_count = user.active_words[language_idx]
+    words = dictionary.words[:words_count]
+    if page_idx is not None:
+        page = dictionary.get_page(page_idx)
+        words = page[:max(0, words_count - page.start)]
+    should_swap_dict = home_page.should_swap_dictionary(dictionary, from_kn)
+    # Indices in the tested words are moved to the indices in the dictionary, like in the interactive test
+    word_idxs = [words.start + idx for idx in home_page.get_words_ordered_in_mode(words, order_mode, language_idx, seed)]
+    review = order_mode == SPACED_REPETITION_MODE
+    today = Schedule.today()
+    answered_count = 0
+    correct_count = 0
+    # Words and answers are paired until either of them runs out
+    for word_idx, line in zip(word_idxs, answers):
+        word = dictionary.words[word_idx]
+        question, real_answer = home_page.get_question(word, language, from_kn, should_swap_dict)
+        # Answers are stripped the same way as the ones typed in the interactive test
+        answer = line.strip()
+        correct = home_page.grade_answer(database, language_idx, word_idx, answer, real_answer, review, today)
+        result = {
+            "word_idx": word_idx,
+            "question": question.strip(),
+            "answer": answer,
+            "expected": real_answer,
+            "correct": correct,
+            "confidence": user.confidences[language_idx][word_idx]
+        }
+        if review:
+            result["due"] = user.schedules[language_idx].due[word_idx]
+        output.write(json.dumps(result, ensure_ascii = False) + "\n")
+        answered_count += 1
+        correct_count += correct
+    output.flush()
+    return {
+        "user": user.username,
+        "language": language,
+        "direction": DIRECTIONS[from_kn],
+        "mode": order_mode,
+        "page": page_idx + 1 if page_idx is not None else None,
+        "words": len(word_idxs),
+        "answered": answered_count,
+        "correct": correct_count,
+        "unanswered": len(word_idxs) - answered_count
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run a SuperMem word test with answers from a file, and write the results as JSON lines.")
+    parser.add_argument("username", help = "user who takes the test")
+    parser.add_argument("language", help = "one of the user's active languages")
+    parser.add_argument("--answers", default = "-", help = "file with one answer per line, the standard input by default")
+    parser.add_argument("--output", default = "-", help = "file to write the results to, the standard output by default")
+    parser.add_argument("--direction", choices = DIRECTIONS, default = DIRECTIONS[0],
+                        help = "to-main: questions in the language, answers in the user's main language; from-main: the other way")
+    parser.add_argument("--mode", type = int, choices = MODES, default = 1, help = "mode of ordering the words, the same as in the interactive test")
+    parser.add_argument("--page", type = int, default = None, help = "test only the words on this page of the dictionary (1-based)")
+    parser.add_argument("--seed", type = int, default = None, help = "seed of the modes that shuffle the words, for reproducible runs")
+    parser.add_argument("--dry-run", action = "store_true", help = "grade the answers without saving the changes to the user")
+    parser.add_argument("--storage", choices = ["text", "sqlite", "sharded"], default = "text")
+    parser.add_argument("--users", default = DEFAULT_USERS_FILE, help = "path to the users text file")
+    parser.add_argument("--sqlite", default = DEFAULT_SQLITE_FILE, help = "path to the SQLite database file")
+    parser.add_argument("--shards-directory", default = DEFAULT_SHARDS_DIRECTORY, help = "path to the directory of the sharded storage")
+    args = parser.parse_args()
+    # The standard output may be the results, so log messages go to the standard error
+    Logger.file = sys.stderr
+
+    storage = None
+    if args.storage == "sqlite":
+        storage = SqliteStorage(args.sqlite)
+    elif args.storage == "sharded":
+        storage = ShardedStorage(args.shards_directory)
+    database = Database(storage)
+    database.load_dictionaries(lazy = True)
+    database.load_users(args.users, lazy = True)
+    user = database.get_user(args.username)
+    if user is None:
+        parser.error("there is no user {}".format(args.username))
+    if args.language not in user.active_languages:
+        parser.error("{} is not learning {}".format(args.username, args.language))
+    page_idx = None
+    if args.page is not None:
+        dictionary = user.dictionaries[user.active_languages.index(args.language)]
+        if not 1 <= args.page <= dictionary.get_pages_count():
+            parser.error("--page must be between 1 and {}".format(dictionary.get_pages_count()))
+        page_idx = args.page - 1
+    if args.dry_run:
+        # Without a storage backend and a journal, the recorded changes go nowhere
+        database.storage = None
+        database.journal = None
+
+    answers = sys.stdin if args.answers == "-" else open(args.answers, 'r', encoding = "utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, 'w', encoding = "utf-8")
+    with Logger.span("batch_word_test"):
+        summary = run_batch_test(database, user, args.language, args.direction == DIRECTIONS[1], args.mode, answers, output, page_idx, args.seed)
+    if answers is not sys.stdin:
+        answers.close()
+    if output is not sys.stdout:
+        output.close()
+
+    if not args.dry_run:
+        database.save_users()
+        if storage is not None:
+            storage.close()
+    Logger.report_suppressed()
+    print(json.dumps(summary), file = sys.stderr)
@@ -0,0 +1,168 @@
+from data.database import Database
+from data.compiled_dictionary import CompiledDictionary
+from logger import Logger
+from word import Word
+import argparse
+import csv
+import json
+import os
+
+# Command for importing word lists from other formats as dictionary files.
+# Supported formats:
+#   flashcards - "term a,term b" on each line, without languages, levels or types
+#   csv, tsv   - rows of term A, term B and optionally level and type, comma or tab separated
+# The import is a pipeline of generators - rows are read, completed with default levels and types, and written one by one,
+# so memory use doesn't depend on the size of the input.
+# Languages come from the flags, or from a JSON manifest that maps input file names to their properties, e.g.
+#   {"flashcards.txt": {"language_a": "Spanish", "language_b": "Bulgarian", "level": 1, "type": "unknown"}}
+# Run from the root directory of the project:
+#   python -m tools.import_dictionary INPUT OUTPUT [--format FORMAT] [--language-a A --language-b B] [--manifest FILE] [--compile]
+
+FORMATS = ["flashcards", "csv", "tsv"]
+DEFAULT_LEVEL = 1
+DEFAULT_TYPE = "unknown"
+# Number of lines looked at when detecting the format of a file
+DETECTION_LINES = 20
+
+# Detects the format of a word list from its extension, or from its first lines. Returns the name of the format
+def detect_format(filepath: str) -> str:
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in (".csv", ".tsv"):
+        return extension[1:]
+    with open(filepath, 'r', encoding = "utf-8-sig") as file:
+        lines = [line for _, line in zip(range(DETECTION_LINES), file) if line.strip()]
+    if any("\t" in line for line in lines):
+        return "tsv"
+    # Quoted fields or additional columns need a CSV reader, plain pairs of terms are flashcards
+    if any(line.lstrip().startswith('"') or line.count(",") > 1 for line in lines):
+        return "csv"
+    return "flashcards"
+
+# Reads rows of a word list. Yields tuples of (line number, term A, term B, level, type).
+# Level and type are None where the row doesn't have them
+def read_rows(filepath: str, format: str, skip_header: bool):
+    with open(filepath, 'r', encoding = "utf-8-sig", newline = "") as file:
+        if format == "flashcards":
+            rows = (line.rstrip("\r\n").split(",", 1) for line in file)
+        else:
+            rows = csv.reader(file, delimiter = "\t" if format == "tsv" else ",")
+        for row_idx, row in enumerate(rows):
+            if skip_header and row_idx == 0:
+                continue
+            # Skip empty lines
+            if not row or all(len(field.strip()) == 0 for field in row):
+                continue
+            row = [field.strip() for field in row] + [None, None]
+            yield row_idx + 1, row[0], row[1], row[2], row[3]
+
+# Completes rows with the default level and type, and drops rows that cannot be words.
+# Yields tuples of (term A, term B, level, type)
+def complete_rows(rows, filepath: str, default_level: int, default_type: str):
+    for line_number, term_a, term_b, level, type in rows:
+        if not term_a or not term_b:
+            Logger.log_warning("Row {} of {} does not have two terms, it will be skipped.", line_number, filepath)
+            continue
+        # Terms are written between separators of the dictionary file, so they cannot contain them
+        if Database.PROPERTY_SEPARATOR in term_a or Database.PROPERTY_SEPARATOR in term_b:
+            Logger.log_warning("A term on row {} of {} contains \"{}\", it will be skipped.", line_number, filepath, Database.PROPERTY_SEPARATOR)
+            continue
+        if not level:
+            level = default_level
+        else:
+            try:
+                level = int(level)
+            except ValueError:
+                level = 0
+            if level < 1 or level > 100:
+                Logger.log_warning("Row {} of {} has an invalid level, the default one will be used.", line_number, filepath)
+                level = default_level
+        if not type:
+            type = default_type
+        elif type not in Word.TYPES:
+            Logger.log_warning("Row {} of {} has an invalid type, the default one will be used.", line_number, filepath)
+            type = default_type
+        yield term_a, term_b, level, type
+
+# Writes words to a dictionary file, one by one. The file is replaced only when it's complete,
+# so the output can be the same file as the input. Returns the number of words written
+def write_words(words, filepath: str, language_a: str, language_b: str) -> int:
+    temp_filepath = filepath + ".tmp"
+    words_count = 0
+    with open(temp_filepath, 'w', encoding = "utf-8") as file:
+        file.write(Database.LANGUAGE_A_PREFIX + language_a + "\n")
+        file.write(Database.LANGUAGE_B_PREFIX + language_b + "\n")
+        for term_a, term_b, level, type in words:
+            file.write(Database.PROPERTY_SEPARATOR.join((term_a, term_b, str(level), type)) + "\n")
+            words_count += 1
+    os.replace(temp_filepath, filepath)
+    return words_count
+
+# Reads back the words of a dictionary file written by write_words(), for compiling it.
+# Yields tuples of (term A, term B, level, type code). The pages of the file are appended to the given list while the words are read,
+# as tuples of (index of the first word, byte offset of its line), the same way as Database.read_dictionary() builds the page index
+def read_written_words(filepath: str, pages: list[tuple[int, int]]):
+    words_count = 0
+    offset = 0
+    new_page = True
+    with open(filepath, 'rb') as file:
+        for raw_line in file:
+            line_offset = offset
+            offset += len(raw_line)
+            line = raw_line.decode("utf-8")
+            if len(line.strip()) == 0:
+                new_page = True
+                continue
+            if line.startswith(Database.LANGUAGE_A_PREFIX) or line.startswith(Database.LANGUAGE_B_PREFIX):
+                continue
+            if new_page:
+                pages.append((words_count, line_offset))
+                new_page = False
+            term_a, term_b, level, type = line.rstrip("\n").split(Database.PROPERTY_SEPARATOR)
+            words_count += 1
+            yield term_a, term_b, int(level), Word.TYPE_CODES[type]
+
+# Returns the properties of an input file from a manifest, or an empty dictionary if the manifest doesn't have it.
+# Files are looked up by their path first, and then by their name
+def read_manifest_entry(manifest_filepath: str, filepath: str) -> dict:
+    with open(manifest_filepath, 'r', encoding = "utf-8") as file:
+        manifest = json.load(file)
+    return manifest.get(filepath, manifest.get(os.path.basename(filepath), {}))
+
+# Imports a word list as a dictionary file, and compiles it if requested. Returns the number of words imported
+def import_dictionary(input_filepath: str, output_filepath: str, format: str, language_a: str, language_b: str,
+                      default_level: int, default_type: str, skip_header: bool, compile: bool) -> int:
+    rows = read_rows(input_filepath, format, skip_header)
+    words = complete_rows(rows, input_filepath, default_level, default_type)
+    words_count = write_words(words, output_filepath, language_a, language_b)
+    if compile:
+        pages = []
+        CompiledDictionary.compile_streamed(read_written_words(output_filepath, pages), language_a, language_b, output_filepath, pages)
+    return words_count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Import a word list as a SuperMem dictionary file.")
+    parser.add_argument("input", help = "path to the word list")
+    parser.add_argument("output", help = "path to the dictionary file to write, can be the same as the input")
+    parser.add_argument("--format", choices = FORMATS, default = None, help = "format of the word list, detected by default")
+    parser.add_argument("--language-a", default = None, help = "language of the first term")
+    parser.add_argument("--language-b", default = None, help = "language of the second term")
+    parser.add_argument("--manifest", default = None, help = "JSON file with the languages, level and type of input files")
+    parser.add_argument("--level", type = int, default = None, help = "level of words without one, {} by default".format(DEFAULT_LEVEL))
+    parser.add_argument("--type", choices = Word.TYPES, default = None, help = "type of words without one, {} by default".format(DEFAULT_TYPE))
+    parser.add_argument("--skip-header", action = "store_true", help = "skip the first row of the word list")
+    parser.add_argument("--compile", action = "store_true", help = "also write the compiled form of the dictionary")
+    args = parser.parse_args()
+
+    # Flags take precedence over the manifest
+    entry = read_manifest_entry(args.manifest, args.input) if args.manifest is not None else {}
+    language_a = args.language_a if args.language_a is not None else entry.get("language_a")
+    language_b = args.language_b if args.language_b is not None else entry.get("language_b")
+    if language_a is None or language_b is None:
+        parser.error("the languages must be given with --language-a and --language-b, or in a manifest")
+    level = args.level if args.level is not None else entry.get("level", DEFAULT_LEVEL)
+    type = args.type if args.type is not None else entry.get("type", DEFAULT_TYPE)
+    format = args.format if args.format is not None else entry.get("format") or detect_format(args.input)
+
+    words_count = import_dictionary(args.input, args.output, format, language_a, language_b, level, type, args.skip_header, args.compile)
+    Logger.report_suppressed()
+    print("Imported {} words from {} ({}) to {}".format(words_count, args.input, format, args.output))
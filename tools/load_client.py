@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+
+# Scripted client for load testing the server.
+# Each client registers a new user, logs in, starts learning a language, learns some words and takes a word test,
+# waiting for the server's prompt before every answer, like a person would.
+# The time from sending an answer to receiving the next prompt is measured, and a summary is printed as JSON.
+# The clients register new users, so the server should run on a copy of the users file:
+#   python server.py --users /tmp/users.txt
+#   python -m tools.load_client --clients 50 --words 10
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+PASSWORD = "loadtest123"
+# Seconds of waiting for a prompt after which a client fails
+PROMPT_TIMEOUT = 60.0
+OPTION_PROMPT = "Option: "
+
+# Returns the script of a client, as a list of (expected prompt, answer)
+def make_script(username: str, words_count: int) -> list[tuple[str, str]]:
+    script = [
+        # Register, with the first language as the main language
+        (OPTION_PROMPT, "2"),
+        ("Choose a username: ", username),
+        ("Choose a password: ", PASSWORD),
+        (OPTION_PROMPT, "1"),
+        # Login
+        (OPTION_PROMPT, "1"),
+        ("Username: ", username),
+        ("Password: ", PASSWORD),
+        # Start learning the first language that can be learned
+        (OPTION_PROMPT, "1"),
+        (OPTION_PROMPT, "1")
+    ]
+    # Learn new words
+    script += [(OPTION_PROMPT, "3")] * words_count
+    # Take a shuffled word test in the first direction, with wrong answers
+    script += [(OPTION_PROMPT, "4"), (OPTION_PROMPT, "1"), (OPTION_PROMPT, "5")]
+    script += [("Answer: ", "?")] * words_count
+    # Leave the home page and the index page
+    script += [(OPTION_PROMPT, "exit"), (OPTION_PROMPT, "exit")]
+    return script
+
+# Waits until the given prompt comes from the server. Returns the rest of the received text after the prompt
+async def expect(reader: asyncio.StreamReader, buffer: str, prompt: str) -> str:
+    while prompt not in buffer:
+        data = await asyncio.wait_for(reader.read(1 << 16), PROMPT_TIMEOUT)
+        if not data:
+            raise ConnectionError("Server closed the connection while waiting for \"{}\"".format(prompt))
+        buffer += data.decode("utf-8", errors = "replace")
+    return buffer[buffer.index(prompt) + len(prompt):]
+
+# Runs the script of one client. Appends the latencies of its answers, in seconds, to the given list
+async def run_client(host: str, port: int, username: str, words_count: int, latencies: list[float]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        buffer = ""
+        sent_at = None
+        for prompt, answer in make_script(username, words_count):
+            buffer = await expect(reader, buffer, prompt)
+            if sent_at is not None:
+                latencies.append(time.perf_counter() - sent_at)
+            writer.write((answer + "\n").encode("utf-8"))
+            await writer.drain()
+            sent_at = time.perf_counter()
+    finally:
+        writer.close()
+
+# Returns the value at the given fraction of sorted values
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# Runs the given number of clients at the same time. Returns the summary of the run
+async def run(host: str, port: int, clients_count: int, words_count: int) -> dict:
+    # Usernames are unique to the run, so that it can be repeated on the same server
+    run_id = "".join(random.choices(string.ascii_lowercase, k = 6))
+    latencies = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_client(host, port, "load{}{}".format(run_id, idx), words_count, latencies) for idx in range(clients_count)
+    ), return_exceptions = True)
+    seconds = time.perf_counter() - start
+    errors = [repr(result) for result in results if isinstance(result, BaseException)]
+    latencies.sort()
+    return {
+        "clients": clients_count,
+        "failed_clients": len(errors),
+        "errors": errors[:10],
+        "answers": len(latencies),
+        "seconds": seconds,
+        "answers_per_second": len(latencies) / seconds if seconds > 0 else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": latencies[-1] if latencies else None
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Load test the SuperMem server with scripted clients.")
+    parser.add_argument("--host", default = DEFAULT_HOST)
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    parser.add_argument("--clients", type = int, default = 10, help = "number of clients running at the same time")
+    parser.add_argument("--words", type = int, default = 5, help = "number of words each client learns and is tested on")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.host, args.port, args.clients, args.words)), indent = 4))
@@ -0,0 +1,100 @@
+from data.database import Database
+from data.sqlite_storage import SqliteStorage
+from data.sharded_storage import ShardedStorage
+from data.journal import Journal
+import argparse
+import os
+import shutil
+
+# Command for converting the application's data between the text files storage, the SQLite storage and the sharded storage.
+# Run from the root directory of the project:
+#   python -m tools.migrate_storage to-sqlite
+#   python -m tools.migrate_storage to-text [--with-dictionaries]
+#   python -m tools.migrate_storage to-shards [--shards N]
+#   python -m tools.migrate_storage from-shards
+
+DEFAULT_USERS_FILE = "data/users/users.txt"
+DEFAULT_SQLITE_FILE = "data/supermem.db"
+DEFAULT_SHARDS_DIRECTORY = "data/users/shards"
+
+# Empties the journal of a users file. Must be called whenever the users file is rewritten past its database,
+# otherwise the next load replays the old records on top of the migrated users
+def clear_journal(users_filepath: str) -> None:
+    Journal(Journal.get_filepath(users_filepath)).clear()
+
+# Copies users and dictionaries from the text files to the SQLite database.
+# The journal of the users file is applied first, so no recorded change is lost.
+# Then it's folded into the users file, so that the file left behind is up to date and its journal is not replayed again.
+def migrate_to_sqlite(users_filepath: str, sqlite_filepath: str) -> None:
+    database = Database()
+    database.load_dictionaries()
+    database.load_users(users_filepath)
+    storage = SqliteStorage(sqlite_filepath)
+    storage.export_dictionaries(database.dictionaries, database.dict_filepaths)
+    storage.export_users(database.users)
+    storage.close()
+    database.export_users(users_filepath)
+    print("Migrated {} users and {} dictionaries to {}".format(len(database.users), len(database.dictionaries), sqlite_filepath))
+
+# Copies users from the SQLite database to the users file.
+# Dictionaries are written back to the files they originally came from, only if requested.
+def migrate_to_text(users_filepath: str, sqlite_filepath: str, with_dictionaries: bool) -> None:
+    storage = SqliteStorage(sqlite_filepath)
+    database = Database(storage)
+    database.load_dictionaries()
+    database.load_users()
+    database.export_users(users_filepath)
+    # The records of the old journal are older than the migrated users
+    clear_journal(users_filepath)
+    if with_dictionaries:
+        for dictionary, filepath in zip(database.dictionaries, database.dict_filepaths):
+            Database.write_dictionary(dictionary, filepath)
+    storage.close()
+    print("Migrated {} users to {}".format(len(database.users), users_filepath))
+
+# Copies users from the users file to a sharded storage. The journal of the users file is applied first, and then folded into the file.
+# The shards are written into a new directory, which then replaces the old one, so that the number of shards can be changed
+def migrate_to_shards(users_filepath: str, shards_directory: str, shards_count: int) -> None:
+    database = Database()
+    database.load_dictionaries()
+    database.load_users(users_filepath)
+    new_directory = shards_directory.rstrip("/\\") + ".new"
+    if os.path.exists(new_directory):
+        shutil.rmtree(new_directory)
+    storage = ShardedStorage(new_directory, shards_count)
+    storage.export_users(database.users)
+    if os.path.exists(shards_directory):
+        shutil.rmtree(shards_directory)
+    os.replace(new_directory, shards_directory)
+    # The journal is folded into the users file left behind, so that it's up to date and its journal is not replayed again
+    database.export_users(users_filepath)
+    print("Migrated {} users to {} shards in {}".format(len(database.users), storage.shards_count, shards_directory))
+
+# Copies users from a sharded storage to the users file
+def migrate_from_shards(users_filepath: str, shards_directory: str) -> None:
+    storage = ShardedStorage(shards_directory)
+    database = Database(storage)
+    database.load_dictionaries()
+    database.load_users()
+    database.export_users(users_filepath)
+    # The records of the old journal are older than the migrated users
+    clear_journal(users_filepath)
+    print("Migrated {} users to {}".format(len(database.users), users_filepath))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Convert SuperMem data between text files and SQLite.")
+    parser.add_argument("direction", choices = ["to-sqlite", "to-text", "to-shards", "from-shards"])
+    parser.add_argument("--users", default = DEFAULT_USERS_FILE, help = "path to the users text file")
+    parser.add_argument("--sqlite", default = DEFAULT_SQLITE_FILE, help = "path to the SQLite database file")
+    parser.add_argument("--with-dictionaries", action = "store_true", help = "when migrating to text, also write the dictionary files")
+    parser.add_argument("--shards-directory", default = DEFAULT_SHARDS_DIRECTORY, help = "path to the directory of the sharded storage")
+    parser.add_argument("--shards", type = int, default = ShardedStorage.DEFAULT_SHARDS_COUNT, help = "number of shards, when migrating to shards")
+    args = parser.parse_args()
+    if args.direction == "to-sqlite":
+        migrate_to_sqlite(args.users, args.sqlite)
+    elif args.direction == "to-text":
+        migrate_to_text(args.users, args.sqlite, args.with_dictionaries)
+    elif args.direction == "to-shards":
+        migrate_to_shards(args.users, args.shards_directory, args.shards)
+    else:
+        migrate_from_shards(args.users, args.shards_directory)
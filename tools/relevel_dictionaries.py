@@ -0,0 +1,249 @@
+from data.database import Database
+from data.sqlite_storage import SqliteStorage
+from data.sharded_storage import ShardedStorage
+from dictionary import Dictionary, LazyDictionary
+from logger import Logger
+from user import User
+from array import array
+import argparse
+import json
+import sys
+import numpy as np
+
+# Command for re-leveling the words of the dictionaries from how hard they actually are for the users.
+# The confidences of every user are streamed one user at a time, and added to per-dictionary sums of confidences and
+# numbers of learners of each word. Rows of confidences are buffered and added in batches, as users x words matrices,
+# so the aggregation is vectorized and memory use depends on the batch size and the dictionaries, not on the number of users.
+# Words learned by enough users get an empirical level from the rank of their mean confidence among those words:
+# the word with the lowest mean confidence gets level 100, the one with the highest gets level 1.
+# Confidences grow with practice, so ranks are used instead of the raw means, and the levels stay spread over 1 to 100.
+# The other words keep their levels.
+# The report of the changed levels is printed as JSON. Unless it's a dry run, the revised dictionaries are written back.
+# Needs NumPy, which the application itself doesn't.
+# Run from the root directory of the project:
+#   python -m tools.relevel_dictionaries [--dry-run] [--min-learners N] [--max-listed N] [--batch-rows N] [--storage STORAGE]
+
+DEFAULT_USERS_FILE = "data/users/users.txt"
+DEFAULT_SQLITE_FILE = "data/supermem.db"
+DEFAULT_SHARDS_DIRECTORY = "data/users/shards"
+# Minimum number of users who learned a word, for it to get an empirical level
+DEFAULT_MIN_LEARNERS = 3
+# Number of changed words listed for each dictionary in the report, the ones whose level changed the most
+DEFAULT_MAX_LISTED = 50
+# Number of rows of confidences buffered for a dictionary before they are added to its sums
+DEFAULT_BATCH_ROWS = 1024
+MIN_LEVEL = 1
+MAX_LEVEL = 100
+
+# Yields every user in the database, one at a time, without keeping them in the database.
+# Users of the users file are read line by line, except the ones that the journal replay has loaded already.
+# Users of the sharded storage are read shard by shard, and users of the SQLite storage one by one.
+# NOTE: Users' dictionaries are not set up, same as in Database.deserialize_user()
+def stream_users(database: Database):
+    # Users changed by the journal are already loaded, with the changes applied
+    yield from database.users
+    storage = database.storage
+    if storage is None:
+        usernames_by_offset = {record[0]: username for username, record in database.user_records.items() if record[0] is not None}
+        if not usernames_by_offset:
+            return
+        with open(database.users_filepath, 'rb') as file:
+            offset = 0
+            for line in file:
+                username = usernames_by_offset.get(offset)
+                offset += len(line)
+                if username is None:
+                    continue
+                user = Database.deserialize_user(line.decode("utf-8").strip())
+                if user is None:
+                    Logger.log_error("Invalid user {} in file {} will be skipped.", username, database.users_filepath)
+                    continue
+                yield user
+    elif isinstance(storage, ShardedStorage):
+        # Shards are read past the storage, so that the parsed users are not kept in its loaded shards
+        for shard_idx in range(storage.shards_count):
+            for username, line in ShardedStorage.read_shard(storage.get_shard_filepath(shard_idx)).items():
+                user = Database.deserialize_user(line.decode("utf-8").strip())
+                if user is None:
+                    Logger.log_error("Invalid user {} in sharded storage {} will be skipped.", username, storage.directory)
+                    continue
+                yield user
+    else:
+        database.index_all_users()
+        for username in list(database.user_records):
+            user = storage.load_user(username)
+            if user is not None:
+                yield user
+
+# Creates the aggregate of a dictionary: sums of confidences and numbers of learners of its words,
+# and the rows of confidences that are not added to them yet
+def create_aggregate(words_count: int) -> dict:
+    return {
+        "sums": np.zeros(words_count, dtype = np.int64),
+        "learners": np.zeros(words_count, dtype = np.int64),
+        "rows": [],
+        "users": 0
+    }
+
+# Adds the buffered rows of an aggregate to its sums, as one matrix. Words a row's user hasn't learned are masked out
+def flush_rows(aggregate: dict) -> None:
+    rows = aggregate["rows"]
+    if not rows:
+        return
+    # The dictionary might have fewer words now than when the users learned them
+    learned = np.minimum(np.array([len(confidences) for confidences in rows], dtype = np.int64), len(aggregate["sums"]))
+    width = int(learned.max())
+    matrix = np.zeros((len(rows), width), dtype = np.uint8)
+    for row_idx, confidences in enumerate(rows):
+        if learned[row_idx] > 0:
+            matrix[row_idx, :learned[row_idx]] = np.frombuffer(confidences, dtype = np.uint8, count = int(learned[row_idx]))
+    mask = np.arange(width)[None, :] < learned[:, None]
+    # Words that are not learned are 0 in the matrix, so they don't add to the sums
+    aggregate["sums"][:width] += matrix.sum(axis = 0, dtype = np.int64)
+    aggregate["learners"][:width] += mask.sum(axis = 0)
+    aggregate["users"] += len(rows)
+    rows.clear()
+
+# Streams all the users and aggregates their confidences by dictionary. Returns the aggregates by dictionary filepath
+# and the number of users
+def aggregate_confidences(database: Database, batch_rows: int) -> tuple[dict[str, dict], int]:
+    filepaths_by_dictionary = {id(dictionary): filepath for dictionary, filepath in zip(database.dictionaries, database.dict_filepaths)}
+    aggregates = {}
+    users_count = 0
+    for user in stream_users(database):
+        users_count += 1
+        for lang_idx, language in enumerate(user.active_languages):
+            # Dictionaries composed through a pivot language have no file, so only direct dictionaries are re-leveled
+            dictionary = database.get_dictionary_between(user.main_language, language)
+            if dictionary is None or lang_idx >= len(user.confidences):
+                continue
+            dict_filepath = filepaths_by_dictionary[id(dictionary)]
+            aggregate = aggregates.get(dict_filepath)
+            if aggregate is None:
+                aggregate = aggregates[dict_filepath] = create_aggregate(len(dictionary))
+            # Confidences cover only the active words, the rest of the user is dropped after this loop
+            aggregate["rows"].append(user.confidences[lang_idx][:user.active_words[lang_idx]])
+            if len(aggregate["rows"]) >= batch_rows:
+                flush_rows(aggregate)
+    for aggregate in aggregates.values():
+        flush_rows(aggregate)
+    return aggregates, users_count
+
+# Computes the empirical levels of the words learned by at least min_learners users, from the ranks of their mean confidences.
+# Equal means get equal levels. Returns the new levels of all the words (the old ones where there are too few learners),
+# and the mean confidences (NaN for words nobody learned)
+def compute_levels(aggregate: dict, old_levels: np.ndarray, min_learners: int) -> tuple[np.ndarray, np.ndarray]:
+    sums = aggregate["sums"]
+    learners = aggregate["learners"]
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        means = sums / learners
+    new_levels = old_levels.copy()
+    eligible = np.flatnonzero(learners >= max(min_learners, 1))
+    # Ranks are sorted unique means, so the lowest mean has rank 0
+    unique_means, ranks = np.unique(means[eligible], return_inverse = True)
+    # With fewer than two different means there is nothing to rank the words by
+    if len(unique_means) < 2:
+        return new_levels, means
+    new_levels[eligible] = np.rint(MAX_LEVEL - (MAX_LEVEL - MIN_LEVEL) * ranks / (len(unique_means) - 1)).astype(np.uint8)
+    return new_levels, means
+
+# Re-levels a dictionary from its aggregate. Unless it's a dry run, the new levels are set in the dictionary.
+# Returns the report of the dictionary, and whether any level changed
+def relevel_dictionary(dictionary: Dictionary, dict_filepath: str, aggregate: dict, min_learners: int, max_listed: int,
+                       dry_run: bool) -> tuple[dict, bool]:
+    # All the words are loaded, so that the dictionary can be written back
+    old_levels = np.array(dictionary.levels, dtype = np.uint8)
+    new_levels, means = compute_levels(aggregate, old_levels, min_learners)
+    deltas = new_levels.astype(np.int64) - old_levels.astype(np.int64)
+    changed = np.flatnonzero(deltas)
+    listed = changed[np.argsort(-np.abs(deltas[changed]), kind = "stable")[:max_listed]]
+    report = {
+        "filepath": dict_filepath,
+        "language_a": dictionary.language_a,
+        "language_b": dictionary.language_b,
+        "learners": aggregate["users"],
+        "words": len(dictionary),
+        "leveled_words": int((aggregate["learners"] >= max(min_learners, 1)).sum()),
+        "changed_words": len(changed),
+        "changes": [
+            {
+                "word_idx": int(word_idx),
+                "term_a": dictionary.terms_a[word_idx],
+                "term_b": dictionary.terms_b[word_idx],
+                "old_level": int(old_levels[word_idx]),
+                "new_level": int(new_levels[word_idx]),
+                "learners": int(aggregate["learners"][word_idx]),
+                "mean_confidence": round(float(means[word_idx]), 2)
+            }
+            for word_idx in listed.tolist()
+        ]
+    }
+    if not dry_run and len(changed) > 0:
+        dictionary.levels = array('B', new_levels.tobytes())
+    return report, len(changed) > 0
+
+# Writes the revised dictionaries back to where they were loaded from.
+# Dictionaries kept in a storage backend (SQLite) are all exported to it at once, the others are written to their files
+def write_revised_dictionaries(database: Database, revised: list[tuple[Dictionary, str]]) -> None:
+    if database.storage is not None and any(
+            dictionary is not None and not isinstance(dictionary, LazyDictionary) for dictionary in database.dictionaries):
+        database.export_dictionaries()
+        return
+    for dictionary, dict_filepath in revised:
+        Database.write_dictionary(dictionary, dict_filepath)
+
+# Re-levels all the dictionaries that have learners. Returns the report.
+# Unless it's a dry run, the dictionaries with changed levels are written back
+def relevel(database: Database, min_learners: int, max_listed: int, batch_rows: int, dry_run: bool) -> dict:
+    aggregates, users_count = aggregate_confidences(database, batch_rows)
+    reports = []
+    revised = []
+    for dictionary, dict_filepath in zip(database.dictionaries, database.dict_filepaths):
+        aggregate = aggregates.get(dict_filepath)
+        if dictionary is None or aggregate is None:
+            continue
+        report, changed = relevel_dictionary(dictionary, dict_filepath, aggregate, min_learners, max_listed, dry_run)
+        reports.append(report)
+        if changed:
+            revised.append((dictionary, dict_filepath))
+    if not dry_run and revised:
+        write_revised_dictionaries(database, revised)
+    return {
+        "dry_run": dry_run,
+        "users": users_count,
+        "min_learners": min_learners,
+        "written_dictionaries": [] if dry_run else [dict_filepath for _, dict_filepath in revised],
+        "dictionaries": reports
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Re-level the words of the SuperMem dictionaries from the confidences of all users.")
+    parser.add_argument("--dry-run", action = "store_true", help = "only report the changed levels, without writing the dictionaries")
+    parser.add_argument("--min-learners", type = int, default = DEFAULT_MIN_LEARNERS, help = "minimum number of users who learned a word, for it to be re-leveled")
+    parser.add_argument("--max-listed", type = int, default = DEFAULT_MAX_LISTED, help = "number of changed words listed for each dictionary")
+    parser.add_argument("--batch-rows", type = int, default = DEFAULT_BATCH_ROWS, help = "number of rows of confidences added to the sums at once")
+    parser.add_argument("--storage", choices = ["text", "sqlite", "sharded"], default = "text")
+    parser.add_argument("--users", default = DEFAULT_USERS_FILE, help = "path to the users text file")
+    parser.add_argument("--sqlite", default = DEFAULT_SQLITE_FILE, help = "path to the SQLite database file")
+    parser.add_argument("--shards-directory", default = DEFAULT_SHARDS_DIRECTORY, help = "path to the directory of the sharded storage")
+    args = parser.parse_args()
+    if args.batch_rows < 1:
+        parser.error("--batch-rows must be at least 1")
+    # The report goes to the standard output, so log messages go to the standard error
+    Logger.file = sys.stderr
+
+    storage = None
+    if args.storage == "sqlite":
+        storage = SqliteStorage(args.sqlite)
+    elif args.storage == "sharded":
+        storage = ShardedStorage(args.shards_directory)
+    database = Database(storage)
+    # Only usernames are indexed, the users are streamed. Dictionaries without learners are never loaded
+    database.load_dictionaries(lazy = True)
+    database.load_users(args.users, lazy = True)
+    with Logger.span("relevel_dictionaries"):
+        report = relevel(database, args.min_learners, args.max_listed, args.batch_rows, args.dry_run)
+    if storage is not None:
+        storage.close()
+    Logger.report_suppressed()
+    print(json.dumps(report, indent = 4, ensure_ascii = False))
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Command for checking how fast the application starts.
+# It starts main.py with Python's import time tracing (-X importtime) and timing spans turned on,
+# measures the time until the first prompt appears, and then exits the application by answering "exit".
+# The report is printed as JSON: the time to the first prompt, the time of an empty interpreter for comparison,
+# the spans of loading the data, the slowest imports, and whether the modules that should be imported lazily were imported.
+# Run from the root directory of the project:
+#   python -m tools.startup_report [--top N] [-- MAIN_ARGS ...]
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PROMPT = "Option: "
+# Modules that are slow to import and are needed only for login or registration
+LAZY_MODULES = ["bcrypt", "pwinput"]
+# Seconds of waiting for the first prompt
+TIMEOUT = 60.0
+
+# Runs main.py until its first prompt. Returns (seconds to the first prompt, its output before the prompt, its import time trace)
+def run_until_first_prompt(main_args: list[str]) -> tuple[float, str, str]:
+    command = [sys.executable, "-X", "importtime", "main.py", "--timings", "--json-logs"] + main_args
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd = PROJECT_DIRECTORY, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+    # The import trace is read in another thread, so that a full stderr pipe doesn't block the application
+    stderr_chunks = []
+    stderr_thread = threading.Thread(target = lambda: stderr_chunks.append(process.stderr.read()))
+    stderr_thread.start()
+    output = b""
+    seconds = None
+    while True:
+        chunk = process.stdout.read1(1 << 16)
+        if not chunk:
+            break
+        output += chunk
+        if FIRST_PROMPT.encode() in output:
+            seconds = time.perf_counter() - start
+            break
+        if time.perf_counter() - start > TIMEOUT:
+            break
+    try:
+        process.communicate(b"exit\n", timeout = TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+    stderr_thread.join()
+    return seconds, output.decode("utf-8", errors = "replace"), b"".join(stderr_chunks).decode("utf-8", errors = "replace")
+
+# Measures the time of starting and exiting an empty interpreter, in seconds
+def time_empty_interpreter() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check = True)
+    return time.perf_counter() - start
+
+# Parses an import time trace. Returns a list of (module, self microseconds, cumulative microseconds, nesting level)
+def parse_import_times(trace: str) -> list[tuple[str, int, int, int]]:
+    imports = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us = int(fields[0])
+            cumulative_us = int(fields[1])
+        except ValueError:
+            # The header line
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        imports.append((module, self_us, cumulative_us, (len(name) - len(module) - 1) // 2))
+    return imports
+
+# Parses the timing spans from the JSON log lines of the application. Returns a dictionary of span names and their seconds
+def parse_spans(output: str) -> dict[str, float]:
+    spans = {}
+    for line in output.splitlines():
+        if not line.startswith("{"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "span" in record:
+            spans[record["span"]] = record["seconds"]
+    return spans
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Report how fast SuperMem starts.")
+    parser.add_argument("--top", type = int, default = 15, help = "number of the slowest imports in the report")
+    parser.add_argument("main_args", nargs = "*", help = "arguments for main.py, after --")
+    args = parser.parse_args()
+
+    seconds, output, trace = run_until_first_prompt(args.main_args)
+    imports = parse_import_times(trace)
+    imported_modules = set(module for module, _, _, _ in imports)
+    # Only the imports of the application's own modules, and the top-level imports of other modules, are ranked
+    top_level = [entry for entry in imports if entry[3] == 0]
+    report = {
+        "time_to_first_prompt": seconds,
+        "empty_interpreter": time_empty_interpreter(),
+        "imports_total": sum(self_us for _, self_us, _, _ in imports) / 1e6,
+        "spans": parse_spans(output),
+        "lazy_modules_imported_at_startup": [module for module in LAZY_MODULES if module in imported_modules],
+        "slowest_imports": [
+            {"module": module, "cumulative": cumulative_us / 1e6, "self": self_us / 1e6}
+            for module, self_us, cumulative_us, _ in sorted(top_level, key = lambda entry: entry[2], reverse = True)[:args.top]
+        ]
+    }
+    print(json.dumps(report, indent = 4))
+    sys.exit(0 if seconds is not None else 1)
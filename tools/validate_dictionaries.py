@@ -0,0 +1,246 @@
+from data.database import Database
+from word import Word
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import argparse
+import json
+import os
+import sys
+
+# Command for validating dictionary files without loading them into a database.
+# An invalid line is skipped when a dictionary is loaded, which shifts the index of every word after it,
+# and users' progress is kept by word index. This command finds such lines before they do any harm.
+#
+# Files are split into chunks of whole lines, which are validated in worker processes.
+# Each worker reports the issues it found, the languages specified in its chunk and the first line of every term,
+# and the results are merged here, so that duplicate terms are found across chunks too.
+# The summary is printed as JSON. The exit status is 1 if any file has errors.
+# Run from the root directory of the project:
+#   python -m tools.validate_dictionaries [FILE ...] [--workers N] [--chunk-bytes N]
+
+# Size of a chunk of a file that is validated by one worker
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+# Maximum number of issues of each file listed in the summary. All of them are counted
+DEFAULT_MAX_ISSUES = 100
+# Range of valid word levels
+MIN_LEVEL = 1
+MAX_LEVEL = 100
+# Codes of issues that make a word line be skipped when the dictionary is loaded
+WORD_ERROR_CODES = {"encoding", "field_count", "level", "type"}
+# Codes of duplicate term issues, for term A and term B
+DUPLICATE_CODES = ("duplicate_term_a", "duplicate_term_b")
+
+# Splits a file into chunks of about chunk_bytes bytes that end at line endings.
+# Returns a list of (start, end) byte offsets
+def split_into_chunks(filepath: str, chunk_bytes: int) -> list[tuple[int, int]]:
+    size = os.path.getsize(filepath)
+    chunks = []
+    start = 0
+    with open(filepath, 'rb') as file:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                # Move the end of the chunk past the next line ending
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+# Validates a chunk of a dictionary file. Runs in the worker processes.
+# Line indices in the result are relative to the beginning of the chunk. Returns a dictionary with:
+#   lines     - number of lines in the chunk
+#   words     - number of valid words
+#   issues    - list of (line index, severity, code, message). Messages of duplicates are (term, line index of the first one)
+#   languages - list of (line index, prefix, language) for lines that specify a language
+#   first_word_line - index of the first line with a word (valid or not), or None
+#   terms_a, terms_b - first line index of each term A and term B
+def validate_chunk(filepath: str, start: int, end: int) -> dict:
+    with open(filepath, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    result = {
+        "lines": 0,
+        "words": 0,
+        "issues": [],
+        "languages": [],
+        "first_word_line": None,
+        "terms_a": {},
+        "terms_b": {}
+    }
+    issues = result["issues"]
+    terms_a = result["terms_a"]
+    terms_b = result["terms_b"]
+    lines = data.split(b"\n")
+    # The chunk ends with a line ending, except maybe at the end of the file
+    if lines[-1] == b"":
+        lines.pop()
+    result["lines"] = len(lines)
+    for line_idx, raw_line in enumerate(lines):
+        # Empty lines (or lines of only whitespace, like the loader) separate the pages of a dictionary, they are not words
+        if len(raw_line.strip()) == 0:
+            continue
+        try:
+            line = raw_line.decode("utf-8")
+        except UnicodeDecodeError:
+            issues.append((line_idx, "error", "encoding", "Line is not valid UTF-8."))
+            if result["first_word_line"] is None:
+                result["first_word_line"] = line_idx
+            continue
+        if line.startswith(Database.LANGUAGE_A_PREFIX) or line.startswith(Database.LANGUAGE_B_PREFIX):
+            prefix = Database.LANGUAGE_A_PREFIX if line.startswith(Database.LANGUAGE_A_PREFIX) else Database.LANGUAGE_B_PREFIX
+            result["languages"].append((line_idx, prefix, line[len(prefix):].strip()))
+            continue
+        if result["first_word_line"] is None:
+            result["first_word_line"] = line_idx
+        issue = validate_word(line.strip())
+        if issue is not None:
+            issues.append((line_idx,) + issue)
+            if issue[0] == "error":
+                continue
+        result["words"] += 1
+        term_a, term_b = line.strip().split(Database.PROPERTY_SEPARATOR, 2)[:2]
+        # Duplicates within the chunk are reported here, duplicates across chunks when the results are merged
+        for name, term, chunk_terms in (("term_a", term_a, terms_a), ("term_b", term_b, terms_b)):
+            first_line_idx = chunk_terms.setdefault(term, line_idx)
+            if first_line_idx != line_idx:
+                issues.append((line_idx, "warning", "duplicate_" + name, (term, first_line_idx)))
+    return result
+
+# Validates a serialized word the same way as Database.deserialize_word().
+# Returns None if the word is valid, or a tuple of (severity, code, message)
+def validate_word(serialized: str) -> tuple[str, str, str]:
+    parts = serialized.split(Database.PROPERTY_SEPARATOR)
+    if len(parts) != 4:
+        return ("error", "field_count", "Word has {} properties instead of 4.".format(len(parts)))
+    try:
+        level = int(parts[2])
+    except ValueError:
+        return ("error", "level", "Word has a non-integer level - {}.".format(parts[2]))
+    if level < MIN_LEVEL or level > MAX_LEVEL:
+        return ("error", "level", "Word has a level outside of [{},{}] range - {}.".format(MIN_LEVEL, MAX_LEVEL, level))
+    if parts[3] not in Word.TYPES:
+        return ("error", "type", "Word has an invalid type - {}.".format(parts[3]))
+    if len(parts[0]) == 0 or len(parts[1]) == 0:
+        return ("warning", "empty_term", "Word has an empty term.")
+    return None
+
+# Merges the results of the chunks of a file into its summary.
+# Line numbers in the summary are 1-based, like in a text editor
+def merge_results(filepath: str, results: list[dict], max_issues: int) -> dict:
+    issues = []
+    languages = {Database.LANGUAGE_A_PREFIX: [], Database.LANGUAGE_B_PREFIX: []}
+    first_word_line = None
+    terms = ({}, {})
+    lines_count = 0
+    words_count = 0
+    for result in results:
+        offset = lines_count
+        lines_count += result["lines"]
+        words_count += result["words"]
+        for line_idx, severity, code, message in result["issues"]:
+            if code in DUPLICATE_CODES:
+                term, first_line_idx = message
+                message = duplicate_message(code, term, offset + first_line_idx + 1)
+            issues.append((offset + line_idx + 1, severity, code, message))
+        for line_idx, prefix, language in result["languages"]:
+            languages[prefix].append((offset + line_idx + 1, language))
+        if first_word_line is None and result["first_word_line"] is not None:
+            first_word_line = offset + result["first_word_line"] + 1
+        # Terms that were already seen in an earlier chunk are duplicates
+        for side, (code, chunk_terms) in enumerate(zip(DUPLICATE_CODES, (result["terms_a"], result["terms_b"]))):
+            for term, line_idx in chunk_terms.items():
+                line_number = offset + line_idx + 1
+                first_line_number = terms[side].setdefault(term, line_number)
+                if first_line_number != line_number:
+                    issues.append((line_number, "warning", code, duplicate_message(code, term, first_line_number)))
+    summary_languages = {}
+    for prefix, key in ((Database.LANGUAGE_A_PREFIX, "language_a"), (Database.LANGUAGE_B_PREFIX, "language_b")):
+        specified = languages[prefix]
+        if not specified:
+            issues.append((0, "error", "missing_" + key, "The file does not specify {}.".format(key.replace("_", " "))))
+            summary_languages[key] = None
+            continue
+        for line_number, language in specified:
+            if len(language) == 0:
+                issues.append((line_number, "error", "empty_" + key, "Empty {}.".format(key.replace("_", " "))))
+            if first_word_line is not None and line_number > first_word_line:
+                issues.append((line_number, "warning", "late_" + key, "{} is specified after the first word.".format(key.replace("_", " ").capitalize())))
+        if len(set(language for _, language in specified)) > 1:
+            issues.append((specified[-1][0], "error", "conflicting_" + key, "{} is specified more than once, with different values.".format(key.replace("_", " ").capitalize())))
+        # The last specification wins when a dictionary is loaded
+        summary_languages[key] = specified[-1][1]
+    issues.sort()
+    errors_count = sum(1 for issue in issues if issue[1] == "error")
+    # Skipped word lines shift the indices of all the words after them
+    first_invalid_word_line = next((issue[0] for issue in issues if issue[2] in WORD_ERROR_CODES), None)
+    counts = {}
+    for _, _, code, _ in issues:
+        counts[code] = counts.get(code, 0) + 1
+    return {
+        "filepath": filepath,
+        "valid": errors_count == 0,
+        "language_a": summary_languages["language_a"],
+        "language_b": summary_languages["language_b"],
+        "lines": lines_count,
+        "words": words_count,
+        "errors": errors_count,
+        "warnings": len(issues) - errors_count,
+        "first_shifted_word_line": first_invalid_word_line,
+        "issue_counts": counts,
+        "issues": [
+            {"line": line_number, "severity": severity, "code": code, "message": message}
+            for line_number, severity, code, message in issues[:max_issues]
+        ]
+    }
+
+# Returns the message of a duplicate term issue
+def duplicate_message(code: str, term: str, first_line_number: int) -> str:
+    name = "term A" if code == "duplicate_term_a" else "term B"
+    return "Duplicate {} \"{}\", first on line {}.".format(name, term, first_line_number)
+
+# Validates dictionary files. Chunks are validated in a process pool, unless there is only one chunk or workers = 1.
+# Returns the summary of all the files
+def validate(filepaths: list[str], chunk_bytes: int, workers: int, max_issues: int) -> dict:
+    chunks_by_file = []
+    for filepath in filepaths:
+        try:
+            chunks_by_file.append(split_into_chunks(filepath, chunk_bytes))
+        except OSError:
+            chunks_by_file.append(None)
+    tasks = [(filepath, start, end) for filepath, chunks in zip(filepaths, chunks_by_file) if chunks is not None for start, end in chunks]
+    results = None
+    if len(tasks) > 1 and workers != 1:
+        try:
+            with ProcessPoolExecutor(max_workers = workers) as executor:
+                results = list(executor.map(validate_chunk, *zip(*tasks)))
+        except (BrokenProcessPool, OSError):
+            print("Cannot validate in parallel, the chunks will be validated one by one.", file = sys.stderr)
+    if results is None:
+        results = [validate_chunk(*task) for task in tasks]
+    # Results are in the same order as the tasks, so each file takes the next len(chunks) of them
+    files = []
+    result_idx = 0
+    for filepath, chunks in zip(filepaths, chunks_by_file):
+        if chunks is None:
+            files.append({"filepath": filepath, "valid": False, "error": "The file cannot be read."})
+            continue
+        files.append(merge_results(filepath, results[result_idx:result_idx + len(chunks)], max_issues))
+        result_idx += len(chunks)
+    return {
+        "valid": all(summary["valid"] for summary in files),
+        "files": files
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Validate SuperMem dictionary files and print a JSON summary.")
+    parser.add_argument("filepaths", nargs = "*", help = "dictionary files, all the files in the default directory by default")
+    parser.add_argument("--workers", type = int, default = None, help = "number of worker processes, 1 to validate in this process")
+    parser.add_argument("--chunk-bytes", type = int, default = DEFAULT_CHUNK_BYTES, help = "size of a chunk of a file validated by one worker")
+    parser.add_argument("--max-issues", type = int, default = DEFAULT_MAX_ISSUES, help = "maximum number of issues listed for each file")
+    args = parser.parse_args()
+    filepaths = args.filepaths if args.filepaths else sorted(Database.get_dict_filepaths_from_default_directory())
+    summary = validate(filepaths, args.chunk_bytes, args.workers, args.max_issues)
+    print(json.dumps(summary, indent = 4, ensure_ascii = False))
+    sys.exit(0 if summary["valid"] else 1)
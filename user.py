@@ -1,5 +1,7 @@
 from dictionary import Dictionary
 from word import Word
+from spaced_repetition import Schedule
+from array import array
 
 MIN_USERNAME_LEN = 3
 MIN_PASSWORD_LEN = 6
@@ -8,7 +10,9 @@ PASSWORD_ALLOWED_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ01
 
 # A class for a user of the application
 class User:
-    # Creates a user with a username, password, their main language and their active languages
+    # Creates a user with a username, password, their main language and their active languages.
+    # For each active language, the user has a count of active words and a compact array('B') of confidences,
+    # one confidence (0 to 100) for each active word, and a spaced repetition schedule with the same words
     def __init__(
         self,
         username: str,
@@ -16,8 +20,9 @@ class User:
         main_language: str,
         active_languages: list[str],
         active_words: list[int],
-        confidences: list[list[int]],
-        dictionaries: list[Dictionary]
+        confidences: list[array],
+        dictionaries: list[Dictionary],
+        schedules: list[Schedule] = None
     ):
         self.username = username
         self.password = password
@@ -26,6 +31,7 @@ class User:
         self.active_words = active_words
         self.confidences = confidences
         self.dictionaries = dictionaries
+        self.schedules = schedules if schedules is not None else []
 
     # Checks if a username is valid
     def is_username_valid(username: str) -> bool:
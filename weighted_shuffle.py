@@ -0,0 +1,30 @@
+from random import Random
+
+# A class for shuffling items by weights.
+# A weighted shuffle is a random permutation where each next item is drawn from the remaining ones
+# with probability proportional to its weight. Heavier items tend to come first.
+#
+# It's done with the "exponential race" (Efraimidis-Spirakis) method: each item draws a random key
+# from an exponential distribution with rate equal to its weight, and the items are sorted by their keys.
+# This gives exactly the same distribution as drawing the items one by one, in O(n log n) time.
+class WeightedShuffle:
+    # Returns a weighted random permutation of the indices of the given weights.
+    # Weights should be non-negative. Items with zero weight are never drawn while items with positive weight remain,
+    # so they come last, in uniformly random order.
+    # If a seed is given, the same weights and seed always give the same permutation.
+    def permutation(weights: list[float], seed: int = None) -> list[int]:
+        random = Random(seed)
+        keys = []
+        for weight in weights:
+            if weight > 0:
+                keys.append((0, random.expovariate(weight)))
+            elif weight == 0:
+                keys.append((1, random.random()))
+            else:
+                raise ValueError("Weights of a weighted shuffle cannot be negative - {}".format(weight))
+        return sorted(range(len(keys)), key = keys.__getitem__)
+
+    # Returns a weighted random permutation of the indices of the given items,
+    # where the weight of each item is given by the weight function
+    def permutation_by(items, weight_function, seed: int = None) -> list[int]:
+        return WeightedShuffle.permutation([weight_function(item) for item in items], seed)
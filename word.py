@@ -2,8 +2,12 @@ from logger import Logger
 
 # A class for a word in two languages.
 # "Translation" might be a more descriptive name.
-# A word consists of a term in each of the two languages, a level of complexity, and a word type
+# A word consists of a term in each of the two languages, a level of complexity, and a word type.
+# Dictionaries don't keep Word objects, they create them on demand as views of their rows,
+# so words are kept small with __slots__.
 class Word:
+    __slots__ = ("term_a", "term_b", "level", "type", "index")
+
     def __init__(self, term_a: str, term_b: str, level: int, type: str, index: int):
         self.term_a = term_a
         self.term_b = term_b
@@ -11,9 +15,21 @@ class Word:
         if type in Word.TYPES:
             self.type = type
         else:
-            Logger.log_error("Trying to create a word with invalid type - {}. It will be created with default type.".format(type))
+            Logger.log_error("Trying to create a word with invalid type - {}. It will be created with default type.", type)
             self.type = Word.DEFAULT_TYPE
         self.index = index
 
+    # Creates a word from properties that are known to be valid, skipping the validation. Returns the word
+    def view(term_a: str, term_b: str, level: int, type: str, index: int):
+        word = Word.__new__(Word)
+        word.term_a = term_a
+        word.term_b = term_b
+        word.level = level
+        word.type = type
+        word.index = index
+        return word
+
     TYPES = ["noun", "verb", "adj", "pron", "prepos", "conj", "interj", "expr", "unknown"]
-    DEFAULT_TYPE = "noun"
\ No newline at end of file
+    DEFAULT_TYPE = "noun"
+    # Code of each word type - its index in TYPES
+    TYPE_CODES = {type: code for code, type in enumerate(TYPES)}